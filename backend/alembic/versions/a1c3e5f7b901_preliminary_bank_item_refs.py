@@ -0,0 +1,50 @@
+"""preliminary questions reference bank items
+
+Revision ID: a1c3e5f7b901
+Revises: 7976430542e5
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a1c3e5f7b901'
+down_revision = '7976430542e5'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "preliminary_questions" not in inspector.get_table_names():
+        return
+
+    existing = _columns(inspector, "preliminary_questions")
+    if "bank_item_id" not in existing:
+        op.add_column("preliminary_questions", sa.Column("bank_item_id", sa.String(), nullable=True))
+        op.create_index("ix_preliminary_questions_bank_item_id", "preliminary_questions", ["bank_item_id"])
+    if "bank_item_version" not in existing:
+        op.add_column("preliminary_questions", sa.Column("bank_item_version", sa.String(length=12), nullable=True))
+    if "sub_index" not in existing:
+        op.add_column("preliminary_questions", sa.Column("sub_index", sa.Integer(), nullable=True))
+    op.alter_column("preliminary_questions", "question_data", existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "preliminary_questions" not in inspector.get_table_names():
+        return
+
+    existing = _columns(inspector, "preliminary_questions")
+    if "bank_item_id" in existing:
+        op.drop_index("ix_preliminary_questions_bank_item_id", table_name="preliminary_questions")
+        op.drop_column("preliminary_questions", "bank_item_id")
+    if "bank_item_version" in existing:
+        op.drop_column("preliminary_questions", "bank_item_version")
+    if "sub_index" in existing:
+        op.drop_column("preliminary_questions", "sub_index")
@@ -0,0 +1,51 @@
+"""content-addressed passages referenced by questions
+
+Revision ID: b2d4f6a8c012
+Revises: a1c3e5f7b901
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b2d4f6a8c012'
+down_revision = 'a1c3e5f7b901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "passages" not in tables:
+        op.create_table(
+            "passages",
+            sa.Column("id", sa.String(length=64), primary_key=True),
+            sa.Column("kind", sa.String(), nullable=True),
+            sa.Column("text", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+
+    if "questions" in tables:
+        columns = {column["name"] for column in inspector.get_columns("questions")}
+        if "passage_id" not in columns:
+            op.add_column("questions", sa.Column("passage_id", sa.String(length=64), nullable=True))
+            op.create_foreign_key("fk_questions_passage_id", "questions", "passages", ["passage_id"], ["id"])
+            op.create_index("ix_questions_passage_id", "questions", ["passage_id"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "questions" in tables:
+        columns = {column["name"] for column in inspector.get_columns("questions")}
+        if "passage_id" in columns:
+            op.drop_index("ix_questions_passage_id", table_name="questions")
+            op.drop_constraint("fk_questions_passage_id", "questions", type_="foreignkey")
+            op.drop_column("questions", "passage_id")
+
+    if "passages" in tables:
+        op.drop_table("passages")
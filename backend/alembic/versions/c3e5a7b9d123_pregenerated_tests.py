@@ -0,0 +1,38 @@
+"""durable pool of pregenerated tests
+
+Revision ID: c3e5a7b9d123
+Revises: b2d4f6a8c012
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c3e5a7b9d123'
+down_revision = 'b2d4f6a8c012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "pregenerated_tests" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "pregenerated_tests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("level", sa.String(), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_pregenerated_tests_id", "pregenerated_tests", ["id"])
+    op.create_index("ix_pregenerated_tests_level", "pregenerated_tests", ["level"])
+    op.create_index("ix_pregenerated_tests_created_at", "pregenerated_tests", ["created_at"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "pregenerated_tests" in inspector.get_table_names():
+        op.drop_table("pregenerated_tests")
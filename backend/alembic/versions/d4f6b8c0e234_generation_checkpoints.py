@@ -0,0 +1,39 @@
+"""durable checkpoints of main test generation stages
+
+Revision ID: d4f6b8c0e234
+Revises: c3e5a7b9d123
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd4f6b8c0e234'
+down_revision = 'c3e5a7b9d123'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "generation_checkpoints" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "generation_checkpoints",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.String(), sa.ForeignKey("test_sessions.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("session_id", "stage", name="uq_generation_checkpoints_session_stage"),
+    )
+    op.create_index("ix_generation_checkpoints_id", "generation_checkpoints", ["id"])
+    op.create_index("ix_generation_checkpoints_session_id", "generation_checkpoints", ["session_id"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "generation_checkpoints" in inspector.get_table_names():
+        op.drop_table("generation_checkpoints")
@@ -0,0 +1,36 @@
+"""durable cache of writing and speaking evaluations
+
+Revision ID: e5a7c9d1f345
+Revises: d4f6b8c0e234
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e5a7c9d1f345'
+down_revision = 'd4f6b8c0e234'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "evaluation_cache" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "evaluation_cache",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=True),
+        sa.Column("evaluation", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_evaluation_cache_kind", "evaluation_cache", ["kind"])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "evaluation_cache" in inspector.get_table_names():
+        op.drop_table("evaluation_cache")
@@ -265,6 +265,10 @@ def get_attempt_details(
                             question.content = json.loads(question.content)
                         except json.JSONDecodeError:
                             question.content = {}
+                    if question.passage_id and question.passage and isinstance(question.content, dict):
+                        question.content.setdefault(
+                            "passage" if question.question_type == "reading" else "audio_script", question.passage.text
+                        )
                     if isinstance(question.options, str):
                         try:
                             question.options = json.loads(question.options)
@@ -365,6 +369,10 @@ def get_attempt_details(
                     question.content = json.loads(question.content)
                 except json.JSONDecodeError:
                     question.content = {}
+            if question.passage_id and question.passage and isinstance(question.content, dict):
+                question.content.setdefault(
+                    "passage" if question.question_type == "reading" else "audio_script", question.passage.text
+                )
             if isinstance(question.options, str):
                 try:
                     question.options = json.loads(question.options)
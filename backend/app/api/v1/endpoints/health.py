@@ -304,6 +304,28 @@ async def clear_cache(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear cache: {str(e)}")
 
+@router.get("/queue-metrics")
+async def get_queue_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Broker queue depths per priority lane (LLEN, no worker broadcast)"""
+    
+    if not getattr(current_user, 'is_superuser', False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        from app.core.task_queues import queue_depths
+        
+        depths = await queue_depths()
+        return {
+            "queues": depths,
+            "total_pending": sum(depth["total"] for depth in depths.values()),
+            "timestamp": time.time()
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get queue metrics: {str(e)}")
+
 @router.get("/active-tasks")
 async def get_active_tasks(
     current_user: User = Depends(get_current_active_user)
@@ -315,9 +337,10 @@ async def get_active_tasks(
     
     try:
         from app.core.celery_app import celery_app
+        from app.core.task_queues import queue_depths
         
                               
-        inspect = celery_app.control.inspect()
+        inspect = celery_app.control.inspect(timeout=1.0)
         
         active_tasks = inspect.active() or {}
         scheduled_tasks = inspect.scheduled() or {}
@@ -333,7 +356,8 @@ async def get_active_tasks(
             "worker_stats": stats,
             "total_active": sum(len(tasks) for tasks in active_tasks.values()),
             "total_scheduled": sum(len(tasks) for tasks in scheduled_tasks.values()),
-            "total_reserved": sum(len(tasks) for tasks in reserved_tasks.values())
+            "total_reserved": sum(len(tasks) for tasks in reserved_tasks.values()),
+            "queue_depths": await queue_depths()
         }
         
     except Exception as e:
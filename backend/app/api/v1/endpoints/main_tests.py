@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, Form
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File, Form
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi import WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from contextlib import aclosing
 import os
+import json
 import time
 import uuid
 import asyncio
 import aiofiles
 
 from ....core.database import get_async_db
+from ....core.config import settings
 from ....api import deps
-from ....services.test_service import TestService
+from ....services.test_service import TestService, SECTION_TYPES
+from ....services.test_generation_pipeline import get_section_readiness, subscribe_generation_events
+from ....services.speaking_jobs import speaking_jobs
 from ....schemas.test import TestSession, TestStartRequest, TestSessionUpdate
 from ....schemas.user import User
 from ....utils.audio_service import audio_service
+from ....utils.tts_cache import tts_cache
 from pydantic import BaseModel
 from ....utils.file_paths import (
     ensure_upload_directory, 
@@ -47,9 +53,14 @@ class SubmitAnswerRequest(BaseModel):
     answer: str
 
 
+class BatchSubmitAnswersRequest(BaseModel):
+    answers: List[SubmitAnswerRequest]
+
+
 class SaveWritingDraftRequest(BaseModel):
     question_id: int
     answer: str
+    version: Optional[int] = None
 
 
 class SubmitWritingAnswerRequest(BaseModel):
@@ -177,7 +188,8 @@ async def generate_full_test(
                 "message": result.get("message"),
                 "estimated_time": result.get("estimated_time"),
                 "session_id": session_id,
-                "check_status_url": f"/api/v1/tests/{session_id}/generation-status"
+                "check_status_url": f"/api/v1/tests/{session_id}/generation-status",
+                "events_url": result.get("events_url")
             }
         
         return result
@@ -248,10 +260,65 @@ async def get_generation_status(
         "status": "generating",
         "message": "Test generation in progress",
         "session_id": session_id,
-        "estimated_remaining": "1-3 minutes"
+        "estimated_remaining": "1-3 minutes",
+        "sections": await get_section_readiness(session_id)
     }
 
 
+@router.get("/{session_id}/generation-events")
+async def stream_generation_events(
+    session_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Server-Sent Events stream of test generation: a snapshot of section readiness,
+    then one "section" event per stored section and a final "completed" (or "error").
+    Comment lines are sent as heartbeats; the stream closes after 10 minutes.
+    Content-Encoding is set so GZipMiddleware does not buffer the events.
+    """
+    test_service = TestService(db)
+    summary = await test_service.get_test_session_summary(session_id)
+    
+    if not summary:
+        raise HTTPException(status_code=404, detail="Test session not found")
+    
+    if summary["user_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    def format_event(event: dict) -> str:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    
+    async def event_stream():
+        if summary["status"] == "ready":
+            yield format_event({"event": "snapshot", "sections": await get_section_readiness(session_id)})
+            yield format_event({"event": "completed", "failed_sections": []})
+            return
+        
+        deadline = time.monotonic() + 600
+        async with aclosing(subscribe_generation_events(session_id)) as events:
+            async for event in events:
+                if event is None:
+                    yield ": heartbeat\n\n"
+                else:
+                    yield format_event(event)
+                    if event["event"] in ("completed", "error"):
+                        return
+                    if event["event"] == "snapshot" and event["sections"] and "pending" not in event["sections"].values():
+                        yield format_event({"event": "completed", "failed_sections": [
+                            section for section, state in event["sections"].items() if state == "error"
+                        ]})
+                        return
+                if time.monotonic() > deadline:
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"}
+    )
+
+
 @router.get("/{session_id}/questions/{question_type}")
 async def get_questions_by_type(
     session_id: str,
@@ -271,133 +338,46 @@ async def get_questions_by_type(
     questions = await test_service.get_session_questions_by_type(session_id, question_type)
     print(f"[DEBUG] Found {len(questions) if questions else 0} questions of type '{question_type}' for session {session_id}")
     
-                                                                              
-    if question_type == "reading" and questions:
-        import json
-                                                                                            
-        first_question_content = json.loads(questions[0].content)
-        passage = first_question_content.get("passage", "")
-        
-        formatted_questions = []
-        for q in questions:
-            content = json.loads(q.content)
-            formatted_questions.append({
-                "id": q.id,
-                "question": content["question"],
-                "options": json.loads(q.options) if q.options else {},
-                "question_number": content.get("question_number", 1)
-            })
-        
-        return {
-            "passage": passage,
-            "questions": formatted_questions
-        }
+    if question_type in SECTION_TYPES and questions:
+        passages = await test_service.get_passages(questions)
+        return test_service.format_section_questions(question_type, questions, passages=passages)
     
-                                                                    
-    if question_type == "listening":
-        print(f"[DEBUG] Processing listening questions for session {session_id}")
-        print(f"[DEBUG] Found {len(questions)} raw listening questions")
-        
-        if not questions:
-            print(f"[WARNING] No listening questions found for session {session_id}")
-            return []
-            
-        import json
-        formatted_scenarios = []
-        for i, q in enumerate(questions):
-            try:
-                content = json.loads(q.content) if q.content else {}
-                options = json.loads(q.options) if q.options else {}
-                
-                scenario = {
-                    "id": q.id,
-                    "audio_path": content.get("audio_path", ""),
-                    "question": content.get("question", ""),
-                    "options": options,
-                    "scenario_number": content.get("scenario_number", i + 1)
-                }
-                formatted_scenarios.append(scenario)
-                print(f"[DEBUG] Formatted scenario {i+1}: audio_path={scenario['audio_path']}, question_len={len(scenario['question'])}")
-                
-            except Exception as e:
-                print(f"[ERROR] Failed to format listening question {q.id}: {e}")
-                continue
-        
-        print(f"[DEBUG] Returning {len(formatted_scenarios)} listening scenarios for session {session_id}")
-        return formatted_scenarios
+    return questions
+
+
+@router.get("/{session_id}/bundle")
+async def get_exam_bundle(
+    session_id: str,
+    request: Request,
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns every section, audio URLs and timing metadata in one response.
+    Supports conditional GET via ETag / If-None-Match; the body is gzip-compressed
+    by GZipMiddleware.
+    """
+    test_service = TestService(db)
+    summary = await test_service.get_test_session_summary(session_id)
     
-                                                                
-    if question_type == "writing":
-        print(f"[DEBUG] Processing writing questions for session {session_id}")
-        print(f"[DEBUG] Found {len(questions)} raw writing questions")
-        
-        if not questions:
-            print(f"[WARNING] No writing questions found for session {session_id}")
-            return []
-            
-        import json
-        formatted_prompts = []
-        for i, q in enumerate(questions):
-            try:
-                content = json.loads(q.content) if q.content else {}
-                
-                prompt = {
-                    "id": q.id,
-                    "title": content.get("title", ""),
-                    "prompt": content.get("prompt", ""),
-                    "instructions": content.get("instructions", ""),
-                    "word_count": content.get("word_count", 250),
-                    "time_limit": content.get("time_limit", 25),
-                    "evaluation_criteria": content.get("evaluation_criteria", []),
-                    "prompt_number": content.get("prompt_number", i + 1)
-                }
-                formatted_prompts.append(prompt)
-                print(f"[DEBUG] Formatted prompt {i+1}: title={prompt['title']}, word_count={prompt['word_count']}")
-                
-            except Exception as e:
-                print(f"[ERROR] Failed to format writing question {q.id}: {e}")
-                continue
-        
-        print(f"[DEBUG] Returning {len(formatted_prompts)} writing prompts for session {session_id}")
-        return formatted_prompts
+    if not summary:
+        raise HTTPException(status_code=404, detail="Test session not found")
     
-                                                                   
-    if question_type == "speaking":
-        print(f"[DEBUG] Processing speaking questions for session {session_id}")
-        print(f"[DEBUG] Found {len(questions)} raw speaking questions")
-        
-        if not questions:
-            print(f"[WARNING] No speaking questions found for session {session_id}")
-            return []
-            
-        import json
-        formatted_questions = []
-        for i, q in enumerate(questions):
-            try:
-                content = json.loads(q.content) if q.content else {}
-                
-                question = {
-                    "id": q.id,
-                    "type": content.get("type", "personal"),
-                    "question": content.get("question", ""),
-                    "follow_up": content.get("follow_up", ""),
-                    "preparation_time": content.get("preparation_time", 15),
-                    "speaking_time": content.get("speaking_time", 60),
-                    "evaluation_criteria": content.get("evaluation_criteria", []),
-                    "audio_path": content.get("audio_path", ""),
-                    "question_number": content.get("question_number", i + 1)
-                }
-                formatted_questions.append(question)
-                print(f"[DEBUG] Formatted speaking question {i+1}: type={question['type']}, has_audio={bool(question['audio_path'])}")
-                
-            except Exception as e:
-                print(f"[ERROR] Failed to format speaking question {q.id}: {e}")
-                continue
-        
-        print(f"[DEBUG] Returning {len(formatted_questions)} speaking questions for session {session_id}")
-        return formatted_questions
+    if summary["user_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
-    return questions
+    bundle = await test_service.get_session_bundle(session_id, summary["status"], summary["start_time"])
+    headers = {
+        "ETag": bundle["etag"],
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization, Accept-Encoding",
+    }
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if bundle["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=bundle["body"], media_type="application/json", headers=headers)
 
 
 @router.post("/{session_id}/submit/reading")
@@ -450,6 +430,35 @@ async def submit_listening_answer(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/{session_id}/submit/{question_type}/batch")
+async def submit_objective_answers_batch(
+    session_id: str,
+    question_type: str,
+    request: BatchSubmitAnswersRequest,
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Submits all reading or listening answers of a section in one request."""
+    if question_type not in ("reading", "listening"):
+        raise HTTPException(status_code=400, detail=f"Batch submission is not supported for {question_type}")
+    
+    test_service = TestService(db)
+    summary = await test_service.get_test_session_summary(session_id)
+    
+    if not summary:
+        raise HTTPException(status_code=404, detail="Test session not found")
+    
+    if summary["user_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    try:
+        return await test_service.submit_objective_answers_batch(
+            session_id, question_type, [a.dict() for a in request.answers]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/{session_id}/save/writing")
 async def save_writing_draft(
     session_id: str,
@@ -458,17 +467,17 @@ async def save_writing_draft(
     db: AsyncSession = Depends(get_async_db)
 ):
     test_service = TestService(db)
-    session = await test_service.get_test_session(session_id)
+    session = await test_service.get_test_session_summary(session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Test session not found")
     
-    if session.user_id != current_user.id:
+    if session["user_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
         result = await test_service.save_writing_draft(
-            request.question_id, request.answer
+            request.question_id, request.answer, session_id=session_id, draft_version=request.version
         )
         return result
     except Exception as e:
@@ -500,7 +509,7 @@ async def submit_writing_answer(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/{session_id}/submit/speaking/{question_id}")
+@router.post("/{session_id}/submit/speaking/{question_id}", status_code=status.HTTP_202_ACCEPTED)
 async def submit_speaking_answer(
     session_id: str,
     question_id: int,
@@ -509,21 +518,41 @@ async def submit_speaking_answer(
     current_user: User = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_async_db)
 ):
+    """Stores the recording and queues transcription and evaluation; poll the returned job."""
     test_service = TestService(db)
-    session = await test_service.get_test_session(session_id)
-    if not session or session.user_id != current_user.id:
+    session = await test_service.get_test_session_summary(session_id)
+    if not session or session["user_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
         audio_data = await audio_file.read()
-        evaluation = await test_service.submit_speaking_answer(
-            question_id, audio_data, level
+        job = await test_service.enqueue_speaking_answer(
+            session_id, question_id, audio_data, level
         )
-        return evaluation
+        job["status_url"] = f"/api/v1/main-tests/{session_id}/speaking-jobs/{job['job_id']}"
+        return job
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/{session_id}/speaking-jobs/{job_id}")
+async def get_speaking_job(
+    session_id: str,
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    test_service = TestService(db)
+    session = await test_service.get_test_session_summary(session_id)
+    if not session or session["user_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    job = await speaking_jobs.get(job_id)
+    if not job or job["session_id"] != session_id:
+        raise HTTPException(status_code=404, detail="Speaking job not found")
+    return job
+
+
 @router.get("/{session_id}/audio/{filename}")
 async def get_audio_file(
     session_id: str,
@@ -532,17 +561,22 @@ async def get_audio_file(
     db: AsyncSession = Depends(get_async_db)
 ):
     test_service = TestService(db)
-    session = await test_service.get_test_session(session_id)
-    if not session or session.user_id != current_user.id:
+    session = await test_service.get_test_session_summary(session_id)
+    if not session or session["user_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    file_path = os.path.join("/app/audio", filename)
+    filename = os.path.basename(filename)
+    file_path = os.path.join(settings.tts_cache_dir, filename)
     if os.path.exists(file_path):
+        headers = {"Content-Disposition": f"inline; filename=\"{filename}\""}
+        if filename.startswith("tts_"):
+            headers["Cache-Control"] = "private, max-age=86400, immutable"
+            await tts_cache.touch(filename)
         return FileResponse(
             path=file_path, 
             media_type="audio/mpeg", 
             filename=filename,
-            headers={"Content-Disposition": f"inline; filename=\"{filename}\""}
+            headers=headers
         )
     raise HTTPException(status_code=404, detail="Audio file not found")
 
@@ -621,8 +655,6 @@ async def annul_main_test(
         raise HTTPException(status_code=404, detail="Test result not found")
     
     try:
-                                          
-        from ....schemas.test import TestSessionUpdate
         await test_service.update_test_session(
             session_id, 
             TestSessionUpdate(
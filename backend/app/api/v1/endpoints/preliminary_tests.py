@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
 import time
 import asyncio
@@ -21,6 +21,10 @@ class SubmitAnswerRequest(BaseModel):
     answer: str
 
 
+class BatchSubmitAnswersRequest(BaseModel):
+    answers: List[SubmitAnswerRequest]
+
+
                                     
 class InitRequest(BaseModel):
     uploadId: str
@@ -175,6 +179,28 @@ async def submit_answer(
         }
 
 
+@router.post("/{session_id}/submit/batch")
+async def submit_answers_batch(
+    session_id: int,
+    request: BatchSubmitAnswersRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Отправляет пакет ответов одним запросом"""
+    service = PreliminaryTestService(db)
+    
+    session = await service.get_preliminary_test_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    try:
+        return await service.submit_answers_batch(session_id, [a.dict() for a in request.answers])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/{session_id}/complete")
 async def complete_test(
     session_id: int,
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect, Request, Header
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional, Dict, Set
+from typing import AsyncIterator, Optional, Dict, Set
 import os
 import asyncio
 import logging
 import json
+import re
+import uuid
+import hashlib
+import aiofiles
 
 from ....core.database import get_async_db
+from ....core.task_dedup import task_dedup
+from ....core.config import settings
+from ....core.security import create_upload_token, verify_upload_token
 from ....models.user import User
-from ....models.test import TestSession, PreliminaryTestSession
 from ....api.deps import get_current_active_user
-from ....utils.file_paths import ensure_upload_directory, get_relative_upload_path, FileTypes
+from ....utils.recording_assembler import recording_assembler
 from ....tasks.file_processing import process_screen_recording
 from ....services.test_service import TestService
 from ....services.preliminary_test_service import PreliminaryTestService
@@ -19,6 +24,10 @@ from ....services.preliminary_test_service import PreliminaryTestService
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+CHECKSUM_MISMATCH_STATUS = 460
+
                                
 class ConnectionManager:
     def __init__(self):
@@ -78,6 +87,206 @@ async def determine_session_type(session_id: str, user_id: int, db: AsyncSession
     
     return None, None
 
+def recording_base_filename(session_id: str, session_type: str) -> str:
+    """Префикс файлов записи: у предварительных сессий prelim_<id>"""
+    return f"prelim_{session_id}" if session_type == 'preliminary' else session_id
+
+async def ingest_chunk(session_id: str, session_type: str, user_id: int, upload_id: str, chunk_index: int, is_final: bool):
+    """
+    Дописывает записанный чанк в сборку; когда загрузка собрана целиком, ставит
+    обработку итогового файла в очередь (один раз на загрузку)
+    """
+    base_filename = recording_base_filename(session_id, session_type)
+    state = await recording_assembler.add_chunk(session_id, base_filename, upload_id, chunk_index, is_final)
+    
+    if not state["complete"]:
+        return {
+            "status": "awaiting_chunks" if state["final_index"] is not None else "chunk_received",
+            "chunk_index": chunk_index,
+            "upload_id": upload_id,
+            "next_index": state["next_index"],
+            "missing": state["missing"],
+            "session_type": session_type
+        }
+    
+    task_id, created = await task_dedup.enqueue(
+        process_screen_recording,
+        f"{session_id}:{upload_id}",
+        kwargs={
+            "session_id": session_id,
+            "file_path": state["final_path"],
+            "user_id": user_id
+        }
+    )
+    if not created:
+        return {
+            "status": "processing",
+            "message": "Recording is already being processed",
+            "task_id": task_id,
+            "upload_id": upload_id,
+            "session_type": session_type,
+            "duplicate": True
+        }
+    logger.info(f"Recording {upload_id} of session {session_id} assembled, processing task {task_id}")
+    
+    return {
+        "status": "processing",
+        "message": "File uploaded successfully, processing in background",
+        "task_id": task_id,
+        "upload_id": upload_id,
+        "session_type": session_type
+    }
+
+def parse_chunk_checksum(header: Optional[str]) -> Optional[str]:
+    """
+    Разбирает X-Chunk-Checksum вида "sha256 <hex>" (как Upload-Checksum в tus),
+    возвращает ожидаемый hex-дайджест
+    """
+    if header is None:
+        return None
+    algorithm, _, digest = header.strip().partition(" ")
+    digest = digest.strip().lower()
+    if algorithm.lower() != "sha256":
+        raise HTTPException(status_code=400, detail=f"Unsupported checksum algorithm: {algorithm}")
+    if not SHA256_PATTERN.fullmatch(digest):
+        raise HTTPException(status_code=400, detail="Invalid sha256 checksum")
+    return digest
+
+async def read_upload_file(upload: UploadFile) -> AsyncIterator[bytes]:
+    while data := await upload.read(settings.upload_stream_buffer_bytes):
+        yield data
+
+async def stream_to_file(stream: AsyncIterator[bytes], path: str, max_bytes: int, checksum: Optional[str] = None) -> int:
+    """
+    Пишет поток байтов в файл буферами фиксированного размера (запись в пуле потоков),
+    прерывает загрузку при превышении max_bytes или несовпадении контрольной суммы.
+    Файл появляется под итоговым именем только после полной проверенной записи
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    buffer_size = settings.upload_stream_buffer_bytes
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            async for data in stream:
+                received += len(data)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Chunk exceeds {max_bytes} bytes")
+                digest.update(data)
+                buffer.extend(data)
+                if len(buffer) >= buffer_size:
+                    await f.write(bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await f.write(bytes(buffer))
+        if checksum is not None and digest.hexdigest() != checksum:
+            raise HTTPException(status_code=CHECKSUM_MISMATCH_STATUS, detail="Checksum mismatch")
+        await asyncio.to_thread(os.replace, tmp_path, path)
+    finally:
+        if await asyncio.to_thread(os.path.exists, tmp_path):
+            await asyncio.to_thread(os.remove, tmp_path)
+    return received
+
+@router.post("/screen-recording/{session_id}/token")
+async def create_screen_upload_token(
+    session_id: str,
+    upload_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Выдает подписанный токен загрузки одной записи: доступ к сессии проверяется один раз,
+    дальше чанки принимаются без обращений к БД. upload_id продлевает начатую загрузку
+    """
+    if upload_id is not None and not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        raise HTTPException(status_code=400, detail="Invalid upload_id")
+    session_type, session = await determine_session_type(session_id, current_user.id, db)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found or access denied")
+    
+    upload_id = upload_id or uuid.uuid4().hex
+    return {
+        "upload_token": create_upload_token(current_user.id, session_id, session_type, upload_id),
+        "upload_id": upload_id,
+        "session_type": session_type,
+        "expires_in": settings.upload_token_expire_minutes * 60,
+        "max_chunk_bytes": settings.screen_chunk_max_bytes
+    }
+
+def verify_chunk_grant(token: str, session_id: str) -> Dict:
+    grant = verify_upload_token(token, session_id)
+    if not grant:
+        raise HTTPException(status_code=401, detail="Invalid or expired upload token")
+    return grant
+
+@router.get("/screen-chunk/{session_id}")
+async def get_screen_upload_offset(
+    session_id: str,
+    x_upload_token: str = Header(...)
+):
+    """
+    Состояние загрузки, к которой относится токен: next_index и bytes - сколько
+    собрано подряд, buffered - полученные сверх этого чанки, missing - что досылать.
+    Клиент вызывает его после обрыва связи и продолжает с недостающих чанков
+    """
+    grant = verify_chunk_grant(x_upload_token, session_id)
+    base_filename = recording_base_filename(session_id, grant["stype"])
+    return await recording_assembler.status(session_id, base_filename, grant["upl"])
+
+@router.put("/screen-chunk/{session_id}/{chunk_index}")
+async def stream_screen_chunk(
+    session_id: str,
+    chunk_index: int,
+    request: Request,
+    is_final: bool = False,
+    x_upload_token: str = Header(...),
+    x_chunk_checksum: Optional[str] = Header(None)
+):
+    """
+    Потоковая загрузка чанка записи экрана: тело запроса - сырые байты чанка,
+    авторизация - токен из /screen-recording/{session_id}/token.
+    Повторная отправка уже полученного чанка не перезаписывает его
+    """
+    grant = verify_chunk_grant(x_upload_token, session_id)
+    if chunk_index < 0:
+        raise HTTPException(status_code=400, detail="chunk_index must be non-negative")
+    checksum = parse_chunk_checksum(x_chunk_checksum)
+    
+    max_bytes = settings.screen_chunk_max_bytes
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if int(content_length) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Chunk exceeds {max_bytes} bytes")
+    
+    session_type = grant["stype"]
+    upload_id = grant["upl"]
+    base_filename = recording_base_filename(session_id, session_type)
+    
+    try:
+        status = await recording_assembler.status(session_id, base_filename, upload_id)
+        if recording_assembler.has_chunk(status, chunk_index):
+            logger.info(f"Chunk {chunk_index} of upload {upload_id} already received, skipping")
+            result = await ingest_chunk(session_id, session_type, grant["uid"], upload_id, chunk_index, is_final)
+            result["already_received"] = True
+            return result
+        
+        chunk_path = await recording_assembler.chunk_path(session_id, base_filename, upload_id, chunk_index)
+        size = await stream_to_file(request.stream(), chunk_path, max_bytes, checksum)
+        logger.info(f"Chunk streamed: {chunk_path}, size: {size} bytes")
+        
+        result = await ingest_chunk(session_id, session_type, grant["uid"], upload_id, chunk_index, is_final)
+        result["size"] = size
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming chunk {chunk_index} for session {session_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
 @router.post("/screen-chunk/{session_id}")
 async def upload_screen_chunk(
     session_id: str,
@@ -88,10 +297,15 @@ async def upload_screen_chunk(
     db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Универсальный эндпоинт для загрузки чанков записи экрана
+    Универсальный эндпоинт для загрузки чанков записи экрана (multipart)
     Автоматически определяет тип сессии и обрабатывает файл
     """
     logger.info(f"Upload chunk for session {session_id}, chunk {chunk_index}, final: {is_final}")
+    if chunk_index < 0:
+        raise HTTPException(status_code=400, detail="chunk_index must be non-negative")
+    max_bytes = settings.screen_chunk_max_bytes
+    if chunk.size is not None and chunk.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Chunk exceeds {max_bytes} bytes")
     
     try:
                                
@@ -99,100 +313,21 @@ async def upload_screen_chunk(
         if not session:
             raise HTTPException(status_code=404, detail="Session not found or access denied")
         
-                                       
-        chunks_dir = ensure_upload_directory(f"{FileTypes.CHUNKS}/{session_id}")
-        
-                                                           
-        if session_type == 'preliminary':
-            base_filename = f"prelim_{session_id}"
-        else:
-            base_filename = session_id
-            
-        chunk_filename = f"{base_filename}_chunk_{chunk_index:04d}.webm"
-        chunk_path = os.path.join(chunks_dir, chunk_filename)
+        upload_id = await recording_assembler.legacy_upload_id(session_id, chunk_index)
+        base_filename = recording_base_filename(session_id, session_type)
+        chunk_path = await recording_assembler.chunk_path(session_id, base_filename, upload_id, chunk_index)
         
-                        
-        with open(chunk_path, "wb") as buffer:
-            content = await chunk.read()
-            buffer.write(content)
+        size = await stream_to_file(read_upload_file(chunk), chunk_path, max_bytes)
+        logger.info(f"Chunk saved: {chunk_path}, size: {size} bytes")
         
-        logger.info(f"Chunk saved: {chunk_path}, size: {len(content)} bytes")
-        
-                                                      
-        if is_final:
-            logger.info(f"Final chunk received, starting background processing for {session_id}")
-            
-                                            
-            final_dir = ensure_upload_directory(FileTypes.SCREEN_RECORDINGS)
-            final_filename = f"{base_filename}.webm"
-            final_path = os.path.join(final_dir, final_filename)
-            
-                              
-            await combine_chunks(chunks_dir, final_path, base_filename)
-            
-                                         
-            task = process_screen_recording.delay(
-                session_id=session_id,
-                file_path=final_path,
-                user_id=current_user.id
-            )
-            
-            return {
-                "status": "processing",
-                "message": "File uploaded successfully, processing in background",
-                "task_id": task.id,
-                "session_type": session_type
-            }
-        
-        return {
-            "status": "chunk_received",
-            "chunk_index": chunk_index,
-            "session_type": session_type
-        }
+        return await ingest_chunk(session_id, session_type, current_user.id, upload_id, chunk_index, is_final)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading chunk for session {session_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-async def combine_chunks(chunks_dir: str, output_path: str, base_filename: str):
-    """
-    Объединяет чанки в один файл
-    """
-    try:
-                                     
-        chunk_files = []
-        for filename in os.listdir(chunks_dir):
-            if filename.startswith(base_filename) and filename.endswith('.webm'):
-                chunk_files.append(os.path.join(chunks_dir, filename))
-        
-                                   
-        chunk_files.sort()
-        
-                          
-        with open(output_path, 'wb') as output_file:
-            for chunk_file in chunk_files:
-                with open(chunk_file, 'rb') as input_file:
-                    output_file.write(input_file.read())
-        
-        logger.info(f"Combined {len(chunk_files)} chunks into {output_path}")
-        
-                                 
-        for chunk_file in chunk_files:
-            try:
-                os.remove(chunk_file)
-            except:
-                pass
-                
-                                                   
-        try:
-            os.rmdir(chunks_dir)
-        except:
-            pass
-            
-    except Exception as e:
-        logger.error(f"Error combining chunks: {e}")
-        raise
-
 @router.get("/status/{session_id}")
 async def get_upload_status(
     session_id: str,
@@ -0,0 +1,57 @@
+import logging
+import math
+import os
+import time
+
+from celery.worker.autoscale import Autoscaler
+
+from app.core.config import settings
+from app.core.task_queues import QUEUES, queue_depths_sync
+
+logger = logging.getLogger(__name__)
+
+
+class QueueDepthAutoscaler(Autoscaler):
+    """
+    Celery autoscaler driven by broker queue depth instead of reserved requests.
+
+    With worker_prefetch_multiplier=1 a worker reserves at most one message per
+    process, so the stock autoscaler never sees the backlog. This one reads the
+    LLEN of every queue the worker consumes and wants one process per waiting task,
+    capped per queue by worker_queue_concurrency and overall by
+    worker_concurrency_per_cpu times the CPU count (and by --autoscale max).
+    Enabled with `celery worker --autoscale=<max>,<min>`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._demand = 0
+        self._demand_checked_at = 0.0
+        cpu_budget = math.floor((os.cpu_count() or 1) * settings.worker_concurrency_per_cpu)
+        self.max_concurrency = max(min(self.max_concurrency, cpu_budget), self.min_concurrency, 1)
+
+    def _consumed_queues(self):
+        try:
+            return [name for name in self.worker.app.amqp.queues.consume_from] or QUEUES
+        except Exception:
+            return QUEUES
+
+    def _broker_demand(self) -> int:
+        now = time.monotonic()
+        if now - self._demand_checked_at < settings.autoscale_poll_seconds:
+            return self._demand
+        self._demand_checked_at = now
+        try:
+            depths = queue_depths_sync(self._consumed_queues())
+        except Exception as e:
+            logger.warning(f"Autoscaler could not read queue depths: {e}")
+            return self._demand
+        self._demand = sum(
+            min(depth["total"], settings.worker_queue_concurrency.get(queue, 1))
+            for queue, depth in depths.items()
+        )
+        return self._demand
+
+    @property
+    def qty(self):
+        return super().qty + self._broker_demand()
@@ -1,6 +1,7 @@
 from celery import Celery
-from celery.signals import worker_process_init, worker_process_shutdown
+from celery.signals import worker_process_init, worker_process_shutdown, task_failure
 from app.core.config import settings
+from app.core.task_queues import build_task_routes, PRIORITY_DEFAULT, PRIORITY_STEPS
 import warnings
 import logging
 import asyncio
@@ -14,29 +15,88 @@ logging.getLogger('celery.backends.redis').setLevel(logging.ERROR)
                                                                  
 _WORKER_LOOP = None
 
+async def _warm_up_worker():
+    """
+    Opens the shared clients on the worker loop once, so every task reuses the
+    same DB pool, Redis connection pool and Azure OpenAI HTTP clients.
+    """
+    from sqlalchemy import select
+    from app.core.database import engine, async_engine, AsyncSessionLocal
+    from app.core.cache import cache
+    from app.utils.openai_service import openai_service
+    from app.utils.audio_service import audio_service
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    cache._async_client = None
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(select(1))
+    except Exception as e:
+        logging.warning(f"Worker database warm-up failed: {e}")
+
+    if await cache.get_async_client() is None:
+        logging.warning("Worker Redis warm-up failed")
+
+    logging.info(
+        f"Worker clients ready (chat: {openai_service.client is not None}, "
+        f"audio: {audio_service.tts_client is not None})"
+    )
+
+async def _close_worker_clients():
+    from app.core.database import async_engine
+    from app.core.cache import cache
+    from app.utils.openai_service import openai_service
+    from app.utils.audio_service import audio_service
+
+    for client in (openai_service.client, audio_service.tts_client, audio_service.transcribe_client):
+        if client is not None:
+            await client.close()
+    if cache._async_client is not None:
+        await cache._async_client.close()
+        cache._async_client = None
+    await async_engine.dispose()
+
 @worker_process_init.connect
 def init_async_loop(**kwargs):
     """
     Called once when each worker process starts.
-    Creates and stores a persistent event loop for this process.
+    Creates and stores a persistent event loop for this process and initializes
+    the DB engine, Redis client and Azure OpenAI clients on it.
     """
     global _WORKER_LOOP
     _WORKER_LOOP = asyncio.new_event_loop()
     asyncio.set_event_loop(_WORKER_LOOP)
+    _WORKER_LOOP.run_until_complete(_warm_up_worker())
     logging.info(f"Initialized asyncio event loop for worker process {kwargs.get('sender', 'unknown')}")
 
 @worker_process_shutdown.connect
 def shutdown_async_loop(**kwargs):
     """
     Called when worker process shuts down.
-    Properly closes the event loop.
+    Closes the shared clients, then the event loop.
     """
     global _WORKER_LOOP
     if _WORKER_LOOP:
+        try:
+            _WORKER_LOOP.run_until_complete(_close_worker_clients())
+        except Exception as e:
+            logging.warning(f"Failed to close worker clients: {e}")
         _WORKER_LOOP.close()
         asyncio.set_event_loop(None)
         logging.info("Closed asyncio event loop for worker process")
 
+@task_failure.connect
+def release_task_dedup(task_id=None, **kwargs):
+    """Lets a finally failed task be enqueued again for the same business key."""
+    from app.core.task_dedup import task_dedup
+
+    try:
+        task_dedup.release_task(task_id)
+    except Exception as e:
+        logging.warning(f"Failed to release dedup claim of task {task_id}: {e}")
+
 def get_worker_loop():
     """Get the persistent event loop for this worker process."""
     return _WORKER_LOOP
@@ -53,7 +113,8 @@ celery_app = Celery(
         'app.tasks.audio_processing', 
         'app.tasks.evaluation',
         'app.tasks.notifications',
-        'app.tasks.file_processing'
+        'app.tasks.file_processing',
+        'app.tasks.maintenance'
     ]
 )
 
@@ -66,13 +127,9 @@ celery_app.conf.update(
     enable_utc=True,
     
                   
-    task_routes={
-        'app.tasks.test_generation.*': {'queue': 'test_generation'},
-        'app.tasks.audio_processing.*': {'queue': 'audio_processing'},
-        'app.tasks.evaluation.*': {'queue': 'evaluation'},
-        'app.tasks.notifications.*': {'queue': 'notifications'},
-        'app.tasks.file_processing.*': {'queue': 'file_processing'},
-    },
+    task_routes=build_task_routes(),
+    task_default_priority=PRIORITY_DEFAULT,
+    worker_autoscaler='app.core.autoscale:QueueDepthAutoscaler',
     
                                                  
     worker_prefetch_multiplier=1,                                                         
@@ -97,6 +154,8 @@ celery_app.conf.update(
         'visibility_timeout': 3600,
         'fanout_prefix': True,
         'fanout_patterns': True,
+        'priority_steps': PRIORITY_STEPS,
+        'queue_order_strategy': 'priority',
     },
     
                          
@@ -105,9 +164,13 @@ celery_app.conf.update(
     
                                       
     beat_schedule={
+        'expire-due-sessions': {
+            'task': 'app.tasks.maintenance.expire_due_sessions',
+            'schedule': settings.session_expiry_poll_interval,
+        },
         'cleanup-expired-sessions': {
-            'task': 'app.tasks.maintenance.cleanup_expired_sessions',
-            'schedule': 3600.0,              
+            'task': 'cleanup_expired_sessions',
+            'schedule': 86400.0,
         },
         'cleanup-temp-files': {
             'task': 'app.tasks.maintenance.cleanup_temp_files',
@@ -117,9 +180,21 @@ celery_app.conf.update(
             'task': 'app.tasks.maintenance.health_check',
             'schedule': 600.0,                    
         },
-        'cleanup-old-uploads': {
-            'task': 'app.tasks.file_processing.cleanup_old_uploads',
-            'schedule': 10800.0,                                               
+        'refill-test-pool': {
+            'task': 'app.tasks.test_generation.refill_test_pool',
+            'schedule': settings.test_pool_refill_interval,
+        },
+        'evict-tts-cache': {
+            'task': 'app.tasks.maintenance.evict_tts_cache',
+            'schedule': 1800.0,
+        },
+        'flush-exam-state': {
+            'task': 'app.tasks.maintenance.flush_exam_state',
+            'schedule': settings.exam_state_flush_interval,
+        },
+        'cleanup-blobs': {
+            'task': 'app.tasks.maintenance.cleanup_blobs',
+            'schedule': 3600.0,
         },
     },
 )
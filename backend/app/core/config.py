@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -33,6 +33,48 @@ class Settings(BaseSettings):
     azure_openai_transcribe_deployment: str = "gpt-4o-transcribe"
     azure_openai_audio_api_version: str = "2025-03-01-preview" 
     azure_openai_tts_api_version: str = "2025-03-01-preview"
+    tts_max_concurrency: int = 4
+    tts_timeout_seconds: float = 45.0
+    tts_max_attempts: int = 4
+    tts_backoff_base_seconds: float = 1.0
+    tts_backoff_max_seconds: float = 20.0
+    llm_chat_rpm: int = 300
+    llm_chat_tpm: int = 150000
+    llm_tts_rpm: int = 60
+    llm_transcribe_rpm: int = 60
+    llm_reserve_generation: float = 0.1
+    llm_reserve_bulk: float = 0.3
+    llm_deadline_live_seconds: float = 60.0
+    llm_deadline_generation_seconds: float = 300.0
+    llm_deadline_bulk_seconds: float = 900.0
+    evaluation_batch_size: int = 6
+    evaluation_batch_window_ms: int = 250
+    transcription_audio_format: str = "flac"
+    ffmpeg_timeout_seconds: float = 60.0
+    ffmpeg_max_output_bytes: int = 100 * 1024 * 1024
+    blob_store_dir: str = "/app/uploads/blobs"
+    claim_check_threshold_bytes: int = 16 * 1024
+    blob_max_age_seconds: int = 24 * 3600
+    task_dedup_ttl_seconds: int = 3600
+    worker_concurrency_per_cpu: float = 2.0
+    worker_queue_concurrency: Dict[str, int] = {
+        "evaluation": 4,
+        "audio_processing": 2,
+        "test_generation": 2,
+        "file_processing": 1,
+        "notifications": 1,
+        "maintenance": 1,
+    }
+    autoscale_poll_seconds: float = 5.0
+    session_expiry_seconds: int = 24 * 3600
+    session_expiry_batch_size: int = 100
+    session_expiry_poll_interval: float = 10.0
+    upload_token_expire_minutes: int = 240
+    screen_chunk_max_bytes: int = 32 * 1024 * 1024
+    upload_stream_buffer_bytes: int = 1024 * 1024
+    tts_cache_dir: str = "/app/audio"
+    tts_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
+    tts_cache_min_idle_seconds: int = 24 * 3600
     
                         
     secret_key: str
@@ -68,6 +110,23 @@ class Settings(BaseSettings):
     celery_broker_url: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
     celery_result_backend: str = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
     
+    exam_state_flush_interval: float = 30.0
+    exam_state_flushed_ttl: int = 6 * 3600
+    
+    test_pool_levels_str: str = "A2,B1,B2,C1"
+    test_pool_low_watermark: int = 3
+    test_pool_target: int = 5
+    test_pool_refill_interval: float = 300.0
+    test_pool_generate_soft_time_limit: int = 1800
+    
+    @property
+    def test_pool_levels(self) -> list[str]:
+        return [level.strip() for level in self.test_pool_levels_str.split(",") if level.strip()]
+    
+    question_bank_compiled_path: str = os.getenv("QUESTION_BANK_COMPILED_PATH", "/tmp/entest/question_bank.bin")
+    question_bank_reload_interval: float = 5.0
+    question_bank_snapshot_dir: str = os.getenv("QUESTION_BANK_SNAPSHOT_DIR", "/app/uploads/question_bank_versions")
+    
                        
     default_timezone: str = "Asia/Almaty"
     timezone_display_format: str = "%d.%m.%Y, %H:%M:%S"
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+WRITING = "writing"
+SPEAKING = "speaking"
+
+PROMPT_VERSIONS = {
+    WRITING: "writing-v1",
+    SPEAKING: "speaking-v1",
+}
+
+REDIS_TTL = 7 * 24 * 3600
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str], casefold: bool = False) -> str:
+    """NFKC, collapsed whitespace and unified quotes; casefold only where case carries no grade."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.replace("‘", "'").replace("’", "'").replace("“", '"').replace("”", '"')
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.casefold() if casefold else text
+
+
+def prompt_fingerprint(kind: str) -> str:
+    """Changes whenever the evaluation prompt version or the chat deployment changes."""
+    return hashlib.sha256(f"{PROMPT_VERSIONS[kind]}\0{settings.azure_openai_deployment}".encode()).hexdigest()[:12]
+
+
+class EvaluationCache:
+    """
+    Single cache of writing/speaking evaluations shared by the API and Celery workers.
+
+    Keys are eval:<kind>:<prompt fingerprint>:<sha256 of the normalized task, answer and
+    level>. Writing answers keep their case because capitalization is graded; speaking
+    transcripts are casefolded. Values are evaluation dicts, kept in Redis for a week and
+    durably in the evaluation_cache table, which refills Redis on a miss.
+    """
+
+    def key(self, kind: str, task: str, answer: str, level: str) -> str:
+        canonical = "\0".join([
+            normalize_text(task, casefold=True),
+            normalize_text(answer, casefold=kind == SPEAKING),
+            normalize_text(level, casefold=True),
+        ])
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"eval:{kind}:{prompt_fingerprint(kind)}:{digest}"
+
+    def is_cacheable(self, evaluation: Optional[Dict[str, Any]]) -> bool:
+        """Manual-review fallbacks have no breakdown and must be retried, not cached."""
+        return bool(evaluation) and isinstance(evaluation, dict) and bool(evaluation.get("breakdown"))
+
+    async def get(self, kind: str, task: str, answer: str, level: str) -> Optional[Dict[str, Any]]:
+        from app.models.test import EvaluationCacheEntry
+
+        key = self.key(kind, task, answer, level)
+        evaluation = await cache.aget(key)
+        if evaluation:
+            return evaluation
+
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(EvaluationCacheEntry.evaluation).filter(EvaluationCacheEntry.key == key)
+                )
+                stored = result.scalar_one_or_none()
+        except Exception as e:
+            logger.warning(f"Evaluation cache lookup failed for {key}: {e}")
+            return None
+
+        if not stored:
+            return None
+        evaluation = json.loads(stored)
+        await cache.aset(key, evaluation, ttl=REDIS_TTL)
+        return evaluation
+
+    async def set(self, kind: str, task: str, answer: str, level: str, evaluation: Optional[Dict[str, Any]]) -> None:
+        from app.models.test import EvaluationCacheEntry
+
+        if not self.is_cacheable(evaluation):
+            return
+        key = self.key(kind, task, answer, level)
+        await cache.aset(key, evaluation, ttl=REDIS_TTL)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    pg_insert(EvaluationCacheEntry)
+                    .values(
+                        key=key,
+                        kind=kind,
+                        evaluation=json.dumps(evaluation, ensure_ascii=False),
+                        created_at=datetime.utcnow()
+                    )
+                    .on_conflict_do_nothing(index_elements=[EvaluationCacheEntry.key])
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to persist evaluation {key}: {e}")
+
+
+evaluation_cache = EvaluationCache()
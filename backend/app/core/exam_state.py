@@ -0,0 +1,287 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAIN = "main"
+PRELIMINARY = "preliminary"
+
+DIRTY_SESSIONS_KEY = "exam_state:dirty_sessions"
+VERSION_FIELD = "__version"
+DRAFT_STALE = -1
+
+_STAGE_SCRIPT = """
+local version = 0
+for i = 2, #ARGV, 2 do
+    version = redis.call('HINCRBY', KEYS[1], '__version', 1)
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    redis.call('HSET', KEYS[2], ARGV[i], version)
+end
+redis.call('PERSIST', KEYS[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+return version
+"""
+
+_STAGE_DRAFT_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[2])
+if current == 'sealed' or (current and tonumber(current) >= tonumber(ARGV[5])) then
+    return -1
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[5])
+local version = redis.call('HINCRBY', KEYS[1], '__version', 1)
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[4])
+redis.call('HSET', KEYS[2], ARGV[3], version)
+redis.call('PERSIST', KEYS[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+return version
+"""
+
+_CLEAR_FLUSHED_SCRIPT = """
+for i = 3, #ARGV, 2 do
+    if redis.call('HGET', KEYS[2], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[2], ARGV[i])
+    end
+end
+local pending = redis.call('HLEN', KEYS[2])
+if pending == 0 then
+    redis.call('SREM', KEYS[3], ARGV[1])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+return pending
+"""
+
+
+class ExamStateStore:
+    """
+    Live exam state (answers, drafts, timestamps) kept in one Redis hash per session
+    with write-behind to Postgres.
+
+    Unflushed entries have no TTL, so they survive `volatile-lru` eviction and are
+    persisted by AOF; the set of dirty sessions is replayed by `flush_all` on
+    startup and by the periodic `flush_exam_state` task. Once a session is fully
+    flushed its hash gets a TTL and becomes an ordinary cache entry.
+    """
+
+    def __init__(self):
+        self.flushed_ttl = settings.exam_state_flushed_ttl
+
+    def _state_key(self, kind: str, session_id) -> str:
+        return f"exam_state:{kind}:{session_id}"
+
+    def _dirty_key(self, kind: str, session_id) -> str:
+        return f"exam_state:{kind}:{session_id}:dirty"
+
+    def _member(self, kind: str, session_id) -> str:
+        return f"{kind}:{session_id}"
+
+    def _draft_field(self, question_id: int) -> str:
+        return f"__draft:{question_id}"
+
+    def _target(self, kind: str):
+        """Returns (model, session column, flushable columns) for a state kind."""
+        from app.models.test import Question, PreliminaryQuestion
+
+        if kind == MAIN:
+            return Question, Question.test_session_id, ("user_answer", "score", "feedback")
+        if kind == PRELIMINARY:
+            return PreliminaryQuestion, PreliminaryQuestion.session_id, ("user_answer", "is_correct", "answered_at")
+        raise ValueError(f"Unknown exam state kind: {kind}")
+
+    async def stage_answers(self, kind: str, session_id, answers: Dict[int, Dict[str, Any]]) -> Optional[int]:
+        """
+        Stages answers for several questions atomically.
+        Returns the new session version, or None when Redis is unavailable and the
+        caller has to write through to Postgres itself.
+        """
+        if not answers:
+            return None
+        try:
+            client = await cache.get_async_client()
+            args: List[Any] = [self._member(kind, session_id)]
+            for question_id, fields in answers.items():
+                args.extend([str(question_id), json.dumps(fields, default=str)])
+            script = client.register_script(_STAGE_SCRIPT)
+            version = await script(
+                keys=[self._state_key(kind, session_id), self._dirty_key(kind, session_id), DIRTY_SESSIONS_KEY],
+                args=args
+            )
+            return int(version)
+        except Exception as e:
+            logger.error(f"Failed to stage exam state for {kind}:{session_id}: {e}")
+            return None
+
+    async def stage_answer(self, kind: str, session_id, question_id: int, fields: Dict[str, Any]) -> Optional[int]:
+        return await self.stage_answers(kind, session_id, {question_id: fields})
+
+    async def stage_draft(self, kind: str, session_id, question_id: int, fields: Dict[str, Any], draft_version: int) -> Optional[int]:
+        """
+        Latest-wins staging of a draft guarded by a client-side version (compare-and-set).
+        Returns the new session version, DRAFT_STALE when a newer draft is already
+        stored or the answer was submitted, or None when Redis is unavailable.
+        """
+        try:
+            client = await cache.get_async_client()
+            script = client.register_script(_STAGE_DRAFT_SCRIPT)
+            version = await script(
+                keys=[self._state_key(kind, session_id), self._dirty_key(kind, session_id), DIRTY_SESSIONS_KEY],
+                args=[
+                    self._member(kind, session_id), self._draft_field(question_id), str(question_id),
+                    json.dumps(fields, default=str), int(draft_version)
+                ]
+            )
+            return int(version)
+        except Exception as e:
+            logger.error(f"Failed to stage draft for {kind}:{session_id}:{question_id}: {e}")
+            return None
+
+    async def get_draft_version(self, kind: str, session_id, question_id: int) -> Optional[str]:
+        """Returns the stored draft version ("sealed" after submission), or None if unknown."""
+        try:
+            client = await cache.get_async_client()
+            return await client.hget(self._state_key(kind, session_id), self._draft_field(question_id))
+        except Exception as e:
+            logger.error(f"Failed to read draft version for {kind}:{session_id}:{question_id}: {e}")
+            return None
+
+    async def seal_draft(self, kind: str, session_id, question_id: int) -> None:
+        """Drops a staged draft after a final submission and rejects any later draft for it."""
+        try:
+            client = await cache.get_async_client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(self._state_key(kind, session_id), self._draft_field(question_id), "sealed")
+                pipe.hdel(self._state_key(kind, session_id), str(question_id))
+                pipe.hdel(self._dirty_key(kind, session_id), str(question_id))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to seal draft for {kind}:{session_id}:{question_id}: {e}")
+
+    async def get_answer(self, kind: str, session_id, question_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            client = await cache.get_async_client()
+            value = await client.hget(self._state_key(kind, session_id), str(question_id))
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.error(f"Failed to read exam state for {kind}:{session_id}: {e}")
+            return None
+
+    async def discard(self, kind: str, session_id) -> None:
+        """Forgets the whole session state without flushing it."""
+        try:
+            client = await cache.get_async_client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(self._state_key(kind, session_id), self._dirty_key(kind, session_id))
+                pipe.srem(DIRTY_SESSIONS_KEY, self._member(kind, session_id))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to discard exam state for {kind}:{session_id}: {e}")
+
+    def _draft_guard(self, kind: str):
+        """Condition that keeps a draft-only flush from overwriting an evaluated answer."""
+        from app.models.test import Question
+
+        if kind == MAIN:
+            return Question.feedback.is_(None)
+        return None
+
+    def _to_row(self, question_id: int, fields: Dict[str, Any], columns) -> Dict[str, Any]:
+        row = {"id": question_id}
+        for name in columns:
+            if name not in fields:
+                continue
+            value = fields[name]
+            if name == "answered_at" and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            row[name] = value
+        return row
+
+    async def flush(self, kind: str, session_id, db=None) -> int:
+        """
+        Writes all dirty entries of a session to Postgres with one bulk UPDATE per
+        column set, so repeated draft saves coalesce into one write per flush.
+        Entries re-staged while the flush was running stay dirty.
+        Returns the number of rows written.
+        """
+        from app.utils.bulk_update import bulk_update_by_id
+
+        try:
+            client = await cache.get_async_client()
+            dirty = await client.hgetall(self._dirty_key(kind, session_id))
+        except Exception as e:
+            logger.error(f"Failed to read dirty exam state for {kind}:{session_id}: {e}")
+            return 0
+
+        if not dirty:
+            return 0
+
+        fields = list(dirty.keys())
+        values = await client.hmget(self._state_key(kind, session_id), fields)
+        model, session_column, columns = self._target(kind)
+        session_value = int(session_id) if kind == PRELIMINARY else str(session_id)
+
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for field, value in zip(fields, values):
+            if not value:
+                continue
+            row = self._to_row(int(field), json.loads(value), columns)
+            row_columns = tuple(name for name in columns if name in row)
+            if row_columns:
+                groups.setdefault(row_columns, []).append(row)
+
+        async def write(session) -> int:
+            written = 0
+            for row_columns, rows in groups.items():
+                where = session_column == session_value
+                guard = self._draft_guard(kind) if row_columns == ("user_answer",) else None
+                if guard is not None:
+                    where = where & guard
+                written += await bulk_update_by_id(session, model, rows, row_columns, where=where)
+            await session.commit()
+            return written
+
+        if db is not None:
+            written = await write(db)
+        else:
+            from app.core.database import AsyncSessionLocal
+            async with AsyncSessionLocal() as session:
+                written = await write(session)
+
+        args: List[Any] = [self._member(kind, session_id), self.flushed_ttl]
+        for field in fields:
+            args.extend([field, dirty[field]])
+        script = client.register_script(_CLEAR_FLUSHED_SCRIPT)
+        await script(
+            keys=[self._state_key(kind, session_id), self._dirty_key(kind, session_id), DIRTY_SESSIONS_KEY],
+            args=args
+        )
+
+        logger.info(f"Flushed {written} exam state rows for {kind}:{session_id}")
+        return written
+
+    async def flush_all(self) -> Dict[str, Any]:
+        """Flushes every session with unflushed state; used periodically and for crash recovery."""
+        try:
+            client = await cache.get_async_client()
+            members = await client.smembers(DIRTY_SESSIONS_KEY)
+        except Exception as e:
+            logger.error(f"Failed to list dirty exam sessions: {e}")
+            return {"sessions": 0, "rows": 0, "errors": 1}
+
+        rows = 0
+        errors = 0
+        for member in members:
+            kind, _, session_id = member.partition(":")
+            try:
+                rows += await self.flush(kind, session_id)
+            except Exception as e:
+                errors += 1
+                logger.error(f"Failed to flush exam state for {member}: {e}", exc_info=True)
+
+        return {"sessions": len(members), "rows": rows, "errors": errors}
+
+
+exam_state = ExamStateStore()
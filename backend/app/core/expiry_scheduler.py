@@ -0,0 +1,70 @@
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_KEY = "session_expiry"
+
+
+class ExpiryScheduler:
+    """
+    Deadlines of test sessions in one sorted set (score = unix deadline, member =
+    "<kind>:<session id>"). Sessions register when they are created; the maintenance
+    task pops only the members that are already due, in small batches, so the cost
+    of a run depends on how many sessions expire, not on how many exist.
+    """
+
+    def _member(self, kind: str, session_id) -> str:
+        return f"{kind}:{session_id}"
+
+    async def schedule(self, kind: str, session_id, deadline: Optional[float] = None) -> None:
+        deadline = deadline or time.time() + settings.session_expiry_seconds
+        try:
+            client = await cache.get_async_client()
+            await client.zadd(EXPIRY_KEY, {self._member(kind, session_id): deadline})
+        except Exception as e:
+            logger.error(f"Failed to schedule expiry of {kind}:{session_id}: {e}")
+
+    async def schedule_missing(self, entries: List[Tuple[str, object, float]]) -> int:
+        """Registers (kind, session id, deadline) entries that have no deadline yet."""
+        if not entries:
+            return 0
+        client = await cache.get_async_client()
+        return await client.zadd(
+            EXPIRY_KEY,
+            {self._member(kind, session_id): deadline for kind, session_id, deadline in entries},
+            nx=True,
+        )
+
+    async def cancel(self, kind: str, session_id) -> None:
+        try:
+            client = await cache.get_async_client()
+            await client.zrem(EXPIRY_KEY, self._member(kind, session_id))
+        except Exception as e:
+            logger.error(f"Failed to cancel expiry of {kind}:{session_id}: {e}")
+
+    async def claim_due(self, limit: int, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """
+        Pops up to limit due sessions as (kind, session id). A member belongs to the
+        caller whose ZREM removed it, so concurrent workers never process it twice.
+        """
+        client = await cache.get_async_client()
+        members = await client.zrangebyscore(EXPIRY_KEY, "-inf", now or time.time(), start=0, num=limit)
+        if not members:
+            return []
+        async with client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.zrem(EXPIRY_KEY, member)
+            removed = await pipe.execute()
+        return [tuple(member.split(":", 1)) for member, owned in zip(members, removed) if owned]
+
+    async def pending(self) -> int:
+        client = await cache.get_async_client()
+        return await client.zcard(EXPIRY_KEY)
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,247 @@
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LIVE = 0
+GENERATION = 1
+BULK = 2
+
+PRIORITY_NAMES = {LIVE: "live", GENERATION: "generation", BULK: "bulk"}
+
+CHAT = "chat"
+TTS = "tts"
+TRANSCRIBE = "transcribe"
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=GENERATION)
+
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local reserve = tonumber(ARGV[2])
+local wait = 0
+local state = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local cost = tonumber(ARGV[2 + i * 2])
+    local rate = capacity / 60000.0
+    local data = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(data[1])
+    local ts = tonumber(data[2])
+    if tokens == nil then
+        tokens = capacity
+        ts = now
+    end
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    state[i] = tokens
+    local floor = math.max(0, math.min(capacity * reserve, capacity - cost))
+    if tokens - cost < floor then
+        wait = math.max(wait, math.ceil((cost + floor - tokens) / rate))
+    end
+end
+if wait > 0 then
+    for i = 1, #KEYS do
+        redis.call('HSET', KEYS[i], 'tokens', state[i], 'ts', now)
+        redis.call('PEXPIRE', KEYS[i], 120000)
+    end
+    return wait
+end
+for i = 1, #KEYS do
+    local cost = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', state[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], 120000)
+end
+return 0
+"""
+
+_ADJUST_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local delta = tonumber(ARGV[2])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens == nil then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens + delta))
+return 1
+"""
+
+
+class LLMSchedulerTimeout(Exception):
+    """Raised when a request could not get budget before its deadline."""
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Sets the scheduling priority for LLM calls made inside the block (and tasks it spawns)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class Slot:
+    """Granted budget for one request; set actual_tokens to settle the token estimate."""
+
+    def __init__(self, resource: str, estimated_tokens: int):
+        self.resource = resource
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens: Optional[int] = None
+
+
+class LLMScheduler:
+    """
+    Quota-aware admission for Azure OpenAI calls shared by all API and worker processes.
+
+    Every resource has a Redis token bucket for requests per minute and, for chat,
+    another for tokens per minute. Lower priorities must leave a reserve of each
+    bucket untouched, so live evaluation keeps headroom while generation and
+    pregeneration queue. Callers wait until their deadline instead of failing;
+    waiting requests are tracked for queue depth and starvation metrics.
+    """
+
+    def __init__(self):
+        self.limits = {
+            CHAT: {"rpm": settings.llm_chat_rpm, "tpm": settings.llm_chat_tpm},
+            TTS: {"rpm": settings.llm_tts_rpm},
+            TRANSCRIBE: {"rpm": settings.llm_transcribe_rpm},
+        }
+        self.reserves = {
+            LIVE: 0.0,
+            GENERATION: settings.llm_reserve_generation,
+            BULK: settings.llm_reserve_bulk,
+        }
+        self.deadlines = {
+            LIVE: settings.llm_deadline_live_seconds,
+            GENERATION: settings.llm_deadline_generation_seconds,
+            BULK: settings.llm_deadline_bulk_seconds,
+        }
+
+    def _bucket_key(self, resource: str, kind: str) -> str:
+        return f"llm_sched:bucket:{resource}:{kind}"
+
+    def _waiters_key(self, resource: str) -> str:
+        return f"llm_sched:waiters:{resource}"
+
+    def _metrics_key(self, resource: str) -> str:
+        return f"llm_sched:metrics:{resource}"
+
+    async def _try_acquire(self, client, resource: str, tokens: int, priority: int) -> int:
+        """Returns 0 when budget was taken, otherwise the suggested wait in milliseconds."""
+        limits = self.limits[resource]
+        keys = [self._bucket_key(resource, "rpm")]
+        args = [int(time.time() * 1000), self.reserves[priority], limits["rpm"], 1]
+        if "tpm" in limits:
+            keys.append(self._bucket_key(resource, "tpm"))
+            args.extend([limits["tpm"], min(tokens, limits["tpm"])])
+        script = client.register_script(_ACQUIRE_SCRIPT)
+        return int(await script(keys=keys, args=args))
+
+    async def acquire(self, resource: str, tokens: int = 0, priority: Optional[int] = None,
+                      deadline: Optional[float] = None) -> None:
+        """Waits for budget; raises LLMSchedulerTimeout once the deadline (seconds from now) passes."""
+        priority = _current_priority.get() if priority is None else priority
+        deadline = self.deadlines[priority] if deadline is None else deadline
+        started = time.time()
+        expires_at = started + deadline
+
+        try:
+            client = await cache.get_async_client()
+        except Exception as e:
+            logger.warning(f"LLM scheduler unavailable, admitting {resource} request: {e}")
+            return
+
+        waiter = f"{PRIORITY_NAMES[priority]}:{uuid.uuid4().hex}"
+        waiting = False
+        try:
+            while True:
+                try:
+                    wait_ms = await self._try_acquire(client, resource, tokens, priority)
+                except Exception as e:
+                    logger.warning(f"LLM scheduler error, admitting {resource} request: {e}")
+                    return
+
+                if wait_ms == 0:
+                    waited_ms = int((time.time() - started) * 1000)
+                    async with client.pipeline(transaction=False) as pipe:
+                        pipe.hincrby(self._metrics_key(resource), f"granted:{PRIORITY_NAMES[priority]}", 1)
+                        pipe.hincrby(self._metrics_key(resource), f"waited_ms:{PRIORITY_NAMES[priority]}", waited_ms)
+                        await pipe.execute()
+                    return
+
+                now = time.time()
+                if now + wait_ms / 1000 > expires_at:
+                    await client.hincrby(self._metrics_key(resource), f"timeouts:{PRIORITY_NAMES[priority]}", 1)
+                    raise LLMSchedulerTimeout(
+                        f"No {resource} budget for {PRIORITY_NAMES[priority]} request within {deadline:.0f}s"
+                    )
+
+                if not waiting:
+                    await client.zadd(self._waiters_key(resource), {waiter: started})
+                    waiting = True
+                await asyncio.sleep(min(wait_ms / 1000, 5.0))
+        finally:
+            if waiting:
+                try:
+                    await client.zrem(self._waiters_key(resource), waiter)
+                except Exception:
+                    pass
+
+    async def settle(self, resource: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Corrects the TPM bucket by the difference between estimated and actual usage."""
+        limits = self.limits.get(resource, {})
+        if "tpm" not in limits or actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        try:
+            client = await cache.get_async_client()
+            script = client.register_script(_ADJUST_SCRIPT)
+            await script(
+                keys=[self._bucket_key(resource, "tpm")],
+                args=[limits["tpm"], estimated_tokens - actual_tokens]
+            )
+        except Exception as e:
+            logger.debug(f"Failed to settle {resource} tokens: {e}")
+
+    @asynccontextmanager
+    async def slot(self, resource: str, tokens: int = 0, priority: Optional[int] = None,
+                   deadline: Optional[float] = None):
+        await self.acquire(resource, tokens, priority, deadline)
+        granted = Slot(resource, tokens)
+        try:
+            yield granted
+        finally:
+            await self.settle(resource, tokens, granted.actual_tokens)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth, oldest waiter age per priority (starvation) and grant/timeout counters."""
+        client = await cache.get_async_client()
+        now = time.time()
+        max_deadline = max(self.deadlines.values())
+        result = {}
+        for resource in self.limits:
+            waiters_key = self._waiters_key(resource)
+            await client.zremrangebyscore(waiters_key, 0, now - max_deadline)
+            waiters = await client.zrange(waiters_key, 0, -1, withscores=True)
+            queues = {name: {"depth": 0, "oldest_wait_seconds": 0.0} for name in PRIORITY_NAMES.values()}
+            for member, since in waiters:
+                name = member.split(":", 1)[0]
+                if name in queues:
+                    queues[name]["depth"] += 1
+                    queues[name]["oldest_wait_seconds"] = max(queues[name]["oldest_wait_seconds"], round(now - since, 1))
+            counters = await client.hgetall(self._metrics_key(resource))
+            result[resource] = {
+                "limits": self.limits[resource],
+                "queues": queues,
+                "counters": {field: int(value) for field, value in counters.items()}
+            }
+        return result
+
+
+llm_scheduler = LLMScheduler()
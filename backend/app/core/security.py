@@ -51,6 +51,29 @@ def verify_token(token: str) -> Optional[str]:
         return None
 
 
+UPLOAD_TOKEN_SCOPE = "screen_upload"
+
+
+def create_upload_token(user_id: int, session_id: str, session_type: str, upload_id: str) -> str:
+    """Signed grant to upload one recording of a session; carries no "sub", so it is not an access token."""
+    return create_token(
+        {"scope": UPLOAD_TOKEN_SCOPE, "uid": user_id, "sid": session_id, "stype": session_type, "upl": upload_id},
+        secret_key=settings.secret_key,
+        default_expire_minutes=settings.upload_token_expire_minutes,
+    )
+
+
+def verify_upload_token(token: str, session_id: str) -> Optional[dict]:
+    """Returns the grant claims if the token is valid for this session, otherwise None."""
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    if payload.get("scope") != UPLOAD_TOKEN_SCOPE or payload.get("sid") != session_id:
+        return None
+    return payload
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
@@ -0,0 +1,85 @@
+import logging
+import uuid
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TaskDeduplicator:
+    """
+    Collapses duplicate enqueues of the same (task, business key) into one Celery task.
+
+    The first caller wins SET NX on task_dedup:<task>:<business key> with a pre-generated
+    task id; later callers get that id back instead of enqueuing again. The claim lives
+    for task_dedup_ttl_seconds and is released early only when the task finally fails,
+    so a retried request after an error can start a fresh run.
+    """
+
+    def _key(self, task_name: str, business_key: str) -> str:
+        return f"task_dedup:{task_name}:{business_key}"
+
+    def _task_key(self, task_id: str) -> str:
+        return f"task_dedup:task:{task_id}"
+
+    async def reserve(self, task_name: str, business_key: str, ttl: Optional[int] = None) -> Tuple[str, bool]:
+        """Returns (task id, True) for a new claim or (existing task id, False) for a duplicate."""
+        ttl = ttl or settings.task_dedup_ttl_seconds
+        key = self._key(task_name, business_key)
+        try:
+            client = await cache.get_async_client()
+            while True:
+                task_id = uuid.uuid4().hex
+                if await client.set(key, task_id, nx=True, ex=ttl):
+                    await client.set(self._task_key(task_id), key, ex=ttl)
+                    return task_id, True
+                existing = await client.get(key)
+                if existing:
+                    logger.info(f"Duplicate enqueue of {task_name} for {business_key}, reusing task {existing}")
+                    return existing, False
+        except Exception as e:
+            logger.warning(f"Redis unavailable, enqueuing {task_name} for {business_key} without deduplication: {e}")
+            return uuid.uuid4().hex, True
+
+    async def release(self, task_name: str, business_key: str) -> None:
+        key = self._key(task_name, business_key)
+        try:
+            client = await cache.get_async_client()
+            task_id = await client.get(key)
+            await client.delete(key, *([self._task_key(task_id)] if task_id else []))
+        except Exception as e:
+            logger.warning(f"Failed to release dedup claim {key}: {e}")
+
+    def release_task(self, task_id: str) -> None:
+        """Drops the claim held by task_id (sync, called from Celery signal handlers)."""
+        try:
+            client = cache.sync_client
+            key = client.get(self._task_key(task_id))
+            if key and client.get(key) == task_id:
+                client.delete(key)
+            client.delete(self._task_key(task_id))
+        except Exception as e:
+            logger.warning(f"Failed to release dedup claim of task {task_id}: {e}")
+
+    async def enqueue(
+        self,
+        task,
+        business_key: str,
+        args: Sequence[Any] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        ttl: Optional[int] = None,
+    ) -> Tuple[str, bool]:
+        """apply_async unless an equivalent task is already queued or running; returns (task id, created)."""
+        task_id, created = await self.reserve(task.name, business_key, ttl)
+        if created:
+            try:
+                task.apply_async(args=args, kwargs=kwargs, task_id=task_id)
+            except Exception:
+                await self.release(task.name, business_key)
+                raise
+        return task_id, created
+
+
+task_dedup = TaskDeduplicator()
@@ -0,0 +1,107 @@
+from typing import Dict, List
+
+from app.core.cache import cache
+
+EVALUATION = "evaluation"
+AUDIO_PROCESSING = "audio_processing"
+TEST_GENERATION = "test_generation"
+FILE_PROCESSING = "file_processing"
+NOTIFICATIONS = "notifications"
+MAINTENANCE = "maintenance"
+
+QUEUES = [EVALUATION, AUDIO_PROCESSING, TEST_GENERATION, FILE_PROCESSING, NOTIFICATIONS, MAINTENANCE]
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 3
+PRIORITY_BULK = 6
+PRIORITY_BACKGROUND = 9
+
+PRIORITY_STEPS = [PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BULK, PRIORITY_BACKGROUND]
+PRIORITY_SEP = "\x06\x16"
+
+MODULE_LANES = {
+    "app.tasks.evaluation.*": (EVALUATION, PRIORITY_INTERACTIVE),
+    "app.tasks.audio_processing.*": (AUDIO_PROCESSING, PRIORITY_INTERACTIVE),
+    "app.tasks.test_generation.*": (TEST_GENERATION, PRIORITY_BULK),
+    "app.tasks.file_processing.*": (FILE_PROCESSING, PRIORITY_DEFAULT),
+    "app.tasks.notifications.*": (NOTIFICATIONS, PRIORITY_DEFAULT),
+    "app.tasks.maintenance.*": (MAINTENANCE, PRIORITY_BACKGROUND),
+}
+
+TASK_LANES = {
+    "evaluate_writing_answer_async": (EVALUATION, PRIORITY_INTERACTIVE),
+    "evaluate_speaking_answer_async": (EVALUATION, PRIORITY_INTERACTIVE),
+    "calculate_final_scores": (EVALUATION, PRIORITY_INTERACTIVE),
+    "batch_evaluate_answers": (EVALUATION, PRIORITY_DEFAULT),
+    "precompute_evaluations": (EVALUATION, PRIORITY_BULK),
+    "process_audio_tts": (AUDIO_PROCESSING, PRIORITY_INTERACTIVE),
+    "process_audio_transcription": (AUDIO_PROCESSING, PRIORITY_INTERACTIVE),
+    "batch_generate_audio": (AUDIO_PROCESSING, PRIORITY_BULK),
+    "cleanup_audio_files": (AUDIO_PROCESSING, PRIORITY_BACKGROUND),
+    "generate_full_test_async": (TEST_GENERATION, PRIORITY_INTERACTIVE),
+    "generate_preliminary_test_async": (TEST_GENERATION, PRIORITY_INTERACTIVE),
+    "invalidate_test_cache": (TEST_GENERATION, PRIORITY_DEFAULT),
+    "pregenerate_tests": (TEST_GENERATION, PRIORITY_BULK),
+    "app.tasks.file_processing.cleanup_old_uploads": (FILE_PROCESSING, PRIORITY_BACKGROUND),
+    "send_system_alert": (NOTIFICATIONS, PRIORITY_INTERACTIVE),
+    "send_test_completion_notification": (NOTIFICATIONS, PRIORITY_DEFAULT),
+    "send_test_reminder": (NOTIFICATIONS, PRIORITY_DEFAULT),
+    "batch_send_notifications": (NOTIFICATIONS, PRIORITY_BULK),
+    "cleanup_old_notifications": (NOTIFICATIONS, PRIORITY_BACKGROUND),
+    "app.tasks.maintenance.expire_due_sessions": (MAINTENANCE, PRIORITY_DEFAULT),
+    "cleanup_expired_sessions": (MAINTENANCE, PRIORITY_BACKGROUND),
+    "cleanup_temp_files": (MAINTENANCE, PRIORITY_BACKGROUND),
+    "health_check": (MAINTENANCE, PRIORITY_BACKGROUND),
+    "optimize_cache": (MAINTENANCE, PRIORITY_BACKGROUND),
+    "backup_critical_data": (MAINTENANCE, PRIORITY_BACKGROUND),
+    "generate_performance_report": (MAINTENANCE, PRIORITY_BACKGROUND),
+}
+
+
+def build_task_routes() -> Dict[str, Dict[str, object]]:
+    """
+    Celery task_routes: explicitly named tasks first (they do not match the module
+    patterns), then one pattern per module. Each route carries its lane priority.
+    """
+    routes = {}
+    for name, (queue, priority) in {**TASK_LANES, **MODULE_LANES}.items():
+        routes[name] = {"queue": queue, "priority": priority}
+    return routes
+
+
+def priority_lists(queue: str) -> Dict[int, str]:
+    """Broker list names holding each priority lane of a queue (kombu Redis layout)."""
+    return {
+        priority: queue if priority == PRIORITY_STEPS[0] else f"{queue}{PRIORITY_SEP}{priority}"
+        for priority in PRIORITY_STEPS
+    }
+
+
+def _collect(queues: List[str], lengths: List[int]) -> Dict[str, Dict[str, object]]:
+    depths = {}
+    values = iter(lengths)
+    for queue in queues:
+        by_priority = {priority: int(next(values) or 0) for priority in PRIORITY_STEPS}
+        depths[queue] = {"total": sum(by_priority.values()), "by_priority": by_priority}
+    return depths
+
+
+def queue_depths_sync(queues: List[str] = None) -> Dict[str, Dict[str, object]]:
+    """Pending messages per queue and lane, read with LLEN straight from the broker."""
+    queues = queues or QUEUES
+    pipe = cache.sync_client.pipeline(transaction=False)
+    for queue in queues:
+        for name in priority_lists(queue).values():
+            pipe.llen(name)
+    return _collect(queues, pipe.execute())
+
+
+async def queue_depths(queues: List[str] = None) -> Dict[str, Dict[str, object]]:
+    queues = queues or QUEUES
+    client = await cache.get_async_client()
+    async with client.pipeline(transaction=False) as pipe:
+        for queue in queues:
+            for name in priority_lists(queue).values():
+                pipe.llen(name)
+        lengths = await pipe.execute()
+    return _collect(queues, lengths)
@@ -199,6 +199,21 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Cache initialization error: {e}")
     
+    try:
+        from app.utils.question_bank import question_bank
+        question_bank.load()
+        logger.info(f"Question bank loaded: {question_bank.stats()}")
+    except Exception as e:
+        logger.error(f"Question bank initialization error: {e}")
+    
+    try:
+        from app.core.exam_state import exam_state
+        replay = await exam_state.flush_all()
+        if replay["sessions"]:
+            logger.info(f"Replayed unflushed exam state: {replay}")
+    except Exception as e:
+        logger.error(f"Exam state replay error: {e}")
+    
                                
     try:
                                                    
@@ -282,6 +297,21 @@ async def health_check():
         health_status["services"]["database"] = f"error: {str(e)}"
         health_status["status"] = "unhealthy"
     
+    try:
+        from app.utils.tts_executor import tts_executor
+        health_status["tts"] = {
+            "local": tts_executor.local_stats(),
+            "global": await tts_executor.global_stats()
+        }
+    except Exception as e:
+        health_status["tts"] = f"error: {str(e)}"
+    
+    try:
+        from app.core.llm_scheduler import llm_scheduler
+        health_status["llm_scheduler"] = await llm_scheduler.stats()
+    except Exception as e:
+        health_status["llm_scheduler"] = f"error: {str(e)}"
+    
                             
     try:
         import psutil
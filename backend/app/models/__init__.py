@@ -1,6 +1,6 @@
 from .base import BaseModel
 from .user import User
-from .test import TestSession, Question, PreliminaryTestSession, PreliminaryQuestion
+from .test import TestSession, Question, Passage, PreliminaryTestSession, PreliminaryQuestion, PregeneratedTest, GenerationCheckpoint, EvaluationCacheEntry
 from .test_result import TestResult
 from .proctoring_violations import ProctoringViolation
 from .proctoring_log import ProctoringLog
@@ -11,8 +11,12 @@ __all__ = [
     "User", 
     "TestSession", 
     "Question", 
+    "Passage", 
     "PreliminaryTestSession", 
     "PreliminaryQuestion", 
+    "PregeneratedTest", 
+    "GenerationCheckpoint", 
+    "EvaluationCacheEntry", 
     "TestResult", 
     "ProctoringViolation", 
     "ProctoringLog",
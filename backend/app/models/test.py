@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Text, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Text, Boolean, Integer, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.database import Base
@@ -33,6 +33,15 @@ class TestSession(Base):
     preliminary_test = relationship("PreliminaryTestSession", backref="main_test")
 
 
+class Passage(Base):
+    __tablename__ = "passages"
+
+    id = Column(String(64), primary_key=True)
+    kind = Column(String)
+    text = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Question(Base):
     __tablename__ = "questions"
 
@@ -45,8 +54,10 @@ class Question(Base):
     user_answer = Column(Text, nullable=True)
     score = Column(Float, nullable=True)
     feedback = Column(Text, nullable=True)
+    passage_id = Column(String(64), ForeignKey("passages.id"), nullable=True, index=True)
 
     test_session = relationship("TestSession", back_populates="questions")
+    passage = relationship("Passage")
 
 
 class PreliminaryTestSession(Base):
@@ -74,10 +85,42 @@ class PreliminaryQuestion(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("preliminary_test_sessions.id"))
     category = Column(String)                                
-    question_data = Column(Text)                       
+    question_data = Column(Text, nullable=True)                       
+    bank_item_id = Column(String, nullable=True, index=True)
+    bank_item_version = Column(String(12), nullable=True)
+    sub_index = Column(Integer, nullable=True)
     user_answer = Column(String, nullable=True)
     is_correct = Column(Boolean, nullable=True)
     answered_at = Column(DateTime, nullable=True)
     order_number = Column(Integer)
 
-    session = relationship("PreliminaryTestSession", back_populates="questions") 
\ No newline at end of file
+    session = relationship("PreliminaryTestSession", back_populates="questions") 
+
+
+class PregeneratedTest(Base):
+    __tablename__ = "pregenerated_tests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    level = Column(String, index=True)
+    payload = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class GenerationCheckpoint(Base):
+    __tablename__ = "generation_checkpoints"
+    __table_args__ = (UniqueConstraint("session_id", "stage", name="uq_generation_checkpoints_session_stage"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("test_sessions.id", ondelete="CASCADE"), index=True)
+    stage = Column(String, nullable=False)
+    payload = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EvaluationCacheEntry(Base):
+    __tablename__ = "evaluation_cache"
+
+    key = Column(String, primary_key=True)
+    kind = Column(String, index=True)
+    evaluation = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -10,6 +10,7 @@ class QuestionBase(BaseModel):
     content: str
     options: Optional[str] = None
     correct_answer: Optional[str] = None
+    passage_id: Optional[str] = None
 
 
 class QuestionCreate(QuestionBase):
@@ -117,7 +118,10 @@ class PreliminaryTestSessionUpdate(BaseModel):
 class PreliminaryQuestionBase(BaseModel):
     session_id: int
     category: str
-    question_data: str
+    question_data: Optional[str] = None
+    bank_item_id: Optional[str] = None
+    bank_item_version: Optional[str] = None
+    sub_index: Optional[int] = None
     order_number: int
 
 
@@ -1,20 +1,25 @@
 import json
-import os
+import logging
 import random
 from typing import Dict, List, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from datetime import datetime
 
 from ..models.test import PreliminaryTestSession, PreliminaryQuestion
 from ..schemas.test import PreliminaryTestSessionCreate, PreliminaryQuestionCreate
 from ..utils.timezone import get_almaty_now
+from ..utils.bulk_update import bulk_update_by_id
+from ..utils.question_bank import question_bank
+from ..core.exam_state import exam_state, PRELIMINARY
+from ..core.expiry_scheduler import expiry_scheduler
+
+logger = logging.getLogger(__name__)
 
 
 class PreliminaryTestService:
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.questions_base_path = "/app/app/questions_data"
         
     async def create_preliminary_test_session(self, user_id: int) -> PreliminaryTestSession:
         """Создает новую сессию предварительного тестирования"""
@@ -26,6 +31,7 @@ class PreliminaryTestService:
         self.db.add(session)
         await self.db.commit()
         await self.db.refresh(session)
+        await expiry_scheduler.schedule(PRELIMINARY, session.id)
         return session
     
     async def get_preliminary_test_session(self, session_id: int) -> Optional[PreliminaryTestSession]:
@@ -57,20 +63,35 @@ class PreliminaryTestService:
         await self.db.refresh(session)
         return session
     
-    def _load_questions_from_file(self, level: str, category: str) -> List[Dict]:
-        """Загружает вопросы из JSON файла"""
-        file_path = os.path.join(self.questions_base_path, category, level, "questions.json")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return []
-    
-    def _select_first_questions(self, questions: List[Dict], count: int = 10) -> List[Dict]:
-        """Выбирает первые count вопросов из списка"""
-        if len(questions) <= count:
-            return questions
-        return questions[:count]
+    def _render_question_data(self, category: str, bank_item_id: Optional[str], bank_item_version: Optional[str],
+                              sub_index: Optional[int], question_data: Optional[str], items_cache: Dict = None) -> Dict:
+        """
+        Восстанавливает данные вопроса из общего банка по ссылке на элемент;
+        старые строки без ссылки читаются из question_data
+        """
+        if not bank_item_id:
+            return json.loads(question_data) if question_data else {}
+        
+        cache_key = f"{bank_item_id}@{bank_item_version}"
+        if items_cache is not None and cache_key in items_cache:
+            data = items_cache[cache_key]
+        else:
+            data = question_bank.get_version(bank_item_id, bank_item_version)
+            if data is None:
+                logger.error(f"Bank item {bank_item_id} version {bank_item_version} is no longer available")
+                if question_data:
+                    return json.loads(question_data)
+                raise RuntimeError(f"Question {bank_item_id}@{bank_item_version} cannot be rendered")
+            if items_cache is not None:
+                items_cache[cache_key] = data
+        
+        if category == "reading":
+            questions = data.get("questions", [])
+            return {
+                "text": data.get("text", ""),
+                "question": questions[sub_index] if sub_index is not None and sub_index < len(questions) else {}
+            }
+        return data
     
     async def generate_level_test(self, session_id: int, level: str) -> Dict[str, Any]:
         """Генерирует тест для определенного уровня"""
@@ -78,75 +99,49 @@ class PreliminaryTestService:
         if not session:
             raise Exception("Preliminary test session not found")
         
+        await exam_state.discard(PRELIMINARY, session_id)
+        
                                                 
         delete_stmt = PreliminaryQuestion.__table__.delete().where(PreliminaryQuestion.session_id == session_id)
         await self.db.execute(delete_stmt)
-        await self.db.commit()
         
-                                         
-        grammar_questions = self._load_questions_from_file(level, "grammar")
-        vocabulary_questions = self._load_questions_from_file(level, "vocabulary")
-        reading_questions = self._load_questions_from_file(level, "reading")
+        selected_grammar = await question_bank.sample("grammar", level, 10)
+        selected_vocabulary = await question_bank.sample("vocabulary", level, 10)
+        selected_reading = await question_bank.sample("reading", level, 10)
         
-                                                         
-        selected_grammar = self._select_first_questions(grammar_questions, 10)
-        selected_vocabulary = self._select_first_questions(vocabulary_questions, 10)
-        selected_reading = self._select_first_questions(reading_questions, 10)
-        
-                                         
-        all_questions = []
-        
-                           
-        for i, q in enumerate(selected_grammar):
-            question = PreliminaryQuestion(
-                session_id=session_id,
-                category="grammar",
-                question_data=json.dumps(q),
-                order_number=i + 1
-            )
-            self.db.add(question)
-            all_questions.append(question)
-        
-                              
-        for i, q in enumerate(selected_vocabulary):
-            question = PreliminaryQuestion(
-                session_id=session_id,
-                category="vocabulary", 
-                question_data=json.dumps(q),
-                order_number=i + 11                      
-            )
-            self.db.add(question)
-            all_questions.append(question)
+        rows = []
+        for category, items in (("grammar", selected_grammar), ("vocabulary", selected_vocabulary)):
+            for item in items:
+                rows.append({
+                    "session_id": session_id,
+                    "category": category,
+                    "bank_item_id": item.item_id,
+                    "bank_item_version": item.version,
+                    "sub_index": None,
+                    "order_number": len(rows) + 1
+                })
         
                                                          
-                                                                
         reading_questions_count = 0
-        for passage_data in selected_reading:
-            if "questions" in passage_data:
-                for i, q in enumerate(passage_data["questions"]):
-                                                              
-                    if reading_questions_count >= 10:
-                        break
-                        
-                    question_with_text = {
-                        "text": passage_data.get("text", ""),
-                        "question": q
-                    }
-                    question = PreliminaryQuestion(
-                        session_id=session_id,
-                        category="reading",
-                        question_data=json.dumps(question_with_text),
-                        order_number=len(all_questions) + 1
-                    )
-                    self.db.add(question)
-                    all_questions.append(question)
-                    reading_questions_count += 1
-                
-                                                              
+        for item in selected_reading:
+            for sub_index in range(len(item.data.get("questions", []))):
                 if reading_questions_count >= 10:
                     break
+                rows.append({
+                    "session_id": session_id,
+                    "category": "reading",
+                    "bank_item_id": item.item_id,
+                    "bank_item_version": item.version,
+                    "sub_index": sub_index,
+                    "order_number": len(rows) + 1
+                })
+                reading_questions_count += 1
+            
+            if reading_questions_count >= 10:
+                break
         
-        await self.db.commit()
+        if rows:
+            await self.db.execute(insert(PreliminaryQuestion), rows)
         
                                  
         session.current_level = level
@@ -156,7 +151,7 @@ class PreliminaryTestService:
         return {
             "session_id": session_id,
             "level": level,
-            "total_questions": len(all_questions),
+            "total_questions": len(rows),
             "grammar_count": len(selected_grammar),
             "vocabulary_count": len(selected_vocabulary),
             "reading_count": reading_questions_count
@@ -177,8 +172,11 @@ class PreliminaryTestService:
             "reading": []
         }
         
+        items_cache = {}
         for q in questions:
-            question_data = json.loads(q.question_data)
+            question_data = self._render_question_data(
+                q.category, q.bank_item_id, q.bank_item_version, q.sub_index, q.question_data, items_cache
+            )
             question_info = {
                 "id": q.id,
                 "order_number": q.order_number,
@@ -207,27 +205,30 @@ class PreliminaryTestService:
                 }
             
                                                              
-            was_answered_before = question.user_answer is not None
+            staged_answer = await exam_state.get_answer(PRELIMINARY, question.session_id, question_id)
+            previous_answer = staged_answer.get("user_answer") if staged_answer else question.user_answer
+            was_answered_before = previous_answer is not None
             if was_answered_before:
-                print(f"Question {question_id} answer being updated from '{question.user_answer}' to '{user_answer}'")
+                logger.debug(f"Question {question_id} answer being updated from '{previous_answer}' to '{user_answer}'")
             
-            question_data = json.loads(question.question_data)
-            
-                                                                    
-            if question.category in ["grammar", "vocabulary"]:
-                correct_answer = question_data.get("correct_answer")
-            elif question.category == "reading":
-                correct_answer = question_data.get("question", {}).get("correct_answer")
-            else:
-                correct_answer = None
+            correct_answer = self._get_correct_answer(question.category, self._render_question_data(
+                question.category, question.bank_item_id, question.bank_item_version,
+                question.sub_index, question.question_data
+            ))
             
             is_correct = user_answer == correct_answer
+            answered_at = get_almaty_now().replace(tzinfo=None)
             
-            question.user_answer = user_answer
-            question.is_correct = is_correct
-            question.answered_at = get_almaty_now().replace(tzinfo=None)
-            
-            await self.db.commit()
+            staged = await exam_state.stage_answer(PRELIMINARY, question.session_id, question_id, {
+                "user_answer": user_answer,
+                "is_correct": is_correct,
+                "answered_at": answered_at.isoformat()
+            })
+            if staged is None:
+                question.user_answer = user_answer
+                question.is_correct = is_correct
+                question.answered_at = answered_at
+                await self.db.commit()
             
             return {
                 "is_correct": is_correct,
@@ -246,8 +247,92 @@ class PreliminaryTestService:
     
 
 
+    def _get_correct_answer(self, category: str, data: Dict) -> Optional[str]:
+        """Извлекает правильный ответ из данных вопроса"""
+        if category in ["grammar", "vocabulary"]:
+            return data.get("correct_answer")
+        if category == "reading":
+            return data.get("question", {}).get("correct_answer")
+        return None
+
+    async def submit_answers_batch(self, session_id: int, answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Проверяет пакет ответов в памяти и кладет их в оперативное состояние экзамена;
+        без Redis сохраняет их одним UPDATE ... FROM (VALUES ...) с единственным коммитом
+        """
+        answers_by_id = {int(a["question_id"]): a["answer"] for a in answers}
+        if not answers_by_id:
+            return {"results": [], "missing": [], "updated": 0}
+        
+        try:
+            result = await self.db.execute(
+                select(
+                    PreliminaryQuestion.id,
+                    PreliminaryQuestion.category,
+                    PreliminaryQuestion.bank_item_id,
+                    PreliminaryQuestion.bank_item_version,
+                    PreliminaryQuestion.sub_index,
+                    PreliminaryQuestion.question_data,
+                    PreliminaryQuestion.user_answer
+                ).filter(
+                    PreliminaryQuestion.session_id == session_id,
+                    PreliminaryQuestion.id.in_(list(answers_by_id.keys()))
+                )
+            )
+            
+            answered_at = get_almaty_now().replace(tzinfo=None)
+            rows = []
+            results = []
+            items_cache = {}
+            for (question_id, category, bank_item_id, bank_item_version, sub_index,
+                 question_data, previous_answer) in result.all():
+                user_answer = answers_by_id[question_id]
+                correct_answer = self._get_correct_answer(category, self._render_question_data(
+                    category, bank_item_id, bank_item_version, sub_index, question_data, items_cache
+                ))
+                is_correct = user_answer == correct_answer
+                rows.append({
+                    "id": question_id,
+                    "user_answer": user_answer,
+                    "is_correct": is_correct,
+                    "answered_at": answered_at
+                })
+                results.append({
+                    "question_id": question_id,
+                    "is_correct": is_correct,
+                    "correct_answer": correct_answer,
+                    "was_updated": previous_answer is not None
+                })
+            
+            found_ids = {row["id"] for row in rows}
+            missing = [question_id for question_id in answers_by_id if question_id not in found_ids]
+            
+            staged = await exam_state.stage_answers(PRELIMINARY, session_id, {
+                row["id"]: {
+                    "user_answer": row["user_answer"],
+                    "is_correct": row["is_correct"],
+                    "answered_at": row["answered_at"].isoformat()
+                } for row in rows
+            })
+            if staged is not None:
+                updated = len(rows)
+            else:
+                updated = await bulk_update_by_id(
+                    self.db, PreliminaryQuestion, rows, ("user_answer", "is_correct", "answered_at"),
+                    where=PreliminaryQuestion.session_id == session_id
+                )
+                await self.db.commit()
+            
+            return {"results": results, "missing": missing, "updated": updated}
+        except Exception as e:
+            logger.error(f"Error in submit_answers_batch: {str(e)}")
+            await self.db.rollback()
+            raise e
+
     async def calculate_test_score(self, session_id: int) -> Dict[str, Any]:
         """Вычисляет результат теста"""
+        await exam_state.flush(PRELIMINARY, session_id, self.db)
+        
         result = await self.db.execute(
             select(PreliminaryQuestion)
             .filter(PreliminaryQuestion.session_id == session_id)
@@ -320,6 +405,7 @@ class PreliminaryTestService:
             session.determined_level = next_action.get("level")
             
             await self.db.commit()
+            await exam_state.discard(PRELIMINARY, session_id)
             
                                                                     
             if test_result_id:
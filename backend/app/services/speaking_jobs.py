@@ -0,0 +1,82 @@
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.cache import cache
+
+JOB_TTL = 24 * 3600
+
+QUEUED = "queued"
+TRANSCRIBING = "transcribing"
+EVALUATING = "evaluating"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def job_channel(session_id: str) -> str:
+    return f"speaking_jobs:{session_id}"
+
+
+class SpeakingJobStore:
+    """
+    Status of asynchronous speaking evaluations. Each job is a Redis hash; every
+    status change is also published on the session's speaking_jobs channel. Jobs that
+    have not finished yet are kept in a per-session set so scoring knows to hold off.
+    """
+
+    def _job_key(self, job_id: str) -> str:
+        return f"speaking_job:{job_id}"
+
+    def _pending_key(self, session_id: str) -> str:
+        return f"speaking_jobs:{session_id}:pending"
+
+    async def create(self, session_id: str, question_id: int, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        client = await cache.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), mapping={
+                "status": QUEUED,
+                "session_id": session_id,
+                "question_id": question_id,
+                "created_at": time.time(),
+            })
+            pipe.expire(self._job_key(job_id), JOB_TTL)
+            pipe.sadd(self._pending_key(session_id), job_id)
+            pipe.expire(self._pending_key(session_id), JOB_TTL)
+            await pipe.execute()
+        return job_id
+
+    async def update(self, job_id: str, status: str, **fields: Any) -> None:
+        client = await cache.get_async_client()
+        session_id = await client.hget(self._job_key(job_id), "session_id")
+        mapping = {"status": status, "updated_at": time.time()}
+        mapping.update({
+            name: json.dumps(value) if isinstance(value, (dict, list)) else value
+            for name, value in fields.items() if value is not None
+        })
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), mapping=mapping)
+            if session_id:
+                if status in (COMPLETED, FAILED):
+                    pipe.srem(self._pending_key(session_id), job_id)
+                pipe.publish(job_channel(session_id), json.dumps({"job_id": job_id, "status": status}))
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        client = await cache.get_async_client()
+        job = await client.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        job["job_id"] = job_id
+        job["question_id"] = int(job["question_id"])
+        if job.get("evaluation"):
+            job["evaluation"] = json.loads(job["evaluation"])
+        return job
+
+    async def has_pending(self, session_id: str) -> bool:
+        """True while any speaking job of the session has not finished yet."""
+        client = await cache.get_async_client()
+        return bool(await client.scard(self._pending_key(session_id)))
+
+speaking_jobs = SpeakingJobStore()
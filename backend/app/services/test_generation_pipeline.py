@@ -0,0 +1,210 @@
+import logging
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models.test import TestSession, Question, GenerationCheckpoint
+from ..utils.openai_service import openai_service
+from app.core.cache import cache
+from app.core.database import AsyncSessionLocal
+from .test_service import TestService, SECTION_TYPES
+
+logger = logging.getLogger(__name__)
+
+SECTION_PROCESSORS = {
+    "reading": "_process_reading_section",
+    "listening": "_process_listening_section",
+    "writing": "_process_writing_section",
+    "speaking": "_process_speaking_section",
+}
+
+READINESS_TTL = 3600
+
+
+def generation_channel(session_id: str) -> str:
+    return f"generation:{session_id}"
+
+
+def readiness_key(session_id: str) -> str:
+    return f"generation:{session_id}:sections"
+
+
+async def get_section_readiness(session_id: str) -> Dict[str, str]:
+    """Per-section state (pending, ready, error) of the current or last generation."""
+    try:
+        client = await cache.get_async_client()
+        return await client.hgetall(readiness_key(session_id))
+    except Exception as e:
+        logger.error(f"Failed to read section readiness for {session_id}: {e}")
+        return {}
+
+
+async def subscribe_generation_events(session_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yields generation events for the session. Subscribes before reading the readiness
+    snapshot so no section announced in between is lost; yields None every heartbeat
+    seconds without events so the caller can keep the connection alive.
+    """
+    client = await cache.get_async_client()
+    pubsub = client.pubsub()
+    await pubsub.subscribe(generation_channel(session_id))
+    try:
+        yield {"event": "snapshot", "sections": await client.hgetall(readiness_key(session_id))}
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                yield None
+                continue
+            try:
+                yield json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+    finally:
+        await pubsub.unsubscribe(generation_channel(session_id))
+        await pubsub.reset()
+
+
+class TestGenerationPipeline:
+    """
+    Generates and persists the sections of a main test independently. Each section is
+    announced on the session's Redis channel as soon as its questions are stored, so
+    reading and writing become available while listening and speaking audio is still
+    being synthesized.
+
+    Stages are checkpointed in generation_checkpoints: llm:<section> keeps the generated
+    section before anything else happens to it, persist:<section> marks its questions as
+    stored. A rerun for the same session resumes from the last completed stage; audio
+    survives on its own in the content-addressed TTS cache.
+    """
+
+    def __init__(self, session_id: str, level: str):
+        self.session_id = session_id
+        self.level = level
+        self.checkpoints: Dict[str, Any] = {}
+        self.resumed = False
+
+    async def load_checkpoints(self) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GenerationCheckpoint.stage, GenerationCheckpoint.payload)
+                .filter(GenerationCheckpoint.session_id == self.session_id)
+            )
+            self.checkpoints = {stage: json.loads(payload) for stage, payload in result.all()}
+        self.resumed = bool(self.checkpoints)
+        return self.checkpoints
+
+    async def _save_checkpoint(self, stage: str, payload: Any) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                pg_insert(GenerationCheckpoint)
+                .values(
+                    session_id=self.session_id,
+                    stage=stage,
+                    payload=json.dumps(payload, ensure_ascii=False),
+                    created_at=datetime.utcnow()
+                )
+                .on_conflict_do_nothing(index_elements=[GenerationCheckpoint.session_id, GenerationCheckpoint.stage])
+            )
+            await db.commit()
+        self.checkpoints[stage] = payload
+
+    async def _announce(self, event: Dict[str, Any]) -> None:
+        try:
+            client = await cache.get_async_client()
+            async with client.pipeline(transaction=False) as pipe:
+                if event.get("event") == "section":
+                    pipe.hset(readiness_key(self.session_id), event["section"], event["status"])
+                    pipe.expire(readiness_key(self.session_id), READINESS_TTL)
+                pipe.publish(generation_channel(self.session_id), json.dumps(event))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to announce generation event for {self.session_id}: {e}")
+
+    async def fail(self, message: str) -> None:
+        await self._announce({"event": "error", "message": message})
+
+    async def _run_section(self, section: str, section_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            result = self.checkpoints.get(f"persist:{section}")
+            if result is None:
+                result = await self._generate_and_persist(section, section_data)
+            else:
+                logger.debug(f"Section '{section}' already persisted for session {self.session_id}")
+        except Exception as e:
+            logger.error(f"Failed to generate {section} section for session {self.session_id}: {e}")
+            result = {"error": f"Failed to process {section} section: {str(e)}"}
+
+        status = "error" if isinstance(result, dict) and "error" in result else "ready"
+        await self._announce({"event": "section", "section": section, "status": status})
+        logger.debug(f"Section '{section}' {status} for session {self.session_id}")
+        return result
+
+    async def _generate_and_persist(self, section: str, section_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        llm_stage = f"llm:{section}"
+        if llm_stage in self.checkpoints:
+            section_data = self.checkpoints[llm_stage]
+        else:
+            if section_data is None:
+                section_data = await openai_service.generate_section(self.level, section)
+            if section_data and not (isinstance(section_data, dict) and "error" in section_data):
+                await self._save_checkpoint(llm_stage, section_data)
+
+        async with AsyncSessionLocal() as db:
+            if self.resumed:
+                await db.execute(
+                    delete(Question).where(
+                        Question.test_session_id == self.session_id,
+                        Question.question_type == section
+                    )
+                )
+                await db.commit()
+            test_service = TestService(db)
+            result = await test_service._process_section(
+                self.session_id, section, section_data, getattr(test_service, SECTION_PROCESSORS[section])
+            )
+
+        if not (isinstance(result, dict) and "error" in result):
+            await self._save_checkpoint(f"persist:{section}", result)
+        return result
+
+    async def run(self, test_data: Optional[Dict[str, Any]] = None, finalize_on_error: bool = True) -> Dict[str, Any]:
+        """
+        Runs every section concurrently, resuming from stored checkpoints. test_data holds
+        already generated sections (e.g. a pooled test); missing sections are generated here.
+        With finalize_on_error=False a run with failed sections leaves the session generating
+        so that a retry can resume it.
+        """
+        test_data = test_data or {}
+        await self.load_checkpoints()
+        if self.resumed:
+            logger.debug(f"Resuming generation for session {self.session_id} from {sorted(self.checkpoints)}")
+        client = await cache.get_async_client()
+        await client.delete(readiness_key(self.session_id))
+        await client.hset(readiness_key(self.session_id), mapping={section: "pending" for section in SECTION_TYPES})
+        await client.expire(readiness_key(self.session_id), READINESS_TTL)
+
+        results = await asyncio.gather(*[
+            self._run_section(section, test_data.get(section)) for section in SECTION_TYPES
+        ])
+        result = dict(zip(SECTION_TYPES, results))
+
+        failed = [section for section, data in result.items() if isinstance(data, dict) and "error" in data]
+        if failed and not finalize_on_error:
+            logger.warning(f"Sections {failed} failed for session {self.session_id}, leaving it resumable")
+            return result
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(TestSession).where(TestSession.id == self.session_id).values(status="ready")
+            )
+            await db.execute(delete(GenerationCheckpoint).where(GenerationCheckpoint.session_id == self.session_id))
+            await db.commit()
+        await cache.adelete(f"exam_bundle:{self.session_id}")
+
+        await self._announce({"event": "completed", "failed_sections": failed})
+        logger.debug(f"Session status updated to 'ready' for {self.session_id}, failed sections: {failed}")
+        return result
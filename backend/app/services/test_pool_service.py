@@ -0,0 +1,104 @@
+import logging
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.test import PregeneratedTest
+from ..utils.openai_service import openai_service
+from ..utils.tts_cache import tts_cache
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEVEL_ALIASES = {
+    "beginner": "A1",
+    "elementary": "A1",
+    "pre_intermediate": "A2",
+    "intermediate": "B1",
+    "upper_intermediate": "B2",
+    "advanced": "C1",
+    "proficiency": "C2",
+}
+
+
+def normalize_level(level: Optional[str]) -> str:
+    """Maps preliminary level names (intermediate, advanced, ...) and CEFR codes to a CEFR code."""
+    if not level:
+        return "B1"
+    key = level.strip().lower().replace("-", "_").replace(" ", "_")
+    if key in LEVEL_ALIASES:
+        return LEVEL_ALIASES[key]
+    return level.strip().upper()
+
+
+class TestPoolService:
+    """Durable inventory of ready-to-use full tests per CEFR level."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def count_ready(self, levels: Optional[List[str]] = None) -> Dict[str, int]:
+        levels = [normalize_level(level) for level in (levels or settings.test_pool_levels)]
+        result = await self.db.execute(
+            select(PregeneratedTest.level, func.count(PregeneratedTest.id))
+            .filter(PregeneratedTest.level.in_(levels))
+            .group_by(PregeneratedTest.level)
+        )
+        counts = {level: 0 for level in levels}
+        counts.update({level: count for level, count in result.all()})
+        return counts
+
+    async def claim(self, level: str) -> Optional[Dict[str, Any]]:
+        """
+        Takes the oldest pooled test for the level. SKIP LOCKED lets concurrent
+        candidates claim different rows without waiting on each other.
+        """
+        level = normalize_level(level)
+        result = await self.db.execute(
+            select(PregeneratedTest.id, PregeneratedTest.payload)
+            .filter(PregeneratedTest.level == level)
+            .order_by(PregeneratedTest.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        row = result.first()
+        if not row:
+            return None
+
+        await self.db.execute(delete(PregeneratedTest).where(PregeneratedTest.id == row.id))
+        await self.db.commit()
+        logger.debug(f"Claimed pooled test {row.id} for level {level}")
+        test_data = json.loads(row.payload)
+        await self._prerender_audio(test_data)
+        return test_data
+
+    async def _prerender_audio(self, test_data: Dict[str, Any]) -> None:
+        """
+        Renders listening and speaking audio into the shared TTS cache. Called again on
+        claim: cached files are touched, files evicted while the test sat in the pool
+        are synthesized again.
+        """
+        for scenario in (test_data.get("listening") or {}).get("scenarios", []):
+            if scenario.get("audio_script"):
+                scenario["audio_path"] = await tts_cache.get_or_synthesize(scenario["audio_script"])
+        for question in (test_data.get("speaking") or {}).get("questions", []):
+            if question.get("question"):
+                audio_text = f"{question['question']} {question.get('follow_up', '')}".strip()
+                question["audio_path"] = await tts_cache.get_or_synthesize(audio_text)
+
+    async def generate_one(self, level: str) -> bool:
+        """Generates a complete test with audio and stores it; incomplete tests are discarded."""
+        level = normalize_level(level)
+        test_data = await openai_service.generate_full_test(level, use_cache=False)
+        failed = [section for section, data in test_data.items() if not data or (isinstance(data, dict) and "error" in data)]
+        if failed:
+            logger.error(f"Not pooling {level} test, failed sections: {failed}")
+            return False
+
+        await self._prerender_audio(test_data)
+        self.db.add(PregeneratedTest(level=level, payload=json.dumps(test_data, ensure_ascii=False)))
+        await self.db.commit()
+        logger.debug(f"Added pooled test for level {level}")
+        return True
@@ -1,19 +1,37 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import logging
 import json
 import asyncio
 import os
 import hashlib
+import time
+import aiofiles
 
-from ..models.test import TestSession, Question
+from ..models.test import TestSession, Question, Passage
 from ..schemas.test import TestSessionCreate, TestSessionUpdate, QuestionCreate, QuestionUpdate
 from ..utils.openai_service import openai_service
 from ..utils.audio_service import audio_service
+from ..utils.tts_cache import tts_cache
+from ..utils.evaluation_batcher import evaluation_batcher
+from .speaking_jobs import speaking_jobs, QUEUED, TRANSCRIBING, EVALUATING
 from app.core.cache import cache
+from app.core.exam_state import exam_state, MAIN, DRAFT_STALE
+from app.core.llm_scheduler import llm_priority, LIVE
+from app.core.evaluation_cache import evaluation_cache, WRITING, SPEAKING
+from app.core.task_dedup import task_dedup
+from app.core.expiry_scheduler import expiry_scheduler
 from ..utils.timezone import get_almaty_now
+from ..utils.bulk_update import bulk_update_by_id
+
+logger = logging.getLogger(__name__)
+
+
+SECTION_TYPES = ("reading", "listening", "writing", "speaking")
 
 
 class TestService:
@@ -53,6 +71,7 @@ class TestService:
         self.db.add(db_session)
         await self.db.commit()
         await self.db.refresh(db_session)
+        await expiry_scheduler.schedule(MAIN, db_session.id)
         
                                                                                         
         return await self.get_test_session(db_session.id)
@@ -71,41 +90,68 @@ class TestService:
         return db_session
 
     async def complete_test_session(self, session_id: str, test_result_id: int = None) -> Optional[TestSession]:
+        await exam_state.flush(MAIN, session_id, self.db)
         db_session = await self.get_test_session(session_id)
         if not db_session:
             return None
 
+        db_session.status = "completed"
+        db_session.end_time = get_almaty_now().replace(tzinfo=None)
+        await self._apply_scores(db_session)
+        
+        await self.db.commit()
+        await self.db.refresh(db_session)
+        await exam_state.discard(MAIN, session_id)
+        
+                                                                
+        if test_result_id:
+            from .test_result_service import TestResultService
+            result_service = TestResultService(self.db)
+            await result_service.update_main_test_results(test_result_id, db_session)
+        
+        return db_session
+
+    async def _apply_scores(self, db_session: TestSession) -> None:
+        """
+        Scores every section. While speaking evaluations are still queued the speaking,
+        final and CEFR scores stay empty; the last finished job fills them in.
+        """
+        session_id = db_session.id
         reading_score = await self._calculate_section_score(session_id, "reading")
         listening_score = await self._calculate_section_score(session_id, "listening") 
         writing_score = await self._calculate_section_score(session_id, "writing")
-        speaking_score = await self._calculate_section_score(session_id, "speaking")
 
-        all_scores = [s for s in [reading_score, listening_score, writing_score, speaking_score] if s is not None]
-        final_score = sum(all_scores) / len(all_scores) if all_scores else 0.0
-
-        cefr_level = openai_service.calculate_cefr_level(
-            reading_score, listening_score, writing_score, speaking_score
-        )
+        if await speaking_jobs.has_pending(session_id):
+            logger.info(f"Session {session_id} completed with speaking evaluations pending")
+            speaking_score = final_score = cefr_level = None
+        else:
+            speaking_score = await self._calculate_section_score(session_id, "speaking")
+            all_scores = [reading_score, listening_score, writing_score, speaking_score]
+            final_score = sum(all_scores) / len(all_scores)
+            cefr_level = openai_service.calculate_cefr_level(
+                reading_score, listening_score, writing_score, speaking_score
+            )
 
-        db_session.status = "completed"
-        db_session.end_time = get_almaty_now().replace(tzinfo=None)
         db_session.reading_score = reading_score
         db_session.listening_score = listening_score
         db_session.writing_score = writing_score
         db_session.speaking_score = speaking_score
         db_session.final_score = final_score
         db_session.cefr_level = cefr_level
-        
+
+    async def refresh_completed_scores(self, session_id: str) -> None:
+        """Rescores a completed session whose speaking evaluation finished after completion."""
+        db_session = await self.get_test_session(session_id)
+        if not db_session or db_session.status != "completed":
+            return
+        await self._apply_scores(db_session)
         await self.db.commit()
         await self.db.refresh(db_session)
         
-                                                                
+        test_result_id = await self.get_test_result_id_by_main_session(session_id)
         if test_result_id:
             from .test_result_service import TestResultService
-            result_service = TestResultService(self.db)
-            await result_service.update_main_test_results(test_result_id, db_session)
-        
-        return db_session
+            await TestResultService(self.db).update_main_test_results(test_result_id, db_session)
 
     async def _bulk_create_questions(self, questions_data: List[QuestionCreate]) -> List[Question]:
         try:
@@ -119,7 +165,7 @@ class TestService:
             
             return db_questions
         except Exception as e:
-            print(f"[ERROR] Failed to bulk create questions: {e}")
+            logger.error(f"Failed to bulk create questions: {e}")
             await self.db.rollback()
             raise e
 
@@ -130,8 +176,23 @@ class TestService:
         await self.db.refresh(db_question)
         return db_question
 
+    async def get_test_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Lightweight lookup of ownership and status without loading questions."""
+        result = await self.db.execute(
+            select(TestSession.id, TestSession.user_id, TestSession.status, TestSession.start_time)
+            .filter(TestSession.id == session_id)
+        )
+        row = result.first()
+        if not row:
+            return None
+        return {"id": row.id, "user_id": row.user_id, "status": row.status, "start_time": row.start_time}
+
     async def get_session_questions(self, session_id: str) -> List[Question]:
-        result = await self.db.execute(select(Question).filter(Question.test_session_id == session_id))
+        result = await self.db.execute(
+            select(Question)
+            .filter(Question.test_session_id == session_id)
+            .execution_options(populate_existing=True)
+        )
         return result.scalars().all()
 
     async def get_session_questions_by_type(self, session_id: str, question_type: str) -> List[Question]:
@@ -141,6 +202,153 @@ class TestService:
         ))
         return result.scalars().all()
 
+    async def _store_passage(self, kind: str, text: str) -> Optional[str]:
+        """Stores a passage once under its sha256 digest and returns the digest."""
+        if not text:
+            return None
+        passage_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        await self.db.execute(
+            pg_insert(Passage)
+            .values(id=passage_id, kind=kind, text=text)
+            .on_conflict_do_nothing(index_elements=[Passage.id])
+        )
+        return passage_id
+
+    async def get_passages(self, questions: List[Question]) -> Dict[str, str]:
+        """Fetches every passage referenced by the given questions with one query."""
+        passage_ids = {q.passage_id for q in questions if q.passage_id}
+        if not passage_ids:
+            return {}
+        result = await self.db.execute(select(Passage.id, Passage.text).filter(Passage.id.in_(passage_ids)))
+        return {passage_id: text for passage_id, text in result.all()}
+
+    def _question_content(self, q: Question, passages: Dict[str, str]) -> Dict[str, Any]:
+        """Decodes question content, restoring the shared passage for legacy-shaped consumers."""
+        content = json.loads(q.content) if q.content else {}
+        if q.passage_id and q.passage_id in passages:
+            content.setdefault("passage" if q.question_type == "reading" else "audio_script", passages[q.passage_id])
+        return content
+
+    def format_section_questions(
+        self, question_type: str, questions: List[Question], session_id: Optional[str] = None,
+        passages: Optional[Dict[str, str]] = None
+    ) -> Any:
+        """Formats stored questions of one section into the payload the client renders."""
+        questions = sorted(questions, key=lambda q: q.id)
+        passages = passages or {}
+
+        if question_type == "reading":
+            first_content = self._question_content(questions[0], passages) if questions else {}
+            formatted_questions = []
+            for q in questions:
+                content = json.loads(q.content)
+                formatted_questions.append({
+                    "id": q.id,
+                    "question": content["question"],
+                    "options": json.loads(q.options) if q.options else {},
+                    "question_number": content.get("question_number", 1)
+                })
+            return {
+                "passage": first_content.get("passage", ""),
+                "questions": formatted_questions
+            }
+
+        formatted = []
+        for i, q in enumerate(questions):
+            try:
+                content = json.loads(q.content) if q.content else {}
+                if question_type == "listening":
+                    item = {
+                        "id": q.id,
+                        "audio_path": content.get("audio_path", ""),
+                        "question": content.get("question", ""),
+                        "options": json.loads(q.options) if q.options else {},
+                        "scenario_number": content.get("scenario_number", i + 1)
+                    }
+                elif question_type == "writing":
+                    item = {
+                        "id": q.id,
+                        "title": content.get("title", ""),
+                        "prompt": content.get("prompt", ""),
+                        "instructions": content.get("instructions", ""),
+                        "word_count": content.get("word_count", 250),
+                        "time_limit": content.get("time_limit", 25),
+                        "evaluation_criteria": content.get("evaluation_criteria", []),
+                        "prompt_number": content.get("prompt_number", i + 1)
+                    }
+                elif question_type == "speaking":
+                    item = {
+                        "id": q.id,
+                        "type": content.get("type", "personal"),
+                        "question": content.get("question", ""),
+                        "follow_up": content.get("follow_up", ""),
+                        "preparation_time": content.get("preparation_time", 15),
+                        "speaking_time": content.get("speaking_time", 60),
+                        "evaluation_criteria": content.get("evaluation_criteria", []),
+                        "audio_path": content.get("audio_path", ""),
+                        "question_number": content.get("question_number", i + 1)
+                    }
+                else:
+                    continue
+
+                if session_id and item.get("audio_path"):
+                    item["audio_url"] = f"/api/v1/main-tests/{session_id}/audio/{os.path.basename(item['audio_path'])}"
+                formatted.append(item)
+            except Exception as e:
+                logger.error(f"Failed to format {question_type} question {q.id}: {e}")
+                continue
+
+        logger.debug(f"Formatted {len(formatted)} {question_type} questions")
+        return formatted
+
+    async def get_session_bundle(self, session_id: str, status: str, start_time: Optional[datetime]) -> Dict[str, Any]:
+        """
+        Builds the full exam bundle (all sections, audio URLs, timing) with a single
+        questions query. Ready sessions never change their content, so the serialized
+        bundle and its ETag are cached and shared between workers.
+        """
+        cache_key = f"exam_bundle:{session_id}"
+        if status == "ready":
+            cached_bundle = await cache.aget(cache_key)
+            if cached_bundle and cached_bundle.get("etag"):
+                return cached_bundle
+
+        questions = await self.get_session_questions(session_id)
+        passages = await self.get_passages(questions)
+        by_type: Dict[str, List[Question]] = {section: [] for section in SECTION_TYPES}
+        for q in questions:
+            if q.question_type in by_type:
+                by_type[q.question_type].append(q)
+
+        sections = {
+            section: self.format_section_questions(section, section_questions, session_id, passages)
+            for section, section_questions in by_type.items()
+        }
+
+        timing = {
+            "session_start": start_time.isoformat() if start_time else None,
+            "writing_time_limit_minutes": sum(p.get("time_limit", 0) or 0 for p in sections["writing"]),
+            "speaking_preparation_seconds": sum(q.get("preparation_time", 0) or 0 for q in sections["speaking"]),
+            "speaking_time_seconds": sum(q.get("speaking_time", 0) or 0 for q in sections["speaking"]),
+        }
+
+        payload = {
+            "session_id": session_id,
+            "status": status,
+            "sections": sections,
+            "timing": timing,
+            "question_count": len(questions),
+        }
+        body = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        bundle = {
+            "etag": f'W/"{hashlib.sha1(body.encode()).hexdigest()}"',
+            "body": body,
+        }
+
+        if status == "ready":
+            await cache.aset(cache_key, bundle, ttl=1800)
+        return bundle
+
     async def update_question(self, question_id: int, question_data: QuestionUpdate) -> Optional[Question]:
         result = await self.db.execute(select(Question).filter(Question.id == question_id))
         db_question = result.scalars().first()
@@ -156,128 +364,86 @@ class TestService:
         return db_question
 
     async def generate_full_test(self, session_id: str, level: str) -> Dict[str, Any]:
-        """Generates a full test, including all sections, asynchronously with caching and background processing."""
+        """
+        Prepares the test for a session. A pooled test is persisted right away; otherwise
+        sections are generated in the background (resuming any checkpointed stages)
+        and announced one by one on /generation-events as soon as each is stored.
+        """
         from app.core.cache import cache
-        from app.tasks.test_generation import generate_full_test_async
+        from app.tasks.test_generation import generate_full_test_async, refill_test_pool
+        from .test_pool_service import TestPoolService, normalize_level
+        from .test_generation_pipeline import TestGenerationPipeline
         
+        level = normalize_level(level)
                                                                  
         cache_key = f"generated_test:{session_id}:{level}"
         cached_test = await cache.aget(cache_key)
         if cached_test and cached_test.get("status") != "error":
-            print(f"[DEBUG] Using cached test data for session {session_id}")
+            logger.debug(f"Using cached test data for session {session_id}")
             return cached_test
         
                                                   
         generation_key = f"generating:{session_id}"
-        if await cache.aexists(generation_key):
-            print(f"[DEBUG] Test generation already in progress for session {session_id}")
+        client = await cache.get_async_client()
+        if client is not None and not await client.set(generation_key, "true", nx=True, ex=600):
+            logger.debug(f"Test generation already in progress for session {session_id}")
                                 
             return {
                 "status": "generating",
                 "message": "Test generation in progress",
-                "session_id": session_id
+                "session_id": session_id,
+                "events_url": f"/api/v1/main-tests/{session_id}/generation-events"
             }
-        
-                            
-        await cache.aset(generation_key, True, ttl=300)                        
-        print(f"[DEBUG] Marked session {session_id} as generating")
+        logger.debug(f"Marked session {session_id} as generating")
         
         try:
-                                                                
-                                                                
-            import asyncio
-            
-            try:
-                                                                               
-                print(f"[DEBUG] Starting test generation for session {session_id}, level {level}")
-                full_test_data = await asyncio.wait_for(
-                    openai_service.generate_full_test(level), 
-                    timeout=120.0                                       
-                )
-                print(f"[DEBUG] Test generation completed for session {session_id}")
-                
-                                                                                                 
-                reading_data = await self._process_section(
-                    session_id, "reading", full_test_data.get("reading"), self._process_reading_section
-                )
-                try:
-                    listening_raw_data = full_test_data.get("listening")
-                    print(f"[DEBUG] Raw listening data from OpenAI: {listening_raw_data}")
-                    
-                    if not listening_raw_data or "error" in listening_raw_data:
-                        print(f"[ERROR] Invalid listening data from OpenAI: {listening_raw_data}")
-                        listening_data = {"error": "Failed to generate listening test data from OpenAI"}
-                    else:
-                        listening_data = await self._process_section(
-                            session_id, "listening", listening_raw_data, self._process_listening_section
-                        )
-                except Exception as e:
-                    print(f"[ERROR] Failed to process listening section: {e}")
-                    import traceback
-                    print(f"[ERROR] Traceback: {traceback.format_exc()}")
-                    listening_data = {"error": f"Failed to process listening section: {str(e)}"}
-                writing_data = await self._process_section(
-                    session_id, "writing", full_test_data.get("writing"), self._process_writing_section
-                )
-                speaking_data = await self._process_section(
-                    session_id, "speaking", full_test_data.get("speaking"), self._process_speaking_section
-                )
-
-                                                                
-                await self.db.commit()
-                print(f"[DEBUG] Database committed for session {session_id}")
-                
-                session = await self.get_test_session(session_id)
-                if session:
-                    session.status = "ready"
-                    await self.db.commit()
-                    print(f"[DEBUG] Session status updated to 'ready' for {session_id}")
-
-                result = {
-                    "reading": reading_data,
-                    "listening": listening_data,
-                    "writing": writing_data,
-                    "speaking": speaking_data,
-                }
-                
-                                               
-                if not any("error" in section for section in result.values() if isinstance(section, dict)):
-                    await cache.aset(cache_key, result, ttl=1800)              
-                    print(f"[DEBUG] Cached successful test result for session {session_id}")
-                else:
-                    print(f"[DEBUG] Not caching result due to errors in sections")
-                
-                return result
-                
-            except asyncio.TimeoutError:
-                print(f"[WARNING] Test generation timed out for session {session_id}, falling back to background task")
-                                                                  
-                task = generate_full_test_async.delay(session_id, level)
-                print(f"[DEBUG] Background task created with ID: {task.id}")
-                
-                                       
+            pipeline = TestGenerationPipeline(session_id, level)
+            full_test_data = None
+            if not await pipeline.load_checkpoints():
+                full_test_data = await TestPoolService(self.db).claim(level)
+            if not full_test_data:
                 session = await self.get_test_session(session_id)
                 if session:
                     session.status = "generating"
                     await self.db.commit()
                 
+                task_id, created = await task_dedup.enqueue(
+                    generate_full_test_async, session_id, args=(session_id, level)
+                )
+                logger.debug(f"Background generation task {'created' if created else 'already queued'} with ID: {task_id}")
                 return {
                     "status": "generating",
-                    "task_id": task.id,
+                    "task_id": task_id,
                     "message": "Test generation started in background",
                     "session_id": session_id,
-                    "estimated_time": "2-5 minutes"
+                    "estimated_time": "1-3 minutes",
+                    "events_url": f"/api/v1/main-tests/{session_id}/generation-events"
                 }
+            
+            refill_test_pool.delay([level])
+            try:
+                result = await pipeline.run(full_test_data)
+            finally:
+                await cache.adelete(generation_key)
+            
+                                           
+            if not any("error" in section for section in result.values() if isinstance(section, dict)):
+                await cache.aset(cache_key, result, ttl=1800)              
+                logger.debug(f"Cached successful test result for session {session_id}")
+            else:
+                logger.debug("Not caching result due to errors in sections")
+            
+            return result
                 
         except Exception as e:
-            print(f"[ERROR] Exception in generate_full_test: {e}")
+            logger.error(f"Exception in generate_full_test: {e}")
             import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
             
                                                    
             try:
                 await self.db.rollback()
-                print(f"[DEBUG] Database rolled back due to error")
+                logger.debug("Database rolled back due to error")
             except:
                 pass
             
@@ -295,44 +461,42 @@ class TestService:
                 pass
             
             raise e
-        finally:
-                                    
-            await cache.adelete(generation_key)
 
     async def _process_section(self, session_id: str, section_type: str, test_data: Optional[Dict[str, Any]], processing_func) -> Dict[str, Any]:
-        print(f"[DEBUG] Processing section '{section_type}' for session {session_id}")
+        logger.debug(f"Processing section '{section_type}' for session {session_id}")
         if not test_data:
-            print(f"[DEBUG] No test data for section '{section_type}'")
+            logger.debug(f"No test data for section '{section_type}'")
             return {"error": f"Failed to generate {section_type} test data."}
         
                                               
         if isinstance(test_data, dict) and "error" in test_data:
-            print(f"[ERROR] Test data for '{section_type}' contains error: {test_data['error']}")
+            logger.error(f"Test data for '{section_type}' contains error: {test_data['error']}")
             return test_data                          
             
-        print(f"[DEBUG] Test data for '{section_type}': {test_data}")
+        logger.debug(f"Test data for '{section_type}': {test_data}")
         result = await processing_func(session_id, test_data)
-        print(f"[DEBUG] Section '{section_type}' processing result: {result}")
+        logger.debug(f"Section '{section_type}' processing result: {result}")
         return result
 
     async def _process_reading_section(self, session_id: str, test_data: Dict[str, Any]) -> Dict[str, Any]:
+        passage_id = await self._store_passage("reading", test_data.get("passage", ""))
         questions_to_create = [
             QuestionCreate(
                 test_session_id=session_id,
                 question_type="reading",
                 content=json.dumps({
-                    "passage": test_data.get("passage", ""),
                     "question": q_data["question"],
                     "question_number": i + 1
                 }),
                 options=json.dumps(q_data["options"]),
-                correct_answer=q_data["correct_answer"]
+                correct_answer=q_data["correct_answer"],
+                passage_id=passage_id
             ) for i, q_data in enumerate(test_data.get("questions", []))
         ]
         
         created_questions = await self._bulk_create_questions(questions_to_create)
         await self.db.commit()
-        print(f"[DEBUG] Database committed after creating reading questions")
+        logger.debug("Database committed after creating reading questions")
         
         return {
             "passage": test_data.get("passage", ""),
@@ -345,53 +509,47 @@ class TestService:
         }
 
     async def _process_listening_section(self, session_id: str, test_data: Dict[str, Any]) -> Dict[str, Any]:
-        print(f"[DEBUG] Processing listening section for session {session_id}")
-        print(f"[DEBUG] Listening test_data: {test_data}")
+        logger.debug(f"Processing listening section for session {session_id}")
+        logger.debug(f"Listening test_data: {test_data}")
         
         if not test_data:
-            print(f"[ERROR] No test data provided for listening section")
+            logger.error("No test data provided for listening section")
             return {"error": "No test data provided"}
         
         scenarios = test_data.get("scenarios", [])
-        print(f"[DEBUG] Found {len(scenarios)} scenarios to process")
+        logger.debug(f"Found {len(scenarios)} scenarios to process")
         
         if not scenarios:
-            print(f"[ERROR] No scenarios found in listening test data")
+            logger.error("No scenarios found in listening test data")
             return {"error": "No scenarios found in test data"}
         
         async def create_question_schema(i, scenario):
-            print(f"[DEBUG] Processing scenario {i+1}: {scenario.get('question', 'No question')}")
-            print(f"[DEBUG] Scenario data: {scenario}")
+            logger.debug(f"Processing scenario {i+1}: {scenario.get('question', 'No question')}")
+            logger.debug(f"Scenario data: {scenario}")
             
                                     
             if not scenario.get("audio_script"):
-                print(f"[ERROR] No audio_script found in scenario {i+1}")
+                logger.error(f"No audio_script found in scenario {i+1}")
                 audio_path = None
             else:
                 try:
-                    print(f"[DEBUG] Generating TTS for scenario {i+1} with text: {scenario['audio_script'][:100]}...")
-                    audio_data = await audio_service.text_to_speech(scenario["audio_script"])
-                    audio_path = None
-                    if audio_data:
-                                                       
-                        os.makedirs("/app/audio", exist_ok=True)
-                        audio_filename = f"listening_{session_id}_{i+1}.mp3"
-                        audio_path = f"/app/audio/{audio_filename}"
-                        await audio_service.save_audio_file(audio_data, audio_path)
-                        print(f"[DEBUG] Audio saved to: {audio_path}")
+                    logger.debug(f"Generating TTS for scenario {i+1} with text: {scenario['audio_script'][:100]}...")
+                    audio_path = await tts_cache.get_or_synthesize(scenario["audio_script"])
+                    if audio_path:
+                        logger.debug(f"Audio available at: {audio_path}")
                     else:
-                        print(f"[WARNING] No audio data generated for scenario {i+1}")
+                        logger.warning(f"No audio data generated for scenario {i+1}")
                 except Exception as e:
-                    print(f"[ERROR] Failed to generate audio for scenario {i+1}: {e}")
+                    logger.error(f"Failed to generate audio for scenario {i+1}: {e}")
                     import traceback
-                    print(f"[ERROR] Audio generation traceback: {traceback.format_exc()}")
+                    logger.error(f"Audio generation traceback: {traceback.format_exc()}")
                     audio_path = None
 
             return QuestionCreate(
                 test_session_id=session_id,
                 question_type="listening",
                 content=json.dumps({
-                    "audio_script": scenario["audio_script"], "audio_path": audio_path,
+                    "audio_path": audio_path,
                     "question": scenario["question"], "scenario_number": i + 1
                 }),
                 options=json.dumps(scenario["options"]), correct_answer=scenario["correct_answer"]
@@ -400,14 +558,16 @@ class TestService:
         question_schemas = await asyncio.gather(*[
             create_question_schema(i, s) for i, s in enumerate(scenarios)
         ])
-        print(f"[DEBUG] Created {len(question_schemas)} question schemas")
+        for schema, scenario in zip(question_schemas, scenarios):
+            schema.passage_id = await self._store_passage("listening", scenario.get("audio_script", ""))
+        logger.debug(f"Created {len(question_schemas)} question schemas")
 
         created_questions = await self._bulk_create_questions(question_schemas)
-        print(f"[DEBUG] Bulk created {len(created_questions)} questions in database")
+        logger.debug(f"Bulk created {len(created_questions)} questions in database")
         
                                                      
         await self.db.commit()
-        print(f"[DEBUG] Database committed after creating listening questions")
+        logger.debug("Database committed after creating listening questions")
         
                                               
         verification_result = await self.db.execute(
@@ -417,7 +577,7 @@ class TestService:
             )
         )
         saved_questions = verification_result.scalars().all()
-        print(f"[DEBUG] Verification: {len(saved_questions)} listening questions found in database after save")
+        logger.debug(f"Verification: {len(saved_questions)} listening questions found in database after save")
         
         scenarios_created = [
             {
@@ -429,7 +589,7 @@ class TestService:
             } for db_question in created_questions
         ]
         
-        print(f"[DEBUG] Returning {len(scenarios_created)} scenarios")
+        logger.debug(f"Returning {len(scenarios_created)} scenarios")
         return {"scenarios": scenarios_created}
 
     async def _process_writing_section(self, session_id: str, test_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -446,7 +606,7 @@ class TestService:
         
         created_prompts_db = await self._bulk_create_questions(prompts_to_create)
         await self.db.commit()
-        print(f"[DEBUG] Database committed after creating writing questions")
+        logger.debug("Database committed after creating writing questions")
         
         created_prompts = [
             {"id": p.id, **json.loads(p.content)} for p in created_prompts_db
@@ -455,39 +615,33 @@ class TestService:
         return {"prompts": created_prompts}
 
     async def _process_speaking_section(self, session_id: str, test_data: Dict[str, Any]) -> Dict[str, Any]:
-        print(f"[DEBUG] Processing speaking section for session {session_id}")
-        print(f"[DEBUG] Speaking test_data: {test_data}")
+        logger.debug(f"Processing speaking section for session {session_id}")
+        logger.debug(f"Speaking test_data: {test_data}")
         
         if not test_data:
-            print(f"[ERROR] No test data provided for speaking section")
+            logger.error("No test data provided for speaking section")
             return {"error": "No test data provided"}
         
         questions = test_data.get("questions", [])
-        print(f"[DEBUG] Found {len(questions)} speaking questions to process")
+        logger.debug(f"Found {len(questions)} speaking questions to process")
         
         if not questions:
-            print(f"[ERROR] No questions found in speaking test data")
+            logger.error("No questions found in speaking test data")
             return {"error": "No questions found in test data"}
         
         async def create_speaking_question_schema(i, q_data):
-            print(f"[DEBUG] Processing speaking question {i+1}: {q_data.get('question', 'No question')[:50]}...")
-            print(f"[DEBUG] Question data: {q_data}")
+            logger.debug(f"Processing speaking question {i+1}: {q_data.get('question', 'No question')[:50]}...")
+            logger.debug(f"Question data: {q_data}")
             
             try:
                 audio_text = f"{q_data['question']} {q_data.get('follow_up', '')}".strip()
-                print(f"[DEBUG] Generating TTS for speaking question {i+1}: {audio_text[:100]}...")
+                logger.debug(f"Generating TTS for speaking question {i+1}: {audio_text[:100]}...")
                 
-                audio_data = await audio_service.text_to_speech(audio_text)
-                audio_path = None
-                if audio_data:
-                                                   
-                    os.makedirs("/app/audio", exist_ok=True)
-                    audio_filename = f"speaking_{session_id}_{i+1}.mp3"
-                    audio_path = f"/app/audio/{audio_filename}"
-                    await audio_service.save_audio_file(audio_data, audio_path)
-                    print(f"[DEBUG] Speaking audio saved to: {audio_path}")
+                audio_path = await tts_cache.get_or_synthesize(audio_text)
+                if audio_path:
+                    logger.debug(f"Speaking audio available at: {audio_path}")
                 else:
-                    print(f"[WARNING] No audio data generated for speaking question {i+1}")
+                    logger.warning(f"No audio data generated for speaking question {i+1}")
 
                 content = {**q_data, "audio_path": audio_path, "question_number": i + 1}
                 return QuestionCreate(
@@ -495,9 +649,9 @@ class TestService:
                     content=json.dumps(content)
                 )
             except Exception as e:
-                print(f"[ERROR] Failed to process speaking question {i+1}: {e}")
+                logger.error(f"Failed to process speaking question {i+1}: {e}")
                 import traceback
-                print(f"[ERROR] Speaking question traceback: {traceback.format_exc()}")
+                logger.error(f"Speaking question traceback: {traceback.format_exc()}")
                                                              
                 content = {**q_data, "audio_path": None, "question_number": i + 1}
                 return QuestionCreate(
@@ -511,32 +665,36 @@ class TestService:
 
         created_questions_db = await self._bulk_create_questions(question_schemas)
         await self.db.commit()
-        print(f"[DEBUG] Database committed after creating speaking questions")
+        logger.debug("Database committed after creating speaking questions")
 
         questions_created = [{"id": db_question.id, **json.loads(db_question.content)} for db_question in created_questions_db]
 
         return {"questions": questions_created}
 
-    async def submit_reading_answer(self, question_id: int, user_answer: str) -> Dict[str, Any]:
-        """Submit and evaluate reading answer"""
+    def _score_objective_answer(self, question_type: str, correct_answer: Optional[str], user_answer: str) -> Dict[str, Any]:
+        """Scores a reading/listening answer locally, without API calls."""
+        if user_answer == "unanswered":
+            return {"score": 0, "feedback": "No answer was provided."}
+
+        if question_type == "reading":
+            return openai_service.evaluate_reading_answer("", correct_answer or "", user_answer)
+
+        is_correct = user_answer == correct_answer
+        return {
+            "score": 100 if is_correct else 0,
+            "feedback": "Correct" if is_correct else f"Incorrect. The correct answer is {correct_answer}."
+        }
+
+    async def _submit_objective_answer(self, question_id: int, question_type: str, user_answer: str) -> Dict[str, Any]:
         result = await self.db.execute(select(Question).filter(Question.id == question_id))
         question = result.scalars().first()
         if not question:
             raise Exception("Question not found")
 
-        if user_answer == "unanswered":
-            question.user_answer = user_answer
-            question.score = 0
-            question.feedback = "No answer was provided."
-            await self.db.commit()
-            return {"score": 0, "feedback": "No answer was provided."}
+        evaluation = self._score_objective_answer(question_type, question.correct_answer, user_answer)
+        fields = {"user_answer": user_answer, "score": evaluation["score"], "feedback": evaluation["feedback"]}
 
-        content = json.loads(question.content)
-        evaluation = openai_service.evaluate_reading_answer(
-            content["question"], question.correct_answer, user_answer
-        )
-
-        if evaluation:
+        if await exam_state.stage_answer(MAIN, question.test_session_id, question_id, fields) is None:
             question.user_answer = user_answer
             question.score = evaluation["score"]
             question.feedback = evaluation["feedback"]
@@ -544,47 +702,113 @@ class TestService:
 
         return evaluation
 
+    async def submit_reading_answer(self, question_id: int, user_answer: str) -> Dict[str, Any]:
+        """Submit and evaluate reading answer"""
+        return await self._submit_objective_answer(question_id, "reading", user_answer)
+
     async def submit_listening_answer(self, question_id: int, user_answer: str) -> Dict[str, Any]:
         """Submit and evaluate listening answer"""
-        result = await self.db.execute(select(Question).filter(Question.id == question_id))
-        question = result.scalars().first()
-        if not question:
-            raise Exception("Question not found")
+        return await self._submit_objective_answer(question_id, "listening", user_answer)
 
-        content = json.loads(question.content)
-                                              
-                                                                                       
-        if user_answer == "unanswered":
-            score = 0
-            feedback = "No answer was provided."
-        else:
-            is_correct = user_answer == question.correct_answer
-            score = 100 if is_correct else 0
-            feedback = "Correct" if is_correct else f"Incorrect. The correct answer is {question.correct_answer}."
+    async def submit_objective_answers_batch(self, session_id: str, question_type: str, answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Scores a batch of reading/listening answers in memory and stages them in the
+        live exam state; without Redis they are persisted with one
+        UPDATE ... FROM (VALUES ...) and a single commit.
+        """
+        if question_type not in ("reading", "listening"):
+            raise ValueError(f"Batch submission is not supported for {question_type}")
 
-        question.user_answer = user_answer
-        question.score = score
-        question.feedback = feedback
-        await self.db.commit()
+        answers_by_id = {int(a["question_id"]): a["answer"] for a in answers}
+        if not answers_by_id:
+            return {"results": [], "missing": [], "updated": 0}
 
-        return {"score": score, "feedback": feedback}
+        result = await self.db.execute(
+            select(Question.id, Question.correct_answer).filter(
+                Question.test_session_id == session_id,
+                Question.question_type == question_type,
+                Question.id.in_(list(answers_by_id.keys()))
+            )
+        )
 
-    async def save_writing_draft(self, question_id: int, user_answer: str) -> Dict[str, Any]:
-        """Save writing answer as draft without evaluation"""
-        result = await self.db.execute(select(Question).filter(Question.id == question_id))
-        question = result.scalars().first()
-        if not question:
-            raise Exception("Question not found")
+        rows = []
+        results = []
+        for question_id, correct_answer in result.all():
+            user_answer = answers_by_id[question_id]
+            evaluation = self._score_objective_answer(question_type, correct_answer, user_answer)
+            rows.append({
+                "id": question_id,
+                "user_answer": user_answer,
+                "score": evaluation["score"],
+                "feedback": evaluation["feedback"]
+            })
+            results.append({"question_id": question_id, **evaluation})
+
+        found_ids = {row["id"] for row in rows}
+        missing = [question_id for question_id in answers_by_id if question_id not in found_ids]
+
+        staged = await exam_state.stage_answers(
+            MAIN, session_id, {row["id"]: {k: v for k, v in row.items() if k != "id"} for row in rows}
+        )
+        if staged is not None:
+            updated = len(rows)
+        else:
+            updated = await bulk_update_by_id(
+                self.db, Question, rows, ("user_answer", "score", "feedback"),
+                where=Question.test_session_id == session_id
+            )
+            await self.db.commit()
+        logger.debug(f"Batch submitted {updated} {question_type} answers for session {session_id}, missing: {missing}")
+
+        return {"results": results, "missing": missing, "updated": updated}
+
+    async def save_writing_draft(
+        self, question_id: int, user_answer: str, session_id: Optional[str] = None, draft_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Save writing answer as draft without evaluation.
+        Drafts are coalesced latest-wins in the live exam state and reach Postgres with
+        the periodic flush; a draft older than the stored version is rejected as stale.
+        """
+        if draft_version is None:
+            draft_version = int(time.time() * 1000)
+
+        if session_id is None or await exam_state.get_draft_version(MAIN, session_id, question_id) is None:
+            query = select(Question.test_session_id).filter(
+                Question.id == question_id, Question.question_type == "writing"
+            )
+            if session_id is not None:
+                query = query.filter(Question.test_session_id == session_id)
+            result = await self.db.execute(query)
+            session_id = result.scalar_one_or_none()
+            if session_id is None:
+                raise Exception("Question not found")
 
-                                                              
-        question.user_answer = user_answer
-        await self.db.commit()
+        word_count = len(user_answer.strip().split()) if user_answer.strip() else 0
+        staged = await exam_state.stage_draft(MAIN, session_id, question_id, {"user_answer": user_answer}, draft_version)
+
+        if staged == DRAFT_STALE:
+            logger.debug(f"Rejected stale writing draft for question {question_id}, version: {draft_version}")
+            return {
+                "status": "stale",
+                "message": "A newer draft or a final answer is already saved",
+                "word_count": word_count
+            }
+
+        if staged is None:
+            await self.db.execute(
+                update(Question)
+                .where(Question.id == question_id, Question.feedback.is_(None))
+                .values(user_answer=user_answer)
+            )
+            await self.db.commit()
         
-        print(f"[DEBUG] Saved writing draft for question {question_id}, length: {len(user_answer)}")
+        logger.debug(f"Saved writing draft for question {question_id}, length: {len(user_answer)}")
         return {
             "status": "draft_saved", 
             "message": "Answer saved as draft",
-            "word_count": len(user_answer.strip().split()) if user_answer.strip() else 0
+            "word_count": word_count,
+            "version": draft_version
         }
 
     async def submit_writing_answer(self, question_id: int, user_answer: str, level: str) -> Optional[Dict[str, Any]]:
@@ -599,80 +823,103 @@ class TestService:
             if question.user_answer == user_answer and question.feedback:
                 try:
                     existing_evaluation = json.loads(question.feedback)
-                    print(f"[DEBUG] Returning cached evaluation for question {question_id}")
+                    logger.debug(f"Returning cached evaluation for question {question_id}")
                     return existing_evaluation
                 except (json.JSONDecodeError, TypeError):
-                    print(f"[DEBUG] Invalid cached feedback for question {question_id}, re-evaluating")
+                    logger.debug(f"Invalid cached feedback for question {question_id}, re-evaluating")
 
             content = json.loads(question.content)
             
                                                                                       
             prompt_text = content['prompt']
-            cache_key = f"writing_eval:{hashlib.md5(f'{prompt_text}:{user_answer}:{level}'.encode()).hexdigest()}"
-            
-                                                
-            cached_evaluation = await cache.aget(cache_key)
-            if cached_evaluation:
-                try:
-                    evaluation = json.loads(cached_evaluation)
-                    print(f"[DEBUG] Using cached OpenAI evaluation for question {question_id}")
-                except (json.JSONDecodeError, TypeError):
-                    evaluation = None
+            evaluation = await evaluation_cache.get(WRITING, prompt_text, user_answer, level)
+            if evaluation:
+                logger.debug(f"Using cached OpenAI evaluation for question {question_id}")
             else:
-                evaluation = None
-            
-                                                  
-            if not evaluation:
-                print(f"[DEBUG] Calling OpenAI for writing evaluation - question {question_id}")
-                evaluation = await openai_service.evaluate_writing_answer(prompt_text, user_answer, level)
-                
-                                                 
-                if evaluation:
-                    await cache.aset(cache_key, json.dumps(evaluation), ttl=3600)
+                logger.debug(f"Calling OpenAI for writing evaluation - question {question_id}")
+                with llm_priority(LIVE):
+                    evaluation = await evaluation_batcher.evaluate(WRITING, prompt_text, user_answer, level)
+                await evaluation_cache.set(WRITING, prompt_text, user_answer, level, evaluation)
             
             if evaluation:
                 question.user_answer = user_answer
                 question.score = evaluation.get("score")
                 question.feedback = json.dumps(evaluation)
                 await self.db.commit()
+                await exam_state.seal_draft(MAIN, question.test_session_id, question_id)
 
             return evaluation
             
         except Exception as e:
-            print(f"[ERROR] Error in submit_writing_answer: {e}")
+            logger.error(f"Error in submit_writing_answer: {e}")
             import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
             raise e
 
-    async def submit_speaking_answer(self, question_id: int, audio_data: bytes, level: str) -> Dict[str, Any]:
-        """Submit and evaluate speaking answer"""
+    async def enqueue_speaking_answer(self, session_id: str, question_id: int, audio_data: bytes, level: str) -> Dict[str, Any]:
+        """Stores the recording and queues transcription and evaluation; returns the job to poll."""
+        from app.tasks.evaluation import evaluate_speaking_submission
+        
+        result = await self.db.execute(
+            select(Question.id).filter(Question.id == question_id, Question.test_session_id == session_id)
+        )
+        if not result.first():
+            raise Exception("Question not found")
+        
+        business_key = f"{question_id}:{hashlib.sha256(audio_data).hexdigest()}"
+        job_id, created = await task_dedup.reserve(evaluate_speaking_submission.name, business_key)
+        if not created:
+            job = await speaking_jobs.get(job_id)
+            logger.debug(f"Duplicate speaking submission for question {question_id}, reusing job {job_id}")
+            return {"job_id": job_id, "status": job["status"] if job else QUEUED, "question_id": question_id}
+        
+        try:
+            audio_filename = f"speaking_answer_{session_id}_{question_id}_{job_id}.webm"
+            file_path = f"/app/uploads/speaking/{audio_filename}"
+            if not await audio_service.save_audio_file(audio_data, file_path):
+                raise Exception("Failed to store speaking answer audio")
+            
+            await speaking_jobs.create(session_id, question_id, job_id=job_id)
+            evaluate_speaking_submission.apply_async(args=(job_id, question_id, file_path, level), task_id=job_id)
+        except Exception:
+            await task_dedup.release(evaluate_speaking_submission.name, business_key)
+            raise
+        logger.debug(f"Queued speaking evaluation job {job_id} for question {question_id}")
+        return {"job_id": job_id, "status": QUEUED, "question_id": question_id}
+
+    async def process_speaking_answer(self, job_id: str, question_id: int, file_path: str, level: str) -> Dict[str, Any]:
+        """Transcribes and evaluates a stored speaking answer (runs in a worker)."""
         result = await self.db.execute(select(Question).filter(Question.id == question_id))
         question = result.scalars().first()
         if not question:
             raise Exception("Question not found")
 
-        transcribed_text = await audio_service.speech_to_text_from_bytes(audio_data)
+        async with aiofiles.open(file_path, "rb") as f:
+            audio_data = await f.read()
+
+        await speaking_jobs.update(job_id, TRANSCRIBING)
+        with llm_priority(LIVE):
+            transcribed_text = await audio_service.speech_to_text_from_bytes(audio_data)
         if not transcribed_text:
             return {"error": "Failed to transcribe audio"}
 
-        question.user_answer = transcribed_text
+        await speaking_jobs.update(job_id, EVALUATING, transcription=transcribed_text)
         content = json.loads(question.content)
-        evaluation = await openai_service.evaluate_speaking_answer(content["question"], transcribed_text, level)
+        evaluation = await evaluation_cache.get(SPEAKING, content["question"], transcribed_text, level)
+        if not evaluation:
+            with llm_priority(LIVE):
+                evaluation = (await openai_service.evaluate_answers_batch(
+                    SPEAKING, [{"prompt": content["question"], "answer": transcribed_text, "level": level}]
+                ))[0]
+            await evaluation_cache.set(SPEAKING, content["question"], transcribed_text, level, evaluation)
         
+        question.user_answer = transcribed_text
         if evaluation:
             question.score = evaluation.get("score")
             question.feedback = json.dumps(evaluation)
         else:
             evaluation = {"error": "Failed to evaluate speaking answer"}
-        
         await self.db.commit()
-
-        audio_filename = f"speaking_answer_{question.test_session_id}_{question_id}.webm"
-        file_path = f"/app/uploads/speaking/{audio_filename}"
-        saved = await audio_service.save_audio_file(audio_data, file_path)
-        if saved:
-            question.attachment_path = file_path
-            await self.db.commit()
             
         return {"transcription": transcribed_text, "evaluation": evaluation}
     
@@ -682,7 +929,7 @@ class TestService:
             select(Question).where(
                 Question.test_session_id == session_id,
                 Question.question_type == section_type
-            )
+            ).execution_options(populate_existing=True)
         )
         questions = result.scalars().all()
         if not questions:
@@ -695,11 +942,13 @@ class TestService:
 
     async def get_test_results(self, session_id: str) -> Dict[str, Any]:
         """Retrieve test results, including scores and answered questions."""
+        await exam_state.flush(MAIN, session_id, self.db)
         session = await self.get_test_session(session_id)
         if not session:
             return {"error": "Test session not found"}
 
         questions = await self.get_session_questions(session_id)
+        passages = await self.get_passages(questions)
 
         return {
             "session": {
@@ -717,7 +966,7 @@ class TestService:
                 {
                     "id": q.id,
                     "question_type": q.question_type,
-                    "content": json.loads(q.content),
+                    "content": self._question_content(q, passages),
                     "user_answer": q.user_answer,
                     "score": q.score,
                     "feedback": q.feedback
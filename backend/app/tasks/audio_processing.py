@@ -1,33 +1,25 @@
-from celery import current_task
 from app.core.celery_app import celery_app
 from app.core.database import AsyncSessionLocal
+from app.core.async_task import AsyncTask
 from app.utils.audio_service import audio_service
-from app.core.cache import cache
-import asyncio
+from app.utils.blob_store import blob_store
+from app.core.config import settings
 import os
-import tempfile
 from typing import Optional
 
-@celery_app.task(bind=True, name="process_audio_tts")
-def process_audio_tts(self, text: str, session_id: str, audio_type: str, index: int = 0):
+@celery_app.task(bind=True, base=AsyncTask, name="process_audio_tts")
+async def process_audio_tts(self, text: str, session_id: str, audio_type: str, index: int = 0):
     """Background task for text-to-speech processing"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 2, 'status': 'Starting TTS processing...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_process_tts_internal(text, session_id, audio_type, index, self))
-            return result
-        finally:
-            loop.close()
+        return await _process_tts_internal(text, session_id, audio_type, index, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'text_preview': text[:50] + '...'}
         )
@@ -35,132 +27,81 @@ def process_audio_tts(self, text: str, session_id: str, audio_type: str, index:
 
 async def _process_tts_internal(text: str, session_id: str, audio_type: str, index: int, task):
     """Internal async function for TTS processing"""
-    try:
-                           
-        cache_key = f"tts_audio:{hash(text)}:{audio_type}"
-        cached_path = await cache.aget(cache_key)
-        
-        if cached_path and os.path.exists(cached_path):
-            task.update_state(
-                state='SUCCESS',
-                meta={'current': 2, 'total': 2, 'status': 'Using cached audio', 'audio_path': cached_path}
-            )
-            return {'audio_path': cached_path, 'cached': True}
-        
-        task.update_state(
-            state='PROGRESS',
-            meta={'current': 1, 'total': 2, 'status': 'Generating audio...'}
-        )
-        
-                        
-        audio_data = await audio_service.text_to_speech(text)
-        
-        if not audio_data:
-            raise Exception("Failed to generate audio")
-        
-                         
-        filename = f"{audio_type}_{session_id}_{index}.mp3"
-        audio_path = f"/app/audio/{filename}"
-        
-                                 
-        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-        
-        success = await audio_service.save_audio_file(audio_data, audio_path)
-        
-        if not success:
-            raise Exception("Failed to save audio file")
-        
-                          
-        await cache.aset(cache_key, audio_path, ttl=3600)          
-        
-        task.update_state(
-            state='SUCCESS',
-            meta={'current': 2, 'total': 2, 'status': 'Audio generated successfully', 'audio_path': audio_path}
-        )
-        
-        return {'audio_path': audio_path, 'cached': False}
-        
-    except Exception as e:
-        raise e
+    from app.utils.tts_cache import tts_cache
+    
+    task.update_state(
+        state='PROGRESS',
+        meta={'current': 1, 'total': 2, 'status': 'Generating audio...'}
+    )
+    
+    digest = tts_cache.digest(text, "alloy", settings.azure_openai_tts_deployment)
+    cached = os.path.exists(tts_cache.path_for(digest))
+    audio_path = await tts_cache.get_or_synthesize(text)
+    
+    if not audio_path:
+        raise Exception("Failed to generate audio")
+    
+    task.update_state(
+        state='SUCCESS',
+        meta={'current': 2, 'total': 2, 'status': 'Using cached audio' if cached else 'Audio generated successfully', 'audio_path': audio_path}
+    )
+    
+    return {'audio_path': audio_path, 'cached': cached}
 
-@celery_app.task(bind=True, name="process_audio_transcription")
-def process_audio_transcription(self, audio_data: bytes, session_id: str, question_id: int):
-    """Background task for speech-to-text processing"""
+@celery_app.task(bind=True, base=AsyncTask, name="process_audio_transcription")
+async def process_audio_transcription(self, audio_ref: dict, session_id: str, question_id: int):
+    """Background task for speech-to-text processing; audio_ref is a blob_store reference"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 3, 'status': 'Starting transcription...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_process_transcription_internal(audio_data, session_id, question_id, self))
-            return result
-        finally:
-            loop.close()
+        return await _process_transcription_internal(audio_ref, session_id, question_id, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'session_id': session_id, 'question_id': question_id}
         )
         raise exc
 
-async def _process_transcription_internal(audio_data: bytes, session_id: str, question_id: int, task):
+async def _process_transcription_internal(audio_ref: dict, session_id: str, question_id: int, task):
     """Internal async function for transcription processing"""
-    try:
-        task.update_state(
-            state='PROGRESS',
-            meta={'current': 1, 'total': 3, 'status': 'Processing audio data...'}
-        )
-        
-                                                  
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_file:
-            temp_file.write(audio_data)
-            temp_path = temp_file.name
-        
-        try:
-            task.update_state(
-                state='PROGRESS',
-                meta={'current': 2, 'total': 3, 'status': 'Transcribing speech...'}
-            )
-            
-                              
-            transcription = await audio_service.speech_to_text_from_bytes(audio_data)
-            
-            if not transcription:
-                raise Exception("Failed to transcribe audio")
-            
-                                             
-            audio_filename = f"speaking_answer_{session_id}_{question_id}.webm"
-            permanent_path = f"/app/uploads/speaking/{audio_filename}"
-            
+    task.update_state(
+        state='PROGRESS',
+        meta={'current': 1, 'total': 3, 'status': 'Processing audio data...'}
+    )
+    
+    audio_data = await blob_store.get(audio_ref)
+    
+    task.update_state(
+        state='PROGRESS',
+        meta={'current': 2, 'total': 3, 'status': 'Transcribing speech...'}
+    )
+    
+                      
+    transcription = await audio_service.speech_to_text_from_bytes(audio_data)
+    
+    if not transcription:
+        raise Exception("Failed to transcribe audio")
+    
                                      
-            os.makedirs(os.path.dirname(permanent_path), exist_ok=True)
-            
-                                                  
-            os.rename(temp_path, permanent_path)
-            
-            task.update_state(
-                state='SUCCESS',
-                meta={'current': 3, 'total': 3, 'status': 'Transcription completed', 'transcription': transcription}
-            )
-            
-            return {
-                'transcription': transcription,
-                'audio_path': permanent_path,
-                'question_id': question_id
-            }
-            
-        finally:
-                                                   
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-                
-    except Exception as e:
-        raise e
+    audio_filename = f"speaking_answer_{session_id}_{question_id}.webm"
+    permanent_path = f"/app/uploads/speaking/{audio_filename}"
+    if not await audio_service.save_audio_file(audio_data, permanent_path):
+        raise Exception("Failed to store speaking answer audio")
+    
+    task.update_state(
+        state='SUCCESS',
+        meta={'current': 3, 'total': 3, 'status': 'Transcription completed', 'transcription': transcription}
+    )
+    
+    return {
+        'transcription': transcription,
+        'audio_path': permanent_path,
+        'question_id': question_id
+    }
 
 @celery_app.task(name="batch_generate_audio")
 def batch_generate_audio(audio_requests: list):
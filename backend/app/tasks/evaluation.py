@@ -1,33 +1,34 @@
-from celery import current_task
 from app.core.celery_app import celery_app
 from app.core.database import AsyncSessionLocal
 from app.services.test_service import TestService
 from app.utils.openai_service import openai_service
 from app.core.cache import cache
-import asyncio
+from app.core.exam_state import exam_state, MAIN
+from app.core.llm_scheduler import llm_priority, LIVE
+from app.core.async_task import AsyncTask
+from app.core.evaluation_cache import evaluation_cache, WRITING, SPEAKING
+from app.services.speaking_jobs import speaking_jobs, COMPLETED, FAILED
+from app.core.config import settings
+from app.models.test import Question
+from app.utils.bulk_update import bulk_update_by_id
+from app.utils.blob_store import blob_store
 import json
+import os
 from typing import Dict, Any, Optional
 
-@celery_app.task(bind=True, name="evaluate_writing_answer_async")
-def evaluate_writing_answer_async(self, question_id: int, prompt: str, user_answer: str, level: str):
+@celery_app.task(bind=True, base=AsyncTask, name="evaluate_writing_answer_async")
+async def evaluate_writing_answer_async(self, question_id: int, prompt: str, user_answer: str, level: str):
     """Background task for evaluating writing answers"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 2, 'status': 'Starting writing evaluation...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_evaluate_writing_internal(question_id, prompt, user_answer, level, self))
-            return result
-        finally:
-            loop.close()
+        return await _evaluate_writing_internal(question_id, prompt, user_answer, level, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'question_id': question_id}
         )
@@ -37,8 +38,7 @@ async def _evaluate_writing_internal(question_id: int, prompt: str, user_answer:
     """Internal async function for writing evaluation"""
     try:
                                              
-        cache_key = f"writing_eval:{hash(prompt + user_answer + level)}"
-        cached_result = await cache.aget(cache_key)
+        cached_result = await evaluation_cache.get(WRITING, prompt, user_answer, level)
         
         if cached_result:
             task.update_state(
@@ -53,7 +53,8 @@ async def _evaluate_writing_internal(question_id: int, prompt: str, user_answer:
         )
         
                               
-        evaluation = await openai_service.evaluate_writing_answer(prompt, user_answer, level)
+        with llm_priority(LIVE):
+            evaluation = await openai_service.evaluate_writing_answer(prompt, user_answer, level)
         
         if not evaluation:
             raise Exception("Failed to evaluate writing answer")
@@ -68,7 +69,7 @@ async def _evaluate_writing_internal(question_id: int, prompt: str, user_answer:
             })
         
                           
-        await cache.aset(cache_key, evaluation, ttl=1800)              
+        await evaluation_cache.set(WRITING, prompt, user_answer, level, evaluation)
         
         task.update_state(
             state='SUCCESS',
@@ -80,26 +81,19 @@ async def _evaluate_writing_internal(question_id: int, prompt: str, user_answer:
     except Exception as e:
         raise e
 
-@celery_app.task(bind=True, name="evaluate_speaking_answer_async")
-def evaluate_speaking_answer_async(self, question_id: int, question: str, transcribed_text: str, level: str):
+@celery_app.task(bind=True, base=AsyncTask, name="evaluate_speaking_answer_async")
+async def evaluate_speaking_answer_async(self, question_id: int, question: str, transcribed_text: str, level: str):
     """Background task for evaluating speaking answers"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 2, 'status': 'Starting speaking evaluation...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_evaluate_speaking_internal(question_id, question, transcribed_text, level, self))
-            return result
-        finally:
-            loop.close()
+        return await _evaluate_speaking_internal(question_id, question, transcribed_text, level, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'question_id': question_id}
         )
@@ -109,8 +103,7 @@ async def _evaluate_speaking_internal(question_id: int, question: str, transcrib
     """Internal async function for speaking evaluation"""
     try:
                                              
-        cache_key = f"speaking_eval:{hash(question + transcribed_text + level)}"
-        cached_result = await cache.aget(cache_key)
+        cached_result = await evaluation_cache.get(SPEAKING, question, transcribed_text, level)
         
         if cached_result:
             task.update_state(
@@ -125,7 +118,8 @@ async def _evaluate_speaking_internal(question_id: int, question: str, transcrib
         )
         
                                
-        evaluation = await openai_service.evaluate_speaking_answer(question, transcribed_text, level)
+        with llm_priority(LIVE):
+            evaluation = await openai_service.evaluate_speaking_answer(question, transcribed_text, level)
         
         if not evaluation:
             raise Exception("Failed to evaluate speaking answer")
@@ -140,7 +134,7 @@ async def _evaluate_speaking_internal(question_id: int, question: str, transcrib
             })
         
                           
-        await cache.aset(cache_key, evaluation, ttl=1800)              
+        await evaluation_cache.set(SPEAKING, question, transcribed_text, level, evaluation)
         
         task.update_state(
             state='SUCCESS',
@@ -152,78 +146,116 @@ async def _evaluate_speaking_internal(question_id: int, question: str, transcrib
     except Exception as e:
         raise e
 
-@celery_app.task(bind=True, name="batch_evaluate_answers")
-def batch_evaluate_answers(self, evaluation_requests: list):
-    """Task to evaluate multiple answers in batch"""
-    results = []
-    total = len(evaluation_requests)
-    
-    for i, request in enumerate(evaluation_requests):
-        try:
-            current_task.update_state(
-                state='PROGRESS',
-                meta={'current': i, 'total': total, 'status': f'Processing evaluation {i+1}/{total}'}
-            )
-            
-            eval_type = request.get('type')
+def _remove_speaking_audio(file_path: str) -> None:
+    """Deletes a speaking recording once its job no longer needs it"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+@celery_app.task(bind=True, base=AsyncTask, max_retries=2)
+async def evaluate_speaking_submission(self, job_id: str, question_id: int, file_path: str, level: str):
+    """Transcribes, evaluates and stores one speaking answer queued by the submit endpoint"""
+    try:
+        async with AsyncSessionLocal() as db:
+            test_service = TestService(db)
+            result = await test_service.process_speaking_answer(job_id, question_id, file_path, level)
             
-            if eval_type == 'writing':
-                result = evaluate_writing_answer_async.delay(
-                    request['question_id'],
-                    request['prompt'],
-                    request['user_answer'],
-                    request['level']
-                )
-            elif eval_type == 'speaking':
-                result = evaluate_speaking_answer_async.delay(
-                    request['question_id'],
-                    request['question'],
-                    request['transcribed_text'],
-                    request['level']
-                )
+            if "error" in result:
+                await speaking_jobs.update(job_id, FAILED, error=result["error"])
             else:
-                raise ValueError(f"Unknown evaluation type: {eval_type}")
-            
-            results.append({
-                'request': request,
-                'task_id': result.id,
-                'status': 'queued'
-            })
+                await speaking_jobs.update(
+                    job_id, COMPLETED,
+                    transcription=result["transcription"],
+                    evaluation=result["evaluation"]
+                )
             
-        except Exception as e:
+            job = await speaking_jobs.get(job_id)
+            if job:
+                await test_service.refresh_completed_scores(job["session_id"])
+            _remove_speaking_audio(file_path)
+            return result
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=5 * (self.request.retries + 1))
+        _remove_speaking_audio(file_path)
+        await speaking_jobs.update(job_id, FAILED, error=str(exc))
+        job = await speaking_jobs.get(job_id)
+        if job:
+            async with AsyncSessionLocal() as db:
+                await TestService(db).refresh_completed_scores(job["session_id"])
+        raise exc
+
+@celery_app.task(base=AsyncTask, name="batch_evaluate_answers")
+async def batch_evaluate_answers(evaluation_requests: list):
+    """Task to evaluate multiple answers, packing each type into batched LLM requests"""
+    results = []
+    grouped = {"writing": [], "speaking": []}
+    
+    for request in evaluation_requests:
+        eval_type = request.get('type')
+        if eval_type == 'writing':
+            grouped['writing'].append((request, {
+                'prompt': request['prompt'], 'answer': request['user_answer'], 'level': request['level']
+            }))
+        elif eval_type == 'speaking':
+            grouped['speaking'].append((request, {
+                'prompt': request['question'], 'answer': request['transcribed_text'], 'level': request['level']
+            }))
+        else:
             results.append({
                 'request': request,
-                'error': str(e),
+                'error': f"Unknown evaluation type: {eval_type}",
                 'status': 'failed'
             })
     
-    current_task.update_state(
-        state='SUCCESS',
-        meta={'current': total, 'total': total, 'status': 'Batch evaluation completed'}
-    )
+    rows = []
+    batch_size = max(settings.evaluation_batch_size, 1)
+    for eval_type, entries in grouped.items():
+        cached = [
+            await evaluation_cache.get(eval_type, item['prompt'], item['answer'], item['level'])
+            for _, item in entries
+        ]
+        evaluated = [(entry, evaluation) for entry, evaluation in zip(entries, cached) if evaluation]
+        pending = [entry for entry, evaluation in zip(entries, cached) if not evaluation]
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            evaluations = await openai_service.evaluate_answers_batch(eval_type, [item for _, item in chunk])
+            for (request, item), evaluation in zip(chunk, evaluations):
+                await evaluation_cache.set(eval_type, item['prompt'], item['answer'], item['level'], evaluation)
+            evaluated.extend(zip(chunk, evaluations))
+        for (request, item), evaluation in evaluated:
+            if not evaluation:
+                results.append({'request': request, 'error': 'Evaluation failed', 'status': 'failed'})
+                continue
+            rows.append({
+                'id': request['question_id'],
+                'user_answer': item['answer'],
+                'score': evaluation.get('score'),
+                'feedback': json.dumps(evaluation)
+            })
+            results.append({'request': request, 'evaluation': evaluation, 'status': 'completed'})
     
-    return results
+    if rows:
+        async with AsyncSessionLocal() as db:
+            await bulk_update_by_id(db, Question, rows, ['user_answer', 'score', 'feedback'])
+            await db.commit()
+    
+    return await blob_store.offload(results)
 
-@celery_app.task(bind=True, name="calculate_final_scores")
-def calculate_final_scores(self, session_id: str):
+@celery_app.task(bind=True, base=AsyncTask, name="calculate_final_scores")
+async def calculate_final_scores(self, session_id: str):
     """Task to calculate final test scores"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 3, 'status': 'Starting score calculation...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_calculate_scores_internal(session_id, self))
-            return result
-        finally:
-            loop.close()
+        return await _calculate_scores_internal(session_id, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'session_id': session_id}
         )
@@ -234,6 +266,7 @@ async def _calculate_scores_internal(session_id: str, task):
     try:
         async with AsyncSessionLocal() as db:
             test_service = TestService(db)
+            await exam_state.flush(MAIN, session_id, db)
             
             task.update_state(
                 state='PROGRESS',
@@ -296,28 +329,23 @@ async def _calculate_scores_internal(session_id: str, task):
     except Exception as e:
         raise e
 
-@celery_app.task(name="precompute_evaluations")
-def precompute_evaluations(common_answers: list):
+@celery_app.task(base=AsyncTask, name="precompute_evaluations")
+async def precompute_evaluations(common_answers: list):
     """Task to precompute evaluations for common answers"""
     results = {}
     
     for answer_data in common_answers:
         try:
             answer_type = answer_data.get('type')
-            cache_key = None
+            task_text = answer_data.get('prompt') if answer_type == WRITING else answer_data.get('question')
             
-            if answer_type == 'writing':
-                cache_key = f"writing_eval:{hash(answer_data['prompt'] + answer_data['answer'] + answer_data['level'])}"
-            elif answer_type == 'speaking':
-                cache_key = f"speaking_eval:{hash(answer_data['question'] + answer_data['answer'] + answer_data['level'])}"
-            
-            if cache_key:
+            if answer_type in (WRITING, SPEAKING) and task_text:
                                               
                 evaluation = answer_data.get('evaluation')
-                cache.set(cache_key, evaluation, ttl=3600)
-                results[cache_key] = 'cached'
+                await evaluation_cache.set(answer_type, task_text, answer_data['answer'], answer_data['level'], evaluation)
+                results[evaluation_cache.key(answer_type, task_text, answer_data['answer'], answer_data['level'])] = 'cached'
                 
         except Exception as e:
             results[f"error_{answer_data.get('id', 'unknown')}"] = str(e)
     
-    return results
\ No newline at end of file
+    return results
@@ -1,63 +1,158 @@
-from celery import current_task
 from app.core.celery_app import celery_app
 from app.core.database import AsyncSessionLocal
 from app.core.cache import cache
-from app.models.test import TestSession, PreliminaryTestSession
-from sqlalchemy import select, and_
-from datetime import datetime, timedelta
+from app.core.async_task import AsyncTask
+from app.core.config import settings
+from app.core.exam_state import exam_state, MAIN, PRELIMINARY
+from app.core.expiry_scheduler import expiry_scheduler
+from app.utils.file_paths import get_full_upload_path, FileTypes
+from app.models.test import TestSession, PreliminaryTestSession, GenerationCheckpoint
+from sqlalchemy import select, and_, delete, update
+from datetime import datetime, timedelta, timezone
 import os
+import glob
+import shutil
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-@celery_app.task(name="cleanup_expired_sessions")
-def cleanup_expired_sessions():
-    """Task to cleanup expired test sessions"""
+MAIN_EXPIRABLE_STATUSES = ["generating", "error", "abandoned"]
+PRELIMINARY_EXPIRABLE_STATUSES = ["in_progress", "error", "abandoned"]
+MAIN_TIMEOUT_STATUSES = ["ready", "in_progress"]
+PRELIMINARY_TIMEOUT_STATUSES = ["ready"]
+
+@celery_app.task(base=AsyncTask, name="cleanup_expired_sessions")
+async def cleanup_expired_sessions():
+    """Task to register sessions missing from the expiry schedule and expire the due ones"""
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_cleanup_sessions_internal())
-            return result
-        finally:
-            loop.close()
+        return await _cleanup_sessions_internal()
             
     except Exception as exc:
         logger.error(f"Error in cleanup_expired_sessions: {exc}")
         raise exc
 
 async def _cleanup_sessions_internal():
-    """Internal async function for session cleanup"""
+    """Backfills deadlines of open and expirable sessions created before the scheduler, then drains the due ones"""
+    ttl = timedelta(seconds=settings.session_expiry_seconds)
+    async with AsyncSessionLocal() as db:
+        main_rows = (await db.execute(
+            select(TestSession.id, TestSession.start_time).where(
+                TestSession.status.in_(MAIN_EXPIRABLE_STATUSES + MAIN_TIMEOUT_STATUSES)
+            )
+        )).all()
+        prelim_rows = (await db.execute(
+            select(PreliminaryTestSession.id, PreliminaryTestSession.start_time).where(
+                PreliminaryTestSession.status.in_(PRELIMINARY_EXPIRABLE_STATUSES + PRELIMINARY_TIMEOUT_STATUSES)
+            )
+        )).all()
+    
+    entries = [
+        (kind, session_id, ((start_time or datetime.utcnow()) + ttl).replace(tzinfo=timezone.utc).timestamp())
+        for kind, rows in ((MAIN, main_rows), (PRELIMINARY, prelim_rows))
+        for session_id, start_time in rows
+    ]
+    registered = await expiry_scheduler.schedule_missing(entries)
+    
+    result = await _expire_due_sessions_internal()
+    result['registered'] = registered
+    return result
+
+@celery_app.task(base=AsyncTask)
+async def expire_due_sessions():
+    """Expires the sessions whose deadline has passed, in batches"""
+    return await _expire_due_sessions_internal()
+
+async def _expire_due_sessions_internal():
+    main_cleaned = 0
+    prelim_cleaned = 0
+    timed_out = 0
+    while True:
+        due = await expiry_scheduler.claim_due(settings.session_expiry_batch_size)
+        if not due:
+            break
+        main_ids = [session_id for kind, session_id in due if kind == MAIN]
+        prelim_ids = [int(session_id) for kind, session_id in due if kind == PRELIMINARY]
+        main_expired, prelim_expired = await _expire_sessions(main_ids, prelim_ids)
+        main_cleaned += len(main_expired)
+        prelim_cleaned += len(prelim_expired)
+        timed_out += await _time_out_sessions(main_ids, prelim_ids)
+        if len(due) < settings.session_expiry_batch_size:
+            break
+    
+    if main_cleaned or prelim_cleaned or timed_out:
+        logger.info(f"Expired {main_cleaned} main and {prelim_cleaned} preliminary sessions, timed out {timed_out}")
+    return {
+        'main_sessions_cleaned': main_cleaned,
+        'prelim_sessions_cleaned': prelim_cleaned,
+        'total_cleaned': main_cleaned + prelim_cleaned,
+        'sessions_timed_out': timed_out
+    }
+
+async def _time_out_sessions(main_ids: list, prelim_ids: list) -> int:
+    """
+    Marks sessions that were never finished by their deadline as abandoned and schedules
+    them again, so they are deleted one expiry period later. Completed and annulled
+    sessions are not touched and leave the schedule for good.
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        main_timed_out = []
+        if main_ids:
+            main_timed_out = (await db.execute(
+                update(TestSession)
+                .where(and_(TestSession.id.in_(main_ids), TestSession.status.in_(MAIN_TIMEOUT_STATUSES)))
+                .values(status="abandoned", end_time=now)
+                .returning(TestSession.id)
+            )).scalars().all()
+        prelim_timed_out = []
+        if prelim_ids:
+            prelim_timed_out = (await db.execute(
+                update(PreliminaryTestSession)
+                .where(and_(
+                    PreliminaryTestSession.id.in_(prelim_ids),
+                    PreliminaryTestSession.status.in_(PRELIMINARY_TIMEOUT_STATUSES)
+                ))
+                .values(status="abandoned")
+                .returning(PreliminaryTestSession.id)
+            )).scalars().all()
+        await db.commit()
+    
+    for session_id in main_timed_out:
+        await expiry_scheduler.schedule(MAIN, session_id)
+    for session_id in prelim_timed_out:
+        await expiry_scheduler.schedule(PRELIMINARY, session_id)
+    return len(main_timed_out) + len(prelim_timed_out)
+
+async def _expire_sessions(main_ids: list, prelim_ids: list):
+    """Deletes the given sessions whose status is expirable; other sessions are left alone"""
     async with AsyncSessionLocal() as db:
         try:
-                                                   
-            expiration_time = datetime.utcnow() - timedelta(hours=24)
-            
-                                        
-            main_sessions_result = await db.execute(
-                select(TestSession).where(
-                    and_(
-                        TestSession.created_at < expiration_time,
-                        TestSession.status.in_(["generating", "error", "abandoned"])
+            expired_main_sessions = []
+            if main_ids:
+                expired_main_sessions = (await db.execute(
+                    select(TestSession).where(
+                        and_(TestSession.id.in_(main_ids), TestSession.status.in_(MAIN_EXPIRABLE_STATUSES))
                     )
-                )
-            )
-            expired_main_sessions = main_sessions_result.scalars().all()
+                )).scalars().all()
+            
+            expired_prelim_sessions = []
+            if prelim_ids:
+                expired_prelim_sessions = (await db.execute(
+                    select(PreliminaryTestSession).where(
+                        and_(
+                            PreliminaryTestSession.id.in_(prelim_ids),
+                            PreliminaryTestSession.status.in_(PRELIMINARY_EXPIRABLE_STATUSES)
+                        )
+                    )
+                )).scalars().all()
             
-                                               
-            prelim_sessions_result = await db.execute(
-                select(PreliminaryTestSession).where(
-                    and_(
-                        PreliminaryTestSession.created_at < expiration_time,
-                        PreliminaryTestSession.status.in_(["in_progress", "error", "abandoned"])
+            if expired_main_sessions:
+                await db.execute(
+                    delete(GenerationCheckpoint).where(
+                        GenerationCheckpoint.session_id.in_([session.id for session in expired_main_sessions])
                     )
                 )
-            )
-            expired_prelim_sessions = prelim_sessions_result.scalars().all()
-            
-                                     
             for session in expired_main_sessions:
                 await db.delete(session)
             
@@ -66,22 +161,42 @@ async def _cleanup_sessions_internal():
             
             await db.commit()
             
-                                           
-            for session in expired_main_sessions:
-                cache.delete_pattern(f"*:{session.id}:*")
-            
-            for session in expired_prelim_sessions:
-                cache.delete_pattern(f"*:{session.id}:*")
-            
-            return {
-                'main_sessions_cleaned': len(expired_main_sessions),
-                'prelim_sessions_cleaned': len(expired_prelim_sessions),
-                'total_cleaned': len(expired_main_sessions) + len(expired_prelim_sessions)
-            }
-            
         except Exception as e:
             await db.rollback()
             raise e
+    
+    expired_main_ids = [session.id for session in expired_main_sessions]
+    expired_prelim_ids = [session.id for session in expired_prelim_sessions]
+    
+    client = await cache.get_async_client()
+    keys = [
+        key
+        for session_id in expired_main_ids
+        for key in (
+            f"generating:{session_id}",
+            f"exam_bundle:{session_id}",
+            f"generation:{session_id}:sections",
+            f"final_scores:{session_id}",
+            f"speaking_jobs:{session_id}:pending",
+        )
+    ]
+    if keys:
+        await client.delete(*keys)
+    for session_id in expired_main_ids:
+        await exam_state.discard(MAIN, session_id)
+    for session_id in expired_prelim_ids:
+        await exam_state.discard(PRELIMINARY, session_id)
+    
+    chunks_root = get_full_upload_path(f"uploads/{FileTypes.CHUNKS}")
+    for session_id in expired_main_ids + [str(session_id) for session_id in expired_prelim_ids]:
+        await asyncio.to_thread(shutil.rmtree, os.path.join(chunks_root, str(session_id)), ignore_errors=True)
+    
+    recordings_root = get_full_upload_path(f"uploads/{FileTypes.SCREEN_RECORDINGS}")
+    for base_filename in expired_main_ids + [f"prelim_{session_id}" for session_id in expired_prelim_ids]:
+        for part_path in await asyncio.to_thread(glob.glob, os.path.join(recordings_root, f"{base_filename}.*.webm.part")):
+            await asyncio.to_thread(os.remove, part_path)
+    
+    return expired_main_ids, expired_prelim_ids
 
 @celery_app.task(name="cleanup_temp_files")
 def cleanup_temp_files():
@@ -129,8 +244,8 @@ def cleanup_temp_files():
         logger.error(f"Error in cleanup_temp_files: {exc}")
         raise exc
 
-@celery_app.task(name="health_check")
-def health_check():
+@celery_app.task(base=AsyncTask, name="health_check")
+async def health_check():
     """Task to perform system health checks"""
     try:
         health_status = {
@@ -149,19 +264,9 @@ def health_check():
         
                                
         try:
-            async def check_db():
-                async with AsyncSessionLocal() as db:
-                    await db.execute(select(1))
-                    return True
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                health_status['database'] = loop.run_until_complete(check_db())
-            finally:
-                loop.close()
-                
+            async with AsyncSessionLocal() as db:
+                await db.execute(select(1))
+            health_status['database'] = True
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
         
@@ -249,18 +354,11 @@ def optimize_cache():
         logger.error(f"Error in optimize_cache: {exc}")
         raise exc
 
-@celery_app.task(name="backup_critical_data")
-def backup_critical_data():
+@celery_app.task(base=AsyncTask, name="backup_critical_data")
+async def backup_critical_data():
     """Task to backup critical system data"""
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_backup_data_internal())
-            return result
-        finally:
-            loop.close()
+        return await _backup_data_internal()
             
     except Exception as exc:
         logger.error(f"Error in backup_critical_data: {exc}")
@@ -400,4 +498,35 @@ def generate_performance_report():
         
     except Exception as exc:
         logger.error(f"Error in generate_performance_report: {exc}")
-        raise exc
\ No newline at end of file
+        raise exc
+
+
+@celery_app.task(base=AsyncTask)
+async def flush_exam_state():
+    """Writes staged exam answers and drafts from Redis to Postgres"""
+    result = await exam_state.flush_all()
+    if result["sessions"]:
+        logger.info(f"Exam state flush: {result}")
+    return result
+
+
+@celery_app.task(base=AsyncTask)
+async def evict_tts_cache():
+    """Evicts least recently used shared TTS files above the size budget"""
+    from app.utils.tts_cache import tts_cache
+    
+    result = await tts_cache.evict()
+    if result["removed"]:
+        logger.info(f"TTS cache eviction: {result}")
+    return result
+
+
+@celery_app.task(base=AsyncTask)
+async def cleanup_blobs():
+    """Removes claim-check blobs that outlived every task that could reference them"""
+    from app.utils.blob_store import blob_store
+    
+    result = await asyncio.to_thread(blob_store.cleanup, settings.blob_max_age_seconds)
+    if result["removed"]:
+        logger.info(f"Blob store cleanup: {result}")
+    return result
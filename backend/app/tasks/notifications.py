@@ -1,6 +1,6 @@
-from celery import current_task
 from app.core.celery_app import celery_app
 from app.core.database import AsyncSessionLocal
+from app.core.async_task import AsyncTask
 from app.core.cache import cache
 from app.models.user import User
 from app.models.test import TestSession
@@ -13,28 +13,21 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-@celery_app.task(bind=True, name="send_test_completion_notification")
-def send_test_completion_notification(self, user_id: int, session_id: str, final_score: float, cefr_level: str):
+@celery_app.task(bind=True, base=AsyncTask, name="send_test_completion_notification")
+async def send_test_completion_notification(self, user_id: int, session_id: str, final_score: float, cefr_level: str):
     """Task to send test completion notification"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 2, 'status': 'Preparing notification...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_send_completion_notification_internal(
-                user_id, session_id, final_score, cefr_level, self
-            ))
-            return result
-        finally:
-            loop.close()
+        return await _send_completion_notification_internal(
+            user_id, session_id, final_score, cefr_level, self
+        )
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'user_id': user_id, 'session_id': session_id}
         )
@@ -141,26 +134,19 @@ async def _send_in_app_notification(user_id: int, notification_data: dict) -> bo
         logger.error(f"Failed to send in-app notification: {e}")
         return False
 
-@celery_app.task(bind=True, name="send_test_reminder")
-def send_test_reminder(self, user_id: int, session_id: str):
+@celery_app.task(bind=True, base=AsyncTask, name="send_test_reminder")
+async def send_test_reminder(self, user_id: int, session_id: str):
     """Task to send test reminder notification"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 1, 'status': 'Sending reminder...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_send_reminder_internal(user_id, session_id, self))
-            return result
-        finally:
-            loop.close()
+        return await _send_reminder_internal(user_id, session_id, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'user_id': user_id, 'session_id': session_id}
         )
@@ -1,154 +1,87 @@
-from celery import current_task
+from celery.exceptions import Retry
 from app.core.celery_app import celery_app
 from app.core.database import AsyncSessionLocal
 from app.services.test_service import TestService
 from app.services.preliminary_test_service import PreliminaryTestService
-from app.utils.openai_service import openai_service
 from app.core.cache import cache
-import asyncio
+from app.core.llm_scheduler import llm_priority, BULK
+from app.core.async_task import AsyncTask
+from app.core.config import settings
+from app.services.test_pool_service import TestPoolService, normalize_level
+from app.services.test_generation_pipeline import TestGenerationPipeline
+from app.utils.blob_store import blob_store
+from app.core.task_dedup import task_dedup
 import json
+import logging
 from typing import Dict, Any
 
-@celery_app.task(bind=True, name="generate_full_test_async")
-def generate_full_test_async(self, session_id: str, level: str):
-    """Background task for generating full test"""
+logger = logging.getLogger(__name__)
+
+@celery_app.task(bind=True, base=AsyncTask, name="generate_full_test_async", max_retries=3)
+async def generate_full_test_async(self, session_id: str, level: str):
+    """Background task for generating full test section by section; retries resume from checkpoints"""
+    level = normalize_level(level)
+    generation_key = f"generating:{session_id}"
+    cache_key = f"generated_test:{session_id}:{level}"
+    final_attempt = self.request.retries >= self.max_retries
+    retrying = False
+    
     try:
-                            
-        current_task.update_state(
-            state='PROGRESS',
-            meta={'current': 0, 'total': 4, 'status': 'Starting test generation...'}
-        )
+        cached_test = await cache.aget(cache_key)
+        if cached_test:
+            return await blob_store.offload(cached_test)
         
-                                          
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        pipeline = TestGenerationPipeline(session_id, level)
+        full_test_data = None
+        if not await pipeline.load_checkpoints():
+            async with AsyncSessionLocal() as db:
+                full_test_data = await TestPoolService(db).claim(level)
         
-        try:
-            result = loop.run_until_complete(_generate_full_test_internal(session_id, level, self))
-            return result
-        finally:
-            loop.close()
-            
-    except Exception as exc:
-        current_task.update_state(
-            state='FAILURE',
-            meta={'error': str(exc), 'session_id': session_id}
-        )
-        raise exc
-
-async def _generate_full_test_internal(session_id: str, level: str, task):
-    """Internal async function for test generation"""
-    async with AsyncSessionLocal() as db:
-        test_service = TestService(db)
+        result = await pipeline.run(full_test_data, finalize_on_error=final_attempt)
         
-        try:
-                                   
-            session = await test_service.get_test_session(session_id)
-            if not session:
-                raise Exception("Test session not found")
-            
-            session.status = "generating"
-            await db.commit()
-            
-                                    
-            task.update_state(
-                state='PROGRESS',
-                meta={'current': 1, 'total': 4, 'status': 'Generating reading section...'}
-            )
-            
-                                          
-            cache_key = f"generated_test:{session_id}:{level}"
-            
-                                             
-            cached_test = await cache.aget(cache_key)
-            if cached_test:
-                task.update_state(
-                    state='PROGRESS',
-                    meta={'current': 4, 'total': 4, 'status': 'Using cached test data...'}
-                )
-                return cached_test
-            
-                                
-            full_test_data = await openai_service.generate_full_test(level)
-            
-            task.update_state(
-                state='PROGRESS',
-                meta={'current': 2, 'total': 4, 'status': 'Processing test sections...'}
-            )
-            
-                              
-            reading_data = await test_service._process_section(
-                session_id, "reading", full_test_data.get("reading"), 
-                test_service._process_reading_section
-            )
-            
-            listening_data = await test_service._process_section(
-                session_id, "listening", full_test_data.get("listening"), 
-                test_service._process_listening_section
-            )
-            
-            task.update_state(
-                state='PROGRESS',
-                meta={'current': 3, 'total': 4, 'status': 'Finalizing test...'}
-            )
-            
-            writing_data = await test_service._process_section(
-                session_id, "writing", full_test_data.get("writing"), 
-                test_service._process_writing_section
-            )
-            
-            speaking_data = await test_service._process_section(
-                session_id, "speaking", full_test_data.get("speaking"), 
-                test_service._process_speaking_section
-            )
-            
-                                   
-            session.status = "ready"
-            await db.commit()
-            
-            result = {
-                "reading": reading_data,
-                "listening": listening_data,
-                "writing": writing_data,
-                "speaking": speaking_data,
-            }
-            
-                              
+        failed = [section for section, data in result.items() if isinstance(data, dict) and "error" in data]
+        if failed and not final_attempt:
+            retrying = True
+            await cache.aset(generation_key, True, ttl=600)
+            raise self.retry(countdown=30 * (self.request.retries + 1))
+        if not failed:
             await cache.aset(cache_key, result, ttl=1800)              
-            
-            task.update_state(
-                state='SUCCESS',
-                meta={'current': 4, 'total': 4, 'status': 'Test generation completed!'}
-            )
-            
-            return result
-            
-        except Exception as e:
-                                            
-            session.status = "error"
-            await db.commit()
-            raise e
+        return await blob_store.offload(result)
+        
+    except Retry:
+        raise
+    except Exception as exc:
+        if not final_attempt:
+            retrying = True
+            logger.warning(f"Full test generation failed for session {session_id}, retrying: {exc}")
+            await cache.aset(generation_key, True, ttl=600)
+            raise self.retry(exc=exc, countdown=30 * (self.request.retries + 1))
+        
+        logger.error(f"Full test generation failed for session {session_id}: {exc}")
+        await TestGenerationPipeline(session_id, level).fail(str(exc))
+        async with AsyncSessionLocal() as db:
+            session = await TestService(db).get_test_session(session_id)
+            if session:
+                session.status = "error"
+                await db.commit()
+        raise exc
+    finally:
+        if not retrying:
+            await cache.adelete(generation_key)
 
-@celery_app.task(bind=True, name="generate_preliminary_test_async")
-def generate_preliminary_test_async(self, session_id: int, level: str):
+@celery_app.task(bind=True, base=AsyncTask, name="generate_preliminary_test_async")
+async def generate_preliminary_test_async(self, session_id: int, level: str):
     """Background task for generating preliminary test"""
     try:
-        current_task.update_state(
+        self.update_state(
             state='PROGRESS',
             meta={'current': 0, 'total': 3, 'status': 'Starting preliminary test generation...'}
         )
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(_generate_preliminary_test_internal(session_id, level, self))
-            return result
-        finally:
-            loop.close()
+        return await _generate_preliminary_test_internal(session_id, level, self)
             
     except Exception as exc:
-        current_task.update_state(
+        self.update_state(
             state='FAILURE',
             meta={'error': str(exc), 'session_id': session_id}
         )
@@ -171,7 +104,7 @@ async def _generate_preliminary_test_internal(session_id: int, level: str, task)
                                
             cached_test = await cache.aget(cache_key)
             if cached_test:
-                return cached_test
+                return await blob_store.offload(cached_test)
             
             task.update_state(
                 state='PROGRESS',
@@ -189,7 +122,7 @@ async def _generate_preliminary_test_internal(session_id: int, level: str, task)
                 meta={'current': 3, 'total': 3, 'status': 'Preliminary test generated!'}
             )
             
-            return result
+            return await blob_store.offload(result)
             
         except Exception as e:
             raise e
@@ -223,27 +156,43 @@ def invalidate_test_cache(session_id: str, level: str = None):
 
 @celery_app.task(name="pregenerate_tests")
 def pregenerate_tests(levels: list = None):
-    """Task to pregenerate tests for common levels"""
-    if not levels:
-        levels = ["A1", "A2", "B1", "B2", "C1", "C2"]
+    """Task to pregenerate tests for common levels (fills the durable test pool)"""
+    return refill_test_pool.delay(levels).id
+
+
+@celery_app.task(base=AsyncTask, soft_time_limit=settings.test_pool_generate_soft_time_limit,
+                 time_limit=settings.test_pool_generate_soft_time_limit + 300)
+async def generate_pooled_test(level: str, slot: int):
+    """Generates one pooled test; the refill claim for the slot is released when it finishes"""
+    try:
+        with llm_priority(BULK):
+            async with AsyncSessionLocal() as db:
+                added = await TestPoolService(db).generate_one(level)
+        logger.info(f"Test pool {level}: slot {slot} {'filled' if added else 'failed'}")
+        return {"level": level, "slot": slot, "added": added}
+    finally:
+        await task_dedup.release(generate_pooled_test.name, f"{level}:{slot}")
+
+
+@celery_app.task(base=AsyncTask)
+async def refill_test_pool(levels: list = None):
+    """
+    Keeps every pool level at the target size once it drops below the low watermark:
+    enqueues one generation task per missing test. Each slot is deduplicated, so a
+    refill run while earlier generations are still queued does not add more
+    """
+    async with AsyncSessionLocal() as db:
+        counts = await TestPoolService(db).count_ready(levels)
     
     results = {}
-    
-    for level in levels:
-        try:
-                                          
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                test_data = loop.run_until_complete(openai_service.generate_full_test(level))
-                cache_key = f"pregenerated_test:{level}"
-                cache.set(cache_key, test_data, ttl=3600)          
-                results[level] = "success"
-            finally:
-                loop.close()
-                
-        except Exception as e:
-            results[level] = f"error: {str(e)}"
-    
-    return results
\ No newline at end of file
+    for level, ready in counts.items():
+        if ready >= settings.test_pool_low_watermark:
+            results[level] = {"ready": ready, "enqueued": 0}
+            continue
+        enqueued = 0
+        for slot in range(ready, settings.test_pool_target):
+            _, created = await task_dedup.enqueue(generate_pooled_test, f"{level}:{slot}", args=(level, slot))
+            enqueued += int(created)
+        results[level] = {"ready": ready, "enqueued": enqueued}
+        logger.info(f"Test pool {level}: {ready} ready, enqueued {enqueued} generations")
+    return results
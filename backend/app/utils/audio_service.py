@@ -1,8 +1,9 @@
+import logging
 import asyncio
 import os
 import subprocess
-import tempfile
-from typing import Optional
+import uuid
+from typing import Optional, Tuple
 
 from io import BytesIO   
 import aiofiles
@@ -10,6 +11,18 @@ import aiofiles
 from openai import AsyncAzureOpenAI
 
 from ..core.config import settings
+from .tts_executor import tts_executor
+from ..core.llm_scheduler import llm_scheduler, TTS, TRANSCRIBE
+
+logger = logging.getLogger(__name__)
+
+PIPE_CHUNK_SIZE = 64 * 1024
+
+TRANSCODE_FORMATS = {
+    "wav": (['-c:a', 'pcm_s16le', '-f', 'wav'], "wav"),
+    "flac": (['-c:a', 'flac', '-f', 'flac'], "flac"),
+    "opus": (['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'], "ogg"),
+}
 
 
 class AudioService:
@@ -23,6 +36,7 @@ class AudioService:
             api_version=settings.azure_openai_audio_api_version,
             azure_endpoint=settings.azure_openai_endpoint_audio,
             api_key=settings.azure_openai_api_key_audio,
+            max_retries=0,
         )
         self.transcribe_client = AsyncAzureOpenAI(
             api_version=settings.azure_openai_audio_api_version,
@@ -34,65 +48,102 @@ class AudioService:
         print(f"  - API Version (config): {settings.azure_openai_audio_api_version}")
         print(f"  - Transcribe Deployment: {settings.azure_openai_transcribe_deployment}")
 
+    async def _synthesize(self, text: str, voice: str) -> bytes:
+        """Один запрос к TTS без обработки ошибок; каждая попытка берет свой токен из общего бюджета."""
+        await llm_scheduler.acquire(TTS)
+        response = await self.tts_client.audio.speech.create(
+            model=settings.azure_openai_tts_deployment,
+            voice=voice,
+            input=text,
+            response_format="mp3"
+        )
+        return response.content
+
     async def text_to_speech(self, text: str, voice: str = "alloy") -> Optional[bytes]:
-        """Конвертирует текст в речь (аудио-байт-код)."""
+        """Конвертирует текст в речь (аудио-байт-код) через общий ограниченный исполнитель с повторами."""
         if not self.tts_client:
             return None
+        return await tts_executor.run(
+            settings.azure_openai_tts_deployment,
+            lambda: self._synthesize(text, voice),
+            label=f"{len(text)} chars"
+        )
+
+    async def _transcode(self, audio_data: bytes, output_format: str = "flac") -> Optional[Tuple[bytes, str]]:
+        """
+        Перекодирует аудио в 16 кГц моно через ffmpeg без временных файлов: вход пишется
+        в stdin, результат читается из stdout блоками по PIPE_CHUNK_SIZE.
+        Возвращает (данные, расширение) или None при ошибке.
+        """
+        if output_format not in TRANSCODE_FORMATS:
+            logger.warning(f"Unknown transcode format {output_format}, using flac")
+            output_format = "flac"
+        codec_args, extension = TRANSCODE_FORMATS[output_format]
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-ar', '16000',
+            '-ac', '1',
+            *codec_args,
+            'pipe:1'
+        ]
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            limit=PIPE_CHUNK_SIZE
+        )
+
+        async def feed() -> None:
+            try:
+                for offset in range(0, len(audio_data), PIPE_CHUNK_SIZE):
+                    process.stdin.write(audio_data[offset:offset + PIPE_CHUNK_SIZE])
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                process.stdin.close()
+
+        async def collect() -> bytes:
+            chunks = []
+            size = 0
+            while True:
+                chunk = await process.stdout.read(PIPE_CHUNK_SIZE)
+                if not chunk:
+                    return b"".join(chunks)
+                size += len(chunk)
+                if size > settings.ffmpeg_max_output_bytes:
+                    raise ValueError(f"ffmpeg output exceeds {settings.ffmpeg_max_output_bytes} bytes")
+                chunks.append(chunk)
+
+        async def errors() -> bytes:
+            tail = b""
+            while True:
+                chunk = await process.stderr.read(PIPE_CHUNK_SIZE)
+                if not chunk:
+                    return tail
+                tail = (tail + chunk)[-4096:]
+
         try:
-            response = await self.tts_client.audio.speech.create(
-                model=settings.azure_openai_tts_deployment,
-                voice=voice,
-                input=text,
-                response_format="mp3"
+            _, converted_data, stderr = await asyncio.wait_for(
+                asyncio.gather(feed(), collect(), errors()),
+                timeout=settings.ffmpeg_timeout_seconds
             )
-            return response.content
+            returncode = await process.wait()
         except Exception as e:
-            print(f"Error in text_to_speech: {e}")
+            logger.error(f"Error transcoding audio to {output_format}: {type(e).__name__}: {e}")
             return None
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
 
-    async def _convert_webm_to_wav(self, audio_data: bytes) -> Optional[bytes]:
-        """Конвертирует WebM в WAV используя ffmpeg."""
-        try:
-                                     
-            with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as input_file:
-                input_file.write(audio_data)
-                input_path = input_file.name
-            
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as output_file:
-                output_path = output_file.name
-            
-                                           
-            cmd = [
-                'ffmpeg', '-i', input_path, 
-                '-ar', '16000',                     
-                '-ac', '1',            
-                '-c:a', 'pcm_s16le',              
-                '-y',                                   
-                output_path
-            ]
-            
-            process = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                print(f"FFmpeg error: {stderr.decode()}")
-                return None
-            
-                                          
-            async with aiofiles.open(output_path, 'rb') as f:
-                converted_data = await f.read()
-            
-                                     
-            os.unlink(input_path)
-            os.unlink(output_path)
-            
-            print(f"Successfully converted WebM to WAV: {len(audio_data)} -> {len(converted_data)} bytes")
-            return converted_data
-            
-        except Exception as e:
-            print(f"Error converting WebM to WAV: {e}")
+        if returncode != 0 or not converted_data:
+            logger.error(f"FFmpeg error: {stderr.decode(errors='replace')}")
             return None
 
+        logger.debug(f"Successfully transcoded audio to {output_format}: {len(audio_data)} -> {len(converted_data)} bytes")
+        return converted_data, extension
+
     async def speech_to_text_from_bytes(self, audio_data: bytes) -> Optional[str]:
         """
         Транскрибирует аудио используя GPT-4o-transcribe модель.
@@ -111,11 +162,10 @@ class AudioService:
             
                                                
             if original_format == "webm":
-                print("Converting WebM to WAV for better compatibility...")
-                converted_data = await self._convert_webm_to_wav(audio_data)
-                if converted_data:
-                    audio_data = converted_data
-                    audio_format = "wav"
+                logger.debug(f"Converting WebM to {settings.transcription_audio_format} for better compatibility...")
+                converted = await self._transcode(audio_data, settings.transcription_audio_format)
+                if converted:
+                    audio_data, audio_format = converted
                     print(f"Conversion successful, new size: {len(audio_data)} bytes")
                 else:
                     print("Conversion failed, trying original WebM data...")
@@ -128,6 +178,7 @@ class AudioService:
             
             print(f"Using deployment: {settings.azure_openai_transcribe_deployment}")
 
+            await llm_scheduler.acquire(TRANSCRIBE)
             transcript = await self.transcribe_client.audio.transcriptions.create(
                 model=settings.azure_openai_transcribe_deployment,  
                 file=audio_io,
@@ -171,14 +222,21 @@ class AudioService:
             return "webm"
 
     async def save_audio_file(self, audio_data: bytes, file_path: str) -> bool:
-        """Сохраняет аудио-данные в файл, создавая директорию при необходимости."""
+        """
+        Сохраняет аудио-данные во временный файл и атомарно переименовывает его,
+        чтобы читатели никогда не видели недописанный файл.
+        """
+        temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
         try:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            async with aiofiles.open(file_path, "wb") as f:
+            async with aiofiles.open(temp_path, "wb") as f:
                 await f.write(audio_data)
+            os.replace(temp_path, file_path)
             return True
         except Exception as e:
-            print(f"Error saving audio file to {file_path}: {e}")
+            logger.error(f"Error saving audio file to {file_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return False
 
 audio_service = AudioService()
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Хранилище крупных данных для задач Celery (claim-check)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict
+
+import aiofiles
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CHECK_KEY = "claim_check"
+
+
+class BlobIntegrityError(Exception):
+    """Блоб отсутствует или его содержимое не совпадает с контрольной суммой ссылки"""
+
+
+class BlobStore:
+    """
+    Файловое хранилище, адресуемое по sha256, в общей папке API и воркеров.
+    Задачи получают и возвращают небольшую ссылку {"sha256", "size"} вместо самих
+    данных, поэтому брокер и бэкенд результатов Redis не хранят аудио и большие JSON
+    """
+
+    def __init__(self):
+        self.directory = settings.blob_store_dir
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    async def put(self, data: bytes) -> Dict[str, Any]:
+        """Сохраняет данные (атомарно, без повторной записи одинаковых) и возвращает ссылку"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if await asyncio.to_thread(os.path.exists, path):
+            await asyncio.to_thread(os.utime, path)
+        else:
+            await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            try:
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    await f.write(data)
+                await asyncio.to_thread(os.replace, tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        return {"sha256": digest, "size": len(data)}
+
+    async def get(self, ref: Dict[str, Any]) -> bytes:
+        """Читает данные по ссылке и проверяет размер и контрольную сумму"""
+        path = self._path(ref["sha256"])
+        try:
+            async with aiofiles.open(path, "rb") as f:
+                data = await f.read()
+        except FileNotFoundError:
+            raise BlobIntegrityError(f"Blob {ref['sha256']} not found")
+        if len(data) != ref["size"] or hashlib.sha256(data).hexdigest() != ref["sha256"]:
+            raise BlobIntegrityError(f"Blob {ref['sha256']} failed checksum verification")
+        return data
+
+    async def delete(self, ref: Dict[str, Any]) -> None:
+        try:
+            await asyncio.to_thread(os.unlink, self._path(ref["sha256"]))
+        except FileNotFoundError:
+            pass
+
+    async def put_json(self, value: Any) -> Dict[str, Any]:
+        return await self.put(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+    async def get_json(self, ref: Dict[str, Any]) -> Any:
+        return json.loads(await self.get(ref))
+
+    async def offload(self, value: Any) -> Any:
+        """
+        Возвращает значение как есть, если в сериализованном виде оно меньше
+        claim_check_threshold_bytes, иначе сохраняет его и возвращает {"claim_check": ссылка}
+        """
+        encoded = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        if len(encoded) < settings.claim_check_threshold_bytes:
+            return value
+        return {CLAIM_CHECK_KEY: await self.put(encoded)}
+
+    async def resolve(self, value: Any) -> Any:
+        """Обратная операция к offload"""
+        if isinstance(value, dict) and set(value) == {CLAIM_CHECK_KEY}:
+            return await self.get_json(value[CLAIM_CHECK_KEY])
+        return value
+
+    def cleanup(self, max_age_seconds: int) -> Dict[str, int]:
+        """Удаляет блобы старше max_age_seconds (синхронно, для задачи обслуживания)"""
+        removed = 0
+        freed = 0
+        if not os.path.isdir(self.directory):
+            return {"removed": 0, "freed_bytes": 0}
+        cutoff = time.time() - max_age_seconds
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                        freed += stat.st_size
+                except FileNotFoundError:
+                    continue
+        return {"removed": removed, "freed_bytes": freed}
+
+
+blob_store = BlobStore()
@@ -0,0 +1,50 @@
+"""
+Утилиты для массового обновления строк одним запросом
+"""
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def bulk_update_by_id(
+    db: AsyncSession,
+    model,
+    rows: List[Dict[str, Any]],
+    columns: Sequence[str],
+    where=None
+) -> int:
+    """
+    Обновляет несколько строк одним запросом вида
+    UPDATE <table> SET ... FROM (VALUES ...) AS v WHERE <table>.id = v.id
+
+    Args:
+        db: асинхронная сессия
+        model: ORM модель с первичным ключом id
+        rows: словари с ключом "id" и значениями для columns
+        columns: имена обновляемых колонок
+        where: дополнительное условие (например, принадлежность сессии)
+
+    Returns:
+        int: количество обновленных строк
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    value_columns = [column("id", table.c.id.type)] + [
+        column(name, table.c[name].type) for name in columns
+    ]
+    data = values(*value_columns, name="v").data([
+        tuple([row["id"]] + [row.get(name) for name in columns]) for row in rows
+    ])
+
+    stmt = (
+        update(table)
+        .where(table.c.id == data.c.id)
+        .values({name: data.c[name] for name in columns})
+    )
+    if where is not None:
+        stmt = stmt.where(where)
+    result = await db.execute(stmt)
+    return result.rowcount
@@ -0,0 +1,78 @@
+"""
+Объединение одновременных оценок письменных и устных ответов в пакетные запросы
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.utils.openai_service import openai_service
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationBatcher:
+    """
+    Собирает оценки одного вида (writing / speaking), пришедшие в течение
+    evaluation_batch_window_ms, и отправляет их одним запросом по evaluation_batch_size
+    штук. В конце экзамена, когда ответы приходят одновременно, это сокращает число
+    запросов к Azure OpenAI; одиночный ответ ждет не дольше окна.
+    Имеет смысл только в процессе API: prefork-воркер Celery выполняет одну задачу
+    на процесс, пакет там не наберется, поэтому воркеры вызывают
+    evaluate_answers_batch напрямую
+    """
+
+    def __init__(self):
+        self.batch_size = settings.evaluation_batch_size
+        self.window = settings.evaluation_batch_window_ms / 1000
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, List[Tuple[Dict[str, str], asyncio.Future]]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._timers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.TimerHandle]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._running: Set[asyncio.Task] = set()
+
+    async def evaluate(self, kind: str, prompt: str, answer: str, level: str) -> Optional[Dict[str, Any]]:
+        """Оценивает один ответ в составе ближайшего пакета"""
+        if self.batch_size <= 1:
+            results = await openai_service.evaluate_answers_batch(kind, [{"prompt": prompt, "answer": answer, "level": level}])
+            return results[0]
+
+        loop = asyncio.get_running_loop()
+        queue = self._pending.setdefault(loop, {}).setdefault(kind, [])
+        future = loop.create_future()
+        queue.append(({"prompt": prompt, "answer": answer, "level": level}, future))
+
+        if len(queue) >= self.batch_size:
+            self._flush(loop, kind)
+        elif len(queue) == 1:
+            self._timers.setdefault(loop, {})[kind] = loop.call_later(self.window, self._flush, loop, kind)
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, kind: str) -> None:
+        timer = self._timers.get(loop, {}).pop(kind, None)
+        if timer:
+            timer.cancel()
+        queue = self._pending.get(loop, {}).pop(kind, [])
+        if queue:
+            task = loop.create_task(self._run(kind, queue))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, kind: str, queue: List[Tuple[Dict[str, str], asyncio.Future]]) -> None:
+        try:
+            results = await openai_service.evaluate_answers_batch(kind, [item for item, _ in queue])
+        except Exception as e:
+            logger.error(f"Batched {kind} evaluation of {len(queue)} answers failed: {e}")
+            for _, future in queue:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(queue, results):
+            if not future.done():
+                future.set_result(result)
+
+
+evaluation_batcher = EvaluationBatcher()
@@ -1,3 +1,4 @@
+import logging
 import asyncio
 import json
 from typing import Any, Dict, List, Optional
@@ -5,6 +6,9 @@ from typing import Any, Dict, List, Optional
 from openai import AsyncAzureOpenAI
 
 from ..core.config import settings
+from ..core.llm_scheduler import llm_scheduler, LLMSchedulerTimeout, CHAT
+
+logger = logging.getLogger(__name__)
 
 
 class OpenAIService:
@@ -13,7 +17,7 @@ class OpenAIService:
 
     def _initialize_client(self) -> Optional[AsyncAzureOpenAI]:
         if not settings.azure_openai_endpoint or not settings.azure_openai_api_key:
-            print("[OpenAIService] Azure OpenAI not configured (endpoint/api_key missing). Chat features disabled.")
+            logger.warning("Azure OpenAI not configured (endpoint/api_key missing). Chat features disabled.")
             return None
         return AsyncAzureOpenAI(
             api_version=settings.azure_openai_api_version,
@@ -28,7 +32,7 @@ class OpenAIService:
         try:
             return json.loads(response)
         except json.JSONDecodeError:
-            print(f"FATAL: OpenAI returned invalid JSON for {method_name}. Response: {response}")
+            logger.error(f"OpenAI returned invalid JSON for {method_name}. Response: {response}")
             return None
 
     async def _generate_chat_completion(
@@ -40,20 +44,27 @@ class OpenAIService:
         """Основной метод для вызова чат-моделей с принудительным JSON-ответом."""
         if not self.client:
             return None
+        estimated_tokens = sum(len(m.get("content", "")) for m in messages) // 4 + max_tokens
         try:
-            print(f"[DEBUG] Making OpenAI request with model: {settings.azure_openai_deployment}")
-            response = await self.client.chat.completions.create(
-                model=settings.azure_openai_deployment,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                response_format={"type": "json_object"}
-            )
+            async with llm_scheduler.slot(CHAT, tokens=estimated_tokens) as slot:
+                logger.debug(f"Making OpenAI request with model: {settings.azure_openai_deployment}")
+                response = await self.client.chat.completions.create(
+                    model=settings.azure_openai_deployment,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    response_format={"type": "json_object"}
+                )
+                if response.usage:
+                    slot.actual_tokens = response.usage.total_tokens
             content = response.choices[0].message.content
-            print(f"[DEBUG] OpenAI response received, length: {len(content) if content else 0}")
+            logger.debug(f"OpenAI response received, length: {len(content) if content else 0}")
             return content
+        except LLMSchedulerTimeout as e:
+            logger.warning(f"Azure OpenAI chat completion not scheduled: {e}")
+            return None
         except Exception as e:
-            print(f"Error calling Azure OpenAI chat completion: {e}")
+            logger.error(f"Error calling Azure OpenAI chat completion: {e}")
             return None
 
     async def generate_reading_test(self, level: str) -> Optional[Dict[str, Any]]:
@@ -80,7 +91,7 @@ Return the response in this EXACT JSON format with no extra text:
 
     async def generate_listening_test(self, level: str) -> Optional[Dict[str, Any]]:
         """Генерирует сценарии для аудирования (скрипты и вопросы)."""
-        print(f"[DEBUG] Generating listening test for level: {level}")
+        logger.debug(f"Generating listening test for level: {level}")
         
         try:
             system_prompt = f"""
@@ -102,20 +113,20 @@ Return the response in this EXACT JSON format with no extra text:
             response = await self._generate_chat_completion(messages, temperature=0.8)
             
             if not response:
-                print(f"[ERROR] No response from OpenAI for listening test generation")
+                logger.error("No response from OpenAI for listening test generation")
                 return {"error": "No response from OpenAI"}
             
             result = self._parse_json_response(response, "generate_listening_test")
-            print(f"[DEBUG] Generated listening test result: {result}")
+            logger.debug(f"Generated listening test result: {result}")
             
                                            
             if not result or "scenarios" not in result:
-                print(f"[ERROR] Invalid listening test structure: {result}")
+                logger.error(f"Invalid listening test structure: {result}")
                 return {"error": "Invalid test structure from OpenAI"}
             
             scenarios = result.get("scenarios", [])
             if not scenarios or len(scenarios) == 0:
-                print(f"[ERROR] No scenarios generated in listening test")
+                logger.error("No scenarios generated in listening test")
                 return {"error": "No scenarios generated"}
             
                                     
@@ -123,15 +134,15 @@ Return the response in this EXACT JSON format with no extra text:
                 required_fields = ["audio_script", "question", "options", "correct_answer"]
                 missing_fields = [field for field in required_fields if not scenario.get(field)]
                 if missing_fields:
-                    print(f"[ERROR] Scenario {i+1} missing fields: {missing_fields}")
+                    logger.error(f"Scenario {i+1} missing fields: {missing_fields}")
                     return {"error": f"Scenario {i+1} missing required fields: {missing_fields}"}
             
             return result
             
         except Exception as e:
-            print(f"[ERROR] Exception in generate_listening_test: {e}")
+            logger.error(f"Exception in generate_listening_test: {e}")
             import traceback
-            print(f"[ERROR] Traceback: {traceback.format_exc()}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
             return {"error": f"Exception during generation: {str(e)}"}
 
     async def generate_writing_test(self, level: str) -> Optional[Dict[str, Any]]:
@@ -178,92 +189,56 @@ Return the response in this EXACT JSON format with no extra text:
         response = await self._generate_chat_completion(messages, temperature=0.8)
         return self._parse_json_response(response, "generate_speaking_test")
 
-    async def generate_full_test(self, level: str) -> Dict[str, Any]:
-        """Генерирует полный тест, выполняя все секции параллельно с кэшированием."""
+    async def generate_section(self, level: str, section: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Генерирует одну секцию теста с кэшированием по уровню.
+        use_cache=False генерирует новую секцию (для пула готовых тестов).
+        """
+        from app.core.cache import cache
+
+        generators = {
+            "reading": self.generate_reading_test,
+            "listening": self.generate_listening_test,
+            "writing": self.generate_writing_test,
+            "speaking": self.generate_speaking_test,
+        }
+        cache_key = f"test_section_{level}_{section}"
+        cached = await cache.aget(cache_key) if use_cache else None
+        if cached and not (isinstance(cached, dict) and "error" in cached):
+            return cached
+        result = await generators[section](level)
+        if use_cache and result and not (isinstance(result, dict) and "error" in result):
+            await cache.aset(cache_key, result, ttl=1800)
+        return result
+
+    async def generate_full_test(self, level: str, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Генерирует полный тест, выполняя все секции параллельно с кэшированием.
+        use_cache=False генерирует новые секции (для пула готовых тестов).
+        """
+        sections = ("reading", "listening", "writing", "speaking")
         if not self.client:
             msg = "Azure OpenAI not configured. Set AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY in backend/.env"
-            return {
-                "reading": {"error": msg},
-                "listening": {"error": msg},
-                "writing": {"error": msg},
-                "speaking": {"error": msg},
-            }
-        from app.core.cache import acached
-
-        from app.core.cache import cache
-        pregenerated_key = f"pregenerated_test:{level}"
-        pregenerated_test = await cache.aget(pregenerated_key)
-        
-        if pregenerated_test:
-                                                            
-            await cache.adelete(pregenerated_key)
-            return pregenerated_test
-        
-                                                                              
-        async def cached_generate_reading():
-            cache_key = f"test_section_{level}_reading"
-            cached = await cache.aget(cache_key)
-            if cached and not (isinstance(cached, dict) and "error" in cached):
-                return cached
-            result = await self.generate_reading_test(level)
-            if not (isinstance(result, dict) and "error" in result):
-                await cache.aset(cache_key, result, ttl=1800)
-            return result
-        
-        async def cached_generate_listening():
-            cache_key = f"test_section_{level}_listening"
-            cached = await cache.aget(cache_key)
-            if cached and not (isinstance(cached, dict) and "error" in cached):
-                return cached
-            result = await self.generate_listening_test(level)
-            if not (isinstance(result, dict) and "error" in result):
-                await cache.aset(cache_key, result, ttl=1800)
-            return result
+            return {section: {"error": msg} for section in sections}
         
-        async def cached_generate_writing():
-            cache_key = f"test_section_{level}_writing"
-            cached = await cache.aget(cache_key)
-            if cached and not (isinstance(cached, dict) and "error" in cached):
-                return cached
-            result = await self.generate_writing_test(level)
-            if not (isinstance(result, dict) and "error" in result):
-                await cache.aset(cache_key, result, ttl=1800)
-            return result
-        
-        async def cached_generate_speaking():
-            cache_key = f"test_section_{level}_speaking"
-            cached = await cache.aget(cache_key)
-            if cached and not (isinstance(cached, dict) and "error" in cached):
-                return cached
-            result = await self.generate_speaking_test(level)
-            if not (isinstance(result, dict) and "error" in result):
-                await cache.aset(cache_key, result, ttl=1800)
-            return result
-        
-        tasks = [
-            cached_generate_reading(),
-            cached_generate_listening(),
-            cached_generate_writing(),
-            cached_generate_speaking()
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await asyncio.gather(
+            *[self.generate_section(level, section, use_cache) for section in sections],
+            return_exceptions=True
+        )
         
         test_data = {
-            "reading": results[0] if not isinstance(results[0], Exception) else {"error": str(results[0])},
-            "listening": results[1] if not isinstance(results[1], Exception) else {"error": str(results[1])},
-            "writing": results[2] if not isinstance(results[2], Exception) else {"error": str(results[2])},
-            "speaking": results[3] if not isinstance(results[3], Exception) else {"error": str(results[3])}
+            section: result if not isinstance(result, Exception) else {"error": str(result)}
+            for section, result in zip(sections, results)
         }
         
                        
         for section, data in test_data.items():
             if isinstance(data, dict) and "error" in data:
-                print(f"[ERROR] {section} generation failed: {data['error']}")
+                logger.error(f"{section} generation failed: {data['error']}")
             else:
-                print(f"[DEBUG] {section} generation successful: {type(data)}")
+                logger.debug(f"{section} generation successful: {type(data)}")
         
-        print(f"[DEBUG] Full test data generated for level {level}: {test_data}")
+        logger.debug(f"Full test data generated for level {level}: {test_data}")
         
         return test_data
 
@@ -339,6 +314,104 @@ Return ONLY valid JSON in this format with no other text:
             "breakdown": {}, "suggestions": []
         }
 
+    def _validate_evaluation(self, item: Any, criteria: List[str]) -> Optional[Dict[str, Any]]:
+        """Проверяет одну оценку из пакета: общий балл 0-100 и баллы критериев 0-25."""
+        if not isinstance(item, dict) or not isinstance(item.get("feedback"), str):
+            return None
+        breakdown = item.get("breakdown")
+        if not isinstance(breakdown, dict) or set(breakdown) != set(criteria):
+            return None
+        try:
+            score = float(item["score"])
+            parts = [float(breakdown[name]) for name in criteria]
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not 0 <= score <= 100 or any(not 0 <= part <= 25 for part in parts):
+            return None
+        suggestions = item.get("suggestions") if isinstance(item.get("suggestions"), list) else []
+        return {
+            "score": score,
+            "breakdown": {name: part for name, part in zip(criteria, parts)},
+            "feedback": item["feedback"],
+            "suggestions": [str(s) for s in suggestions],
+        }
+
+    async def evaluate_answers_batch(self, kind: str, items: List[Dict[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Оценивает несколько письменных (kind="writing") или устных (kind="speaking") ответов
+        одним запросом. items: [{"prompt": ..., "answer": ..., "level": ...}].
+        Каждая оценка проверяется отдельно; для невалидных и пропущенных элементов
+        выполняется обычный одиночный вызов.
+        """
+        if not items:
+            return []
+        if kind == "writing":
+            criteria = ["grammar", "vocabulary", "coherence", "task_completion"]
+            task_text = """You are an English teacher strictly evaluating writing tasks. Each item has its own CEFR level.
+Criteria (each 0-25):
+1. Grammar
+2. Vocabulary
+3. Coherence & Cohesion
+4. Task Completion & Relevance — THE MOST IMPORTANT.  Give 0 if the response does not address the prompt or is obviously off-topic.  Give 5 or less if it only partially answers the prompt.
+
+If a response is mostly irrelevant (e.g. answers another question such as "London is the capital of Great Britain"), its TOTAL score must not exceed 40."""
+            single = self.evaluate_writing_answer
+        else:
+            criteria = ["fluency", "vocabulary", "grammar", "task_achievement"]
+            task_text = """You are an English teacher evaluating speaking responses. Each item has its own CEFR level.
+You receive ONLY transcriptions, so disregard pronunciation and focus on MEANING.
+
+Criteria (0-25 each):
+• Fluency (discourse markers, pauses)
+• Vocabulary range and accuracy
+• Grammar range and accuracy
+• Task Achievement & Relevance — give 0 if the response is off-topic.  Off-topic answers must not get a total score higher than 40."""
+            single = self.evaluate_speaking_answer
+        if len(items) == 1:
+            return [await single(items[0]["prompt"], items[0]["answer"], items[0]["level"])]
+
+        breakdown_example = ", ".join(f'"{name}": 20' for name in criteria)
+        system_prompt = f"""
+{task_text}
+
+Evaluate every item independently; one item must never influence another.
+Return ONLY valid JSON in this format with exactly one evaluation per item id and no other text:
+{{
+    "evaluations": [
+        {{
+            "id": 0,
+            "score": 80.0,
+            "breakdown": {{{breakdown_example}}},
+            "feedback": "Specific feedback for this item.",
+            "suggestions": ["Suggestion 1", "Suggestion 2"]
+        }}
+    ]
+}}"""
+        user_prompt = json.dumps(
+            [{"id": i, "level": item["level"], "task": item["prompt"], "response": item["answer"]} for i, item in enumerate(items)],
+            ensure_ascii=False
+        )
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        response = await self._generate_chat_completion(messages, max_tokens=min(600 * len(items), 16000), temperature=0.5)
+        parsed = self._parse_json_response(response, f"evaluate_{kind}_answers_batch") or {}
+        evaluations = parsed.get("evaluations") if isinstance(parsed.get("evaluations"), list) else []
+        for evaluation in evaluations:
+            index = evaluation.get("id") if isinstance(evaluation, dict) else None
+            if isinstance(index, int) and 0 <= index < len(items) and results[index] is None:
+                results[index] = self._validate_evaluation(evaluation, criteria)
+
+        failed = [i for i, result in enumerate(results) if result is None]
+        if failed:
+            logger.warning(f"{len(failed)} of {len(items)} batched {kind} evaluations invalid, falling back to single calls")
+            fallbacks = await asyncio.gather(*[
+                single(items[i]["prompt"], items[i]["answer"], items[i]["level"]) for i in failed
+            ])
+            for i, evaluation in zip(failed, fallbacks):
+                results[i] = evaluation
+        return results
+
     def calculate_cefr_level(self, reading_score: float, listening_score: float, 
                            writing_score: float, speaking_score: float) -> str:
         """Рассчитывает итоговый уровень CEFR по баллам секций."""
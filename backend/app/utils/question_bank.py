@@ -0,0 +1,289 @@
+"""
+Скомпилированный банк вопросов предварительного теста
+"""
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("grammar", "vocabulary", "reading")
+
+_MAGIC = b"QBNK"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sII")
+
+EXPOSURES_KEY = "question_bank:exposures"
+
+
+class BankItem:
+    """
+    Запись банка: метаданные хранятся в слотах, содержимое вопроса
+    декодируется из отображенного в память файла по требованию
+    """
+    __slots__ = ("item_id", "category", "level", "source_id", "version", "offset", "length", "_buffer")
+
+    def __init__(self, item_id: str, category: str, level: str, source_id, version: str,
+                 offset: int, length: int, buffer):
+        self.item_id = item_id
+        self.category = category
+        self.level = level
+        self.source_id = source_id
+        self.version = version
+        self.offset = offset
+        self.length = length
+        self._buffer = buffer
+
+    @property
+    def data(self) -> Dict:
+        """Исходный JSON вопроса (для reading - текст вместе с вопросами)"""
+        return json.loads(self._buffer[self.offset:self.offset + self.length])
+
+    def __repr__(self) -> str:
+        return f"BankItem({self.item_id}@{self.version})"
+
+
+class QuestionBank:
+    """
+    Банк вопросов, скомпилированный из app/questions_data в один бинарный файл:
+    заголовок с индексами по категории и уровню и блок с JSON записей.
+    Файл отображается в память, поэтому все воркеры на хосте делят одни и те же страницы
+    """
+
+    def __init__(self, source_dir: Optional[str] = None, compiled_path: Optional[str] = None):
+        self.source_dir = source_dir or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "questions_data"
+        )
+        self.compiled_path = compiled_path or settings.question_bank_compiled_path
+        self.snapshot_dir = settings.question_bank_snapshot_dir
+        self.reload_interval = settings.question_bank_reload_interval
+
+        self._lock = threading.Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._fingerprint: Optional[str] = None
+        self._compiled_mtime: Optional[int] = None
+        self._buckets: Dict[Tuple[str, str], List[BankItem]] = {}
+        self._items: Dict[str, BankItem] = {}
+        self._checked_at = 0.0
+
+    def _source_files(self) -> List[Tuple[str, str, str]]:
+        """Возвращает (категория, уровень, путь) для всех файлов вопросов"""
+        files = []
+        for category in CATEGORIES:
+            category_dir = os.path.join(self.source_dir, category)
+            if not os.path.isdir(category_dir):
+                continue
+            for level in sorted(os.listdir(category_dir)):
+                file_path = os.path.join(category_dir, level, "questions.json")
+                if os.path.isfile(file_path):
+                    files.append((category, level, file_path))
+        return files
+
+    def _source_fingerprint(self) -> str:
+        """Отпечаток исходных файлов по пути, размеру и времени изменения"""
+        digest = hashlib.sha1()
+        for category, level, file_path in self._source_files():
+            stat = os.stat(file_path)
+            digest.update(f"{category}/{level}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()
+
+    def _snapshot_path(self, version: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{version}.json")
+
+    def _write_snapshot(self, version: str, encoded: bytes) -> None:
+        """
+        Неизменяемая копия версии элемента (имя файла - хэш содержимого), чтобы уже
+        выданные тесты отображались и проверялись по той версии, которую получил кандидат
+        """
+        path = self._snapshot_path(version)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+
+    def compile(self) -> str:
+        """Компилирует JSON файлы в бинарный файл банка (атомарная замена) и возвращает отпечаток"""
+        fingerprint = self._source_fingerprint()
+        buckets: Dict[str, List[list]] = {}
+        payload = bytearray()
+
+        for category, level, file_path in self._source_files():
+            with open(file_path, "r", encoding="utf-8") as f:
+                questions = json.load(f)
+
+            records = []
+            for position, question in enumerate(questions):
+                encoded = json.dumps(question, ensure_ascii=False, sort_keys=True).encode("utf-8")
+                source_id = question.get("id", position + 1)
+                version = hashlib.sha1(encoded).hexdigest()[:12]
+                self._write_snapshot(version, encoded)
+                records.append([f"{category}:{level}:{source_id}", source_id, version, len(payload), len(encoded)])
+                payload.extend(encoded)
+            buckets[f"{category}/{level}"] = records
+
+        header = json.dumps({"fingerprint": fingerprint, "buckets": buckets}).encode("utf-8")
+
+        directory = os.path.dirname(self.compiled_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.compiled_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.compiled_path)
+
+        logger.info(f"Compiled question bank: {sum(len(r) for r in buckets.values())} items, {len(payload)} bytes")
+        return fingerprint
+
+    def _open_compiled(self) -> Optional[Tuple[mmap.mmap, dict]]:
+        """Отображает скомпилированный файл в память; None если файл отсутствует или поврежден"""
+        try:
+            with open(self.compiled_path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        try:
+            magic, format_version, header_length = _HEADER.unpack_from(buffer, 0)
+            if magic != _MAGIC or format_version != _FORMAT_VERSION:
+                raise ValueError("unexpected question bank format")
+            header = json.loads(buffer[_HEADER.size:_HEADER.size + header_length])
+            header["payload_offset"] = _HEADER.size + header_length
+            return buffer, header
+        except (struct.error, ValueError) as e:
+            logger.warning(f"Ignoring unreadable compiled question bank: {e}")
+            buffer.close()
+            return None
+
+    def load(self) -> None:
+        """Загружает банк, перекомпилируя его, если исходные файлы изменились"""
+        with self._lock:
+            fingerprint = self._source_fingerprint()
+            opened = self._open_compiled()
+            if opened is None or opened[1]["fingerprint"] != fingerprint:
+                if opened is not None:
+                    opened[0].close()
+                self.compile()
+                opened = self._open_compiled()
+                if opened is None:
+                    raise RuntimeError(f"Failed to open compiled question bank at {self.compiled_path}")
+
+            buffer, header = opened
+            base = header["payload_offset"]
+            buckets: Dict[Tuple[str, str], List[BankItem]] = {}
+            items: Dict[str, BankItem] = {}
+            for bucket_key, records in header["buckets"].items():
+                category, level = bucket_key.split("/", 1)
+                bucket = []
+                for item_id, source_id, version, offset, length in records:
+                    item = BankItem(item_id, category, level, source_id, version, base + offset, length, buffer)
+                    bucket.append(item)
+                    items[item_id] = item
+                buckets[(category, level)] = bucket
+
+            self._mmap = buffer
+            self._buckets = buckets
+            self._items = items
+            self._fingerprint = header["fingerprint"]
+            self._compiled_mtime = os.stat(self.compiled_path).st_mtime_ns
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        """Горячая перезагрузка: не чаще reload_interval проверяет исходники и скомпилированный файл"""
+        if self._fingerprint is None:
+            self.load()
+            return
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            compiled_mtime = os.stat(self.compiled_path).st_mtime_ns
+            if self._source_fingerprint() != self._fingerprint or compiled_mtime != self._compiled_mtime:
+                logger.info("Question bank changed on disk, reloading")
+                self.load()
+        except OSError as e:
+            logger.warning(f"Question bank freshness check failed, reloading: {e}")
+            self.load()
+
+    def get_bucket(self, category: str, level: str) -> List[BankItem]:
+        self._ensure_fresh()
+        return self._buckets.get((category, level), [])
+
+    def get(self, item_id: str) -> Optional[BankItem]:
+        self._ensure_fresh()
+        return self._items.get(item_id)
+
+    def get_version(self, item_id: str, version: str) -> Optional[Dict]:
+        """Содержимое элемента именно в указанной версии; None если такой версии нет"""
+        item = self.get(item_id)
+        if item is not None and item.version == version:
+            return item.data
+        try:
+            with open(self._snapshot_path(version), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    async def _exposures(self, item_ids: List[str]) -> List[int]:
+        """Число показов элементов (общий счетчик в Redis для всех процессов)"""
+        try:
+            client = await cache.get_async_client()
+            counts = await client.hmget(EXPOSURES_KEY, item_ids)
+            return [int(count or 0) for count in counts]
+        except Exception as e:
+            logger.warning(f"Question exposure counts unavailable, sampling uniformly: {e}")
+            return [0] * len(item_ids)
+
+    async def _record_exposures(self, item_ids: List[str]) -> None:
+        try:
+            client = await cache.get_async_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for item_id in item_ids:
+                    pipe.hincrby(EXPOSURES_KEY, item_id, 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record question exposures: {e}")
+
+    async def sample(self, category: str, level: str, count: int) -> List[BankItem]:
+        """
+        Случайная выборка без повторов с балансировкой показов:
+        вес элемента 1 / (1 + число показов), ключи Efraimidis-Spirakis,
+        из которых берутся count наибольших (O(n log count))
+        """
+        bucket = self.get_bucket(category, level)
+        if count >= len(bucket):
+            selected = list(bucket)
+            random.shuffle(selected)
+        else:
+            exposures = await self._exposures([item.item_id for item in bucket])
+            keyed = heapq.nlargest(
+                count,
+                zip((random.random() ** (1 + shown) for shown in exposures), range(len(bucket))),
+            )
+            selected = [bucket[index] for _, index in keyed]
+
+        await self._record_exposures([item.item_id for item in selected])
+        return selected
+
+    def stats(self) -> Dict[str, int]:
+        self._ensure_fresh()
+        return {f"{category}/{level}": len(bucket) for (category, level), bucket in self._buckets.items()}
+
+
+question_bank = QuestionBank()
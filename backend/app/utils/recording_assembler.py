@@ -0,0 +1,217 @@
+"""
+Сборка записи экрана по мере поступления чанков
+"""
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.utils.file_paths import ensure_upload_directory, get_full_upload_path, FileTypes
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+MISSING_LIMIT = 1000
+
+
+class RecordingAssembler:
+    """
+    Дописывает чанки одной загрузки в файл сборки сразу по приходу, строго по порядку.
+    Чанк, пришедший раньше своей очереди, ждет в папке чанков (буфер), а битовая карта
+    полученных индексов в Redis говорит, какие из них уже можно дописать. Когда получен
+    финальный чанк и все предыдущие дописаны, файл сборки переименовывается в итоговый -
+    финализация не копирует данные
+    """
+
+    def _state_key(self, session_id: str, upload_id: str) -> str:
+        return f"recording:{session_id}:{upload_id}"
+
+    def _received_key(self, session_id: str, upload_id: str) -> str:
+        return f"recording:{session_id}:{upload_id}:received"
+
+    def _lock_key(self, session_id: str, upload_id: str) -> str:
+        return f"recording:{session_id}:{upload_id}:lock"
+
+    def final_path(self, base_filename: str) -> str:
+        return os.path.join(get_full_upload_path(f"uploads/{FileTypes.SCREEN_RECORDINGS}"), f"{base_filename}.webm")
+
+    def _assembly_path(self, base_filename: str, upload_id: str) -> str:
+        return os.path.join(
+            get_full_upload_path(f"uploads/{FileTypes.SCREEN_RECORDINGS}"), f"{base_filename}.{upload_id}.webm.part"
+        )
+
+    async def chunk_path(self, session_id: str, base_filename: str, upload_id: str, chunk_index: int) -> str:
+        """Путь, куда нужно записать полученный чанк"""
+        chunks_dir = await asyncio.to_thread(ensure_upload_directory, f"{FileTypes.CHUNKS}/{session_id}")
+        return os.path.join(chunks_dir, f"{base_filename}_{upload_id}_chunk_{chunk_index:06d}.webm")
+
+    async def legacy_upload_id(self, session_id: str, chunk_index: int) -> str:
+        """Загрузки без токена: нулевой чанк начинает новую загрузку"""
+        client = await cache.get_async_client()
+        key = f"recording:{session_id}:legacy_upload"
+        upload_id = None if chunk_index == 0 else await client.get(key)
+        if not upload_id:
+            upload_id = uuid.uuid4().hex
+            await client.set(key, upload_id, ex=settings.session_expiry_seconds)
+        return upload_id
+
+    @asynccontextmanager
+    async def _lock(self, session_id: str, upload_id: str):
+        client = await cache.get_async_client()
+        key = self._lock_key(session_id, upload_id)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + 60
+        while not await client.set(key, token, nx=True, px=120000):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Recording {session_id}:{upload_id} is locked")
+            await asyncio.sleep(0.05)
+        try:
+            yield client
+        finally:
+            await client.eval(_RELEASE_SCRIPT, 1, key, token)
+
+    @staticmethod
+    def _append(assembly_path: str, chunk_path: str, offset: int) -> int:
+        """Дописывает чанк с позиции offset (обрезая недописанный хвост после сбоя)"""
+        os.makedirs(os.path.dirname(assembly_path), exist_ok=True)
+        mode = "r+b" if os.path.exists(assembly_path) else "wb"
+        with open(assembly_path, mode) as output, open(chunk_path, "rb") as chunk:
+            output.truncate(offset)
+            output.seek(offset)
+            shutil.copyfileobj(chunk, output, settings.upload_stream_buffer_bytes)
+            return output.tell()
+
+    async def add_chunk(
+        self,
+        session_id: str,
+        base_filename: str,
+        upload_id: str,
+        chunk_index: int,
+        is_final: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Учитывает записанный чанк: дописывает его и все ожидавшие за ним чанки, если
+        подошла их очередь. Возвращает состояние загрузки; completed=True означает,
+        что итоговый файл готов именно после этого вызова
+        """
+        state_key = self._state_key(session_id, upload_id)
+        received_key = self._received_key(session_id, upload_id)
+        assembly_path = self._assembly_path(base_filename, upload_id)
+        ttl = settings.session_expiry_seconds
+
+        async with self._lock(session_id, upload_id) as client:
+            state = await client.hgetall(state_key)
+            next_index = int(state.get("next_index", 0))
+            offset = int(state.get("offset", 0))
+            final_index: Optional[int] = int(state["final_index"]) if "final_index" in state else None
+            already_complete = state.get("complete") == "1"
+            if is_final:
+                final_index = chunk_index
+
+            chunk_path = await self.chunk_path(session_id, base_filename, upload_id, chunk_index)
+            if chunk_index < next_index or already_complete:
+                await asyncio.to_thread(self._remove, chunk_path)
+            else:
+                await client.setbit(received_key, chunk_index, 1)
+                while await client.getbit(received_key, next_index):
+                    path = await self.chunk_path(session_id, base_filename, upload_id, next_index)
+                    if not await asyncio.to_thread(os.path.exists, path):
+                        break
+                    offset = await asyncio.to_thread(self._append, assembly_path, path, offset)
+                    await asyncio.to_thread(self._remove, path)
+                    next_index += 1
+
+            complete = final_index is not None and next_index > final_index
+            completed_now = complete and not already_complete
+            if completed_now:
+                await asyncio.to_thread(os.replace, assembly_path, self.final_path(base_filename))
+
+            mapping = {"next_index": next_index, "offset": offset, "complete": int(complete)}
+            if final_index is not None:
+                mapping["final_index"] = final_index
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(state_key, mapping=mapping)
+                pipe.expire(state_key, ttl)
+                pipe.expire(received_key, ttl)
+                await pipe.execute()
+
+            buffered, missing = await self._pending(client, received_key, next_index, final_index)
+
+        return {
+            "upload_id": upload_id,
+            "next_index": next_index,
+            "bytes": offset,
+            "final_index": final_index,
+            "complete": complete,
+            "completed": completed_now,
+            "buffered": buffered,
+            "missing": missing,
+            "final_path": self.final_path(base_filename),
+        }
+
+    async def _pending(self, client, received_key: str, next_index: int, final_index: Optional[int]) -> Tuple[List[int], List[int]]:
+        """Индексы после next_index: уже полученные (ждут очереди) и недостающие"""
+        if final_index is not None:
+            last_index = final_index
+        else:
+            last_index = await client.strlen(received_key) * 8 - 1
+        indices = list(range(next_index, min(last_index + 1, next_index + MISSING_LIMIT)))
+        if not indices:
+            return [], []
+        async with client.pipeline(transaction=False) as pipe:
+            for index in indices:
+                pipe.getbit(received_key, index)
+            bits = await pipe.execute()
+        buffered = [index for index, bit in zip(indices, bits) if bit]
+        if final_index is None and buffered:
+            indices = indices[: indices.index(buffered[-1]) + 1]
+            bits = bits[: len(indices)]
+        missing = [index for index, bit in zip(indices, bits) if not bit]
+        return buffered, missing
+
+    async def status(self, session_id: str, base_filename: str, upload_id: str) -> Dict[str, Any]:
+        """
+        Состояние загрузки для возобновления: сколько чанков и байт уже собрано подряд,
+        какие чанки получены сверх этого и какие еще нужно прислать
+        """
+        client = await cache.get_async_client()
+        state = await client.hgetall(self._state_key(session_id, upload_id))
+        next_index = int(state.get("next_index", 0))
+        final_index: Optional[int] = int(state["final_index"]) if "final_index" in state else None
+        complete = state.get("complete") == "1"
+        buffered, missing = ([], []) if complete else await self._pending(
+            client, self._received_key(session_id, upload_id), next_index, final_index
+        )
+        return {
+            "upload_id": upload_id,
+            "next_index": next_index,
+            "bytes": int(state.get("offset", 0)),
+            "final_index": final_index,
+            "complete": complete,
+            "buffered": buffered,
+            "missing": missing,
+        }
+
+    @staticmethod
+    def has_chunk(status: Dict[str, Any], chunk_index: int) -> bool:
+        """Чанк уже дописан в сборку или лежит в буфере - повторно его принимать не нужно"""
+        return status["complete"] or chunk_index < status["next_index"] or chunk_index in status["buffered"]
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+recording_assembler = RecordingAssembler()
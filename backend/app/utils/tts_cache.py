@@ -0,0 +1,172 @@
+"""
+Постоянный кэш синтезированной речи, адресуемый по содержимому
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+import aiofiles
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LRU_KEY = "tts_cache:lru"
+SIZES_KEY = "tts_cache:sizes"
+TOTAL_BYTES_KEY = "tts_cache:bytes"
+FILE_PREFIX = "tts_"
+
+
+class TTSCache:
+    """
+    Файлы tts_<sha256>.mp3 в общей папке аудио, ключ - (текст, голос, деплоймент).
+    Сессии ссылаются на общие файлы; индекс LRU и размеры хранятся в Redis,
+    вытеснение не трогает файлы, к которым обращались позже min_idle_seconds назад
+    """
+
+    def __init__(self):
+        self.directory = settings.tts_cache_dir
+        self.max_bytes = settings.tts_cache_max_bytes
+        self.min_idle_seconds = settings.tts_cache_min_idle_seconds
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def digest(self, text: str, voice: str, deployment: str) -> str:
+        return hashlib.sha256(f"{deployment}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{FILE_PREFIX}{digest}.mp3")
+
+    async def _touch(self, filename: str, size: Optional[int] = None) -> None:
+        """Обновляет время последнего обращения; при добавлении учитывает размер файла"""
+        try:
+            client = await cache.get_async_client()
+            await client.zadd(LRU_KEY, {filename: time.time()})
+            if size is not None and await client.hsetnx(SIZES_KEY, filename, size):
+                await client.incrby(TOTAL_BYTES_KEY, size)
+        except Exception as e:
+            logger.warning(f"Failed to update TTS cache index for {filename}: {e}")
+
+    async def touch(self, filename: str) -> None:
+        """Отмечает обращение к файлу кэша, отданному клиенту или выданному сессии"""
+        filename = os.path.basename(filename)
+        if filename.startswith(FILE_PREFIX):
+            await self._touch(filename)
+
+    async def _write_atomic(self, path: str, data: bytes) -> None:
+        """Пишет во временный файл рядом и атомарно переименовывает"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(data)
+                await f.flush()
+            await asyncio.to_thread(os.replace, tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    async def get_or_synthesize(self, text: str, voice: str = "alloy") -> Optional[str]:
+        """
+        Возвращает путь к общему аудиофайлу для текста, синтезируя его только при промахе.
+        Одновременные запросы одного текста в процессе ждут один синтез
+        """
+        from app.utils.audio_service import audio_service
+
+        if not text:
+            return None
+
+        digest = self.digest(text, voice, settings.azure_openai_tts_deployment)
+        path = self.path_for(digest)
+        filename = os.path.basename(path)
+
+        if await asyncio.to_thread(os.path.exists, path):
+            await self._touch(filename)
+            return path
+
+        if digest in self._inflight:
+            return await asyncio.shield(self._inflight[digest])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[digest] = future
+        try:
+            audio_data = await audio_service.text_to_speech(text, voice)
+            if not audio_data:
+                future.set_result(None)
+                return None
+            await self._write_atomic(path, audio_data)
+            await self._touch(filename, len(audio_data))
+            logger.info(f"TTS cache miss stored as {filename} ({len(audio_data)} bytes)")
+            future.set_result(path)
+            return path
+        except Exception as e:
+            logger.error(f"Failed to synthesize TTS for cache: {e}")
+            future.set_result(None)
+            return None
+        finally:
+            self._inflight.pop(digest, None)
+
+    async def rebuild_index(self) -> int:
+        """Восстанавливает индекс по файлам на диске (после потери данных Redis)"""
+        client = await cache.get_async_client()
+        entries = await asyncio.to_thread(self._scan_files)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(LRU_KEY, SIZES_KEY, TOTAL_BYTES_KEY)
+            if entries:
+                pipe.zadd(LRU_KEY, {name: mtime for name, (size, mtime) in entries.items()})
+                pipe.hset(SIZES_KEY, mapping={name: size for name, (size, mtime) in entries.items()})
+            pipe.set(TOTAL_BYTES_KEY, sum(size for size, _ in entries.values()))
+            await pipe.execute()
+        return len(entries)
+
+    def _scan_files(self) -> Dict[str, tuple]:
+        entries = {}
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if name.startswith(FILE_PREFIX) and name.endswith(".mp3"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries[name] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    async def evict(self) -> Dict[str, int]:
+        """Удаляет давно не используемые файлы, пока общий размер превышает max_bytes"""
+        client = await cache.get_async_client()
+        if not await client.exists(LRU_KEY):
+            await self.rebuild_index()
+
+        total = int(await client.get(TOTAL_BYTES_KEY) or 0)
+        removed = 0
+        freed = 0
+        cutoff = time.time() - self.min_idle_seconds
+
+        while total > self.max_bytes:
+            oldest = await client.zrange(LRU_KEY, 0, 49, withscores=True)
+            candidates = [name for name, last_used in oldest if last_used < cutoff]
+            if not candidates:
+                break
+            for name in candidates:
+                if total <= self.max_bytes:
+                    break
+                size = int(await client.hget(SIZES_KEY, name) or 0)
+                try:
+                    await asyncio.to_thread(os.unlink, os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.zrem(LRU_KEY, name)
+                    pipe.hdel(SIZES_KEY, name)
+                    pipe.decrby(TOTAL_BYTES_KEY, size)
+                    await pipe.execute()
+                total -= size
+                freed += size
+                removed += 1
+
+        return {"removed": removed, "freed_bytes": freed, "total_bytes": total}
+
+
+tts_cache = TTSCache()
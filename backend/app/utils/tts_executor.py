@@ -0,0 +1,190 @@
+"""
+Ограниченный исполнитель запросов синтеза речи (TTS) с повторами и метриками
+"""
+import asyncio
+import logging
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.cache import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY_PREFIX = "tts_metrics"
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Читает заголовок Retry-After из ответа Azure, если он есть"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """429, 5xx, таймауты и сетевые ошибки повторяются; остальные ошибки - нет"""
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+class TTSExecutor:
+    """
+    Общий исполнитель TTS: не более tts_max_concurrency одновременных запросов
+    на деплоймент в процессе, таймаут на каждый запрос, экспоненциальная задержка
+    с джиттером при 429/5xx. Счетчики хранятся локально и в Redis (для всех воркеров)
+    """
+
+    def __init__(self):
+        self.max_concurrency = settings.tts_max_concurrency
+        self.timeout = settings.tts_timeout_seconds
+        self.max_attempts = settings.tts_max_attempts
+        self.backoff_base = settings.tts_backoff_base_seconds
+        self.backoff_max = settings.tts_backoff_max_seconds
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _semaphore(self, deployment: str) -> asyncio.Semaphore:
+        """Семафоры привязаны к циклу событий, поэтому хранятся отдельно для каждого цикла"""
+        loop = asyncio.get_running_loop()
+        per_loop = self._semaphores.setdefault(loop, {})
+        if deployment not in per_loop:
+            per_loop[deployment] = asyncio.Semaphore(self.max_concurrency)
+        return per_loop[deployment]
+
+    def _deployment_stats(self, deployment: str) -> Dict[str, float]:
+        if deployment not in self._stats:
+            self._stats[deployment] = {
+                "requests": 0, "succeeded": 0, "failed": 0, "retries": 0,
+                "throttled": 0, "timeouts": 0, "in_flight": 0, "waiting": 0,
+                "total_latency": 0.0, "total_wait": 0.0
+            }
+        return self._stats[deployment]
+
+    async def _publish(self, deployment: str, **increments: float) -> None:
+        """Увеличивает общие счетчики в Redis; ошибки Redis не влияют на синтез"""
+        try:
+            client = await cache.get_async_client()
+            async with client.pipeline(transaction=False) as pipe:
+                key = f"{METRICS_KEY_PREFIX}:{deployment}"
+                for field, amount in increments.items():
+                    if isinstance(amount, float):
+                        pipe.hincrbyfloat(key, field, amount)
+                    else:
+                        pipe.hincrby(key, field, amount)
+                await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to publish TTS metrics: {e}")
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        """Full jitter: случайная задержка до base * 2^attempt, но не меньше Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def run(self, deployment: str, call: Callable[[], Awaitable[Any]], label: str = "") -> Optional[Any]:
+        """
+        Выполняет call() с ограничением параллелизма, таймаутом и повторами.
+        Возвращает результат или None, если все попытки исчерпаны
+        """
+        stats = self._deployment_stats(deployment)
+        stats["requests"] += 1
+        semaphore = self._semaphore(deployment)
+
+        for attempt in range(self.max_attempts):
+            wait_started = time.monotonic()
+            stats["waiting"] += 1
+            async with semaphore:
+                stats["waiting"] -= 1
+                waited = time.monotonic() - wait_started
+                stats["total_wait"] += waited
+                stats["in_flight"] += 1
+                started = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(call(), timeout=self.timeout)
+                    latency = time.monotonic() - started
+                    stats["succeeded"] += 1
+                    stats["total_latency"] += latency
+                    await self._publish(deployment, succeeded=1, total_latency=latency, total_wait=waited)
+                    return result
+                except Exception as e:
+                    error = e
+                finally:
+                    stats["in_flight"] -= 1
+
+            if isinstance(error, asyncio.TimeoutError):
+                stats["timeouts"] += 1
+                await self._publish(deployment, timeouts=1)
+            elif getattr(error, "status_code", None) == 429:
+                stats["throttled"] += 1
+                await self._publish(deployment, throttled=1)
+
+            if not _is_retryable(error) or attempt == self.max_attempts - 1:
+                stats["failed"] += 1
+                await self._publish(deployment, failed=1)
+                logger.error(f"TTS {label} failed after {attempt + 1} attempt(s): {type(error).__name__}: {error}")
+                return None
+
+            delay = self._backoff(attempt, error)
+            stats["retries"] += 1
+            await self._publish(deployment, retries=1)
+            logger.warning(f"TTS {label} attempt {attempt + 1} failed ({type(error).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        return None
+
+    def local_stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for deployment, stats in self._stats.items():
+            completed = stats["succeeded"] or 1
+            result[deployment] = {
+                **{k: v for k, v in stats.items() if not k.startswith("total_")},
+                "avg_latency_seconds": round(stats["total_latency"] / completed, 3),
+                "avg_wait_seconds": round(stats["total_wait"] / max(stats["requests"], 1), 3),
+                "max_concurrency": self.max_concurrency
+            }
+        return result
+
+    async def global_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Счетчики всех процессов из Redis"""
+        try:
+            client = await cache.get_async_client()
+            result = {}
+            async for key in client.scan_iter(match=f"{METRICS_KEY_PREFIX}:*"):
+                values = await client.hgetall(key)
+                counters = {field: float(value) for field, value in values.items()}
+                succeeded = counters.get("succeeded", 0) or 1
+                counters["avg_latency_seconds"] = round(counters.get("total_latency", 0) / succeeded, 3)
+                result[key.split(":", 1)[1]] = counters
+            return result
+        except Exception as e:
+            logger.error(f"Failed to read TTS metrics: {e}")
+            return {}
+
+
+tts_executor = TTSExecutor()
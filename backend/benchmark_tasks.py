@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Celery Async Task Benchmark
+Compares task throughput of a fresh event loop per call (the old task pattern)
+with the persistent worker loop used by AsyncTask.
+
+Usage: python benchmark_tasks.py [iterations]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+
+sys.path.append('/app')
+
+from app.core.database import async_engine, AsyncSessionLocal
+from app.core.cache import cache
+from sqlalchemy import select
+
+async def sample_task_body():
+    """Typical task I/O: a Redis round trip and a database query"""
+    await cache.aset("benchmark_tasks:probe", {"timestamp": datetime.utcnow().isoformat()}, ttl=60)
+    await cache.aget("benchmark_tasks:probe")
+    async with AsyncSessionLocal() as db:
+        await db.execute(select(1))
+
+async def _reset_clients():
+    """Connections cannot outlive the loop they were opened on"""
+    if cache._async_client is not None:
+        await cache._async_client.close()
+        cache._async_client = None
+    await async_engine.dispose()
+
+def run_per_call_loop(iterations: int) -> float:
+    """Old pattern: new loop, new connections and loop.close() for every task"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(sample_task_body())
+            loop.run_until_complete(_reset_clients())
+        finally:
+            loop.close()
+    asyncio.set_event_loop(None)
+    return iterations / (time.perf_counter() - started)
+
+def run_persistent_loop(iterations: int) -> float:
+    """AsyncTask pattern: one loop per worker process, pools stay warm"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(sample_task_body())
+        started = time.perf_counter()
+        for _ in range(iterations):
+            loop.run_until_complete(sample_task_body())
+        rate = iterations / (time.perf_counter() - started)
+        loop.run_until_complete(_reset_clients())
+        return rate
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(f"Running {iterations} task bodies per mode...")
+    per_call = run_per_call_loop(iterations)
+    persistent = run_persistent_loop(iterations)
+
+    print(f"Per-call event loop:   {per_call:8.1f} tasks/s")
+    print(f"Persistent event loop: {persistent:8.1f} tasks/s")
+    print(f"Speedup:               {persistent / per_call:8.2f}x")
+
+if __name__ == "__main__":
+    main()
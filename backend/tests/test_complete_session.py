@@ -0,0 +1,77 @@
+"""
+Scoring of answers that are still staged in Redis when a main test session is completed.
+Runs against the Postgres and Redis configured for the backend and is skipped without them.
+"""
+import asyncio
+import uuid
+
+import pytest
+
+
+async def _services_available() -> bool:
+    from sqlalchemy import text
+    from app.core.cache import cache
+    from app.core.database import async_engine
+
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        client = await cache.get_async_client()
+        await client.ping()
+        return True
+    except Exception:
+        return False
+
+
+async def _complete_with_staged_answer():
+    from sqlalchemy import delete
+    from app.core.database import AsyncSessionLocal, async_engine
+    from app.core.exam_state import exam_state, MAIN
+    from app.models.test import TestSession, Question
+    from app.services.test_service import TestService
+
+    if not await _services_available():
+        return None
+
+    session_id = f"pytest-{uuid.uuid4().hex}"
+    try:
+        async with AsyncSessionLocal() as db:
+            db.add(TestSession(id=session_id, status="in_progress"))
+            question = Question(
+                test_session_id=session_id,
+                question_type="reading",
+                content="{}",
+                correct_answer="A"
+            )
+            db.add(question)
+            await db.commit()
+
+            service = TestService(db)
+            loaded = await service.get_test_session(session_id)
+            assert loaded.questions[0].score is None
+
+            await exam_state.stage_answer(MAIN, session_id, question.id, {"user_answer": "A", "score": 100.0})
+            completed = await service.complete_test_session(session_id)
+            results = await service.get_test_results(session_id)
+            return completed, results
+    finally:
+        await exam_state.discard(MAIN, session_id)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Question).where(Question.test_session_id == session_id))
+            await db.execute(delete(TestSession).where(TestSession.id == session_id))
+            await db.commit()
+        await async_engine.dispose()
+
+
+def test_complete_scores_answers_staged_in_redis():
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("redis")
+    outcome = asyncio.run(_complete_with_staged_answer())
+    if outcome is None:
+        pytest.skip("Postgres and Redis are required")
+
+    completed, results = outcome
+    assert completed.status == "completed"
+    assert completed.reading_score == 100.0
+    assert results["session"]["reading_score"] == 100.0
+    assert results["questions"][0]["user_answer"] == "A"
@@ -17,14 +17,14 @@ interface MainTestContainerProps {
     onSectionComplete: (section: TestSection, allQuestionsAnswered: boolean) => void;
     onTestGenerationComplete: () => void;
     onTestGenerationError: (error: string) => void;
+    onSectionReady: (section: string) => void;
     onTestComplete: () => void;
     setMainTestData: (data: any) => void;
     proceedToNextSection: (section: TestSection) => void;
 }
-export function MainTestContainer({ mainSessionId, currentSection, mainTestData, mainTestResults, isGeneratingTest, timeRemaining, testResultId, preliminaryTestResult, onSectionComplete, onTestGenerationComplete, onTestGenerationError, onTestComplete, setMainTestData, proceedToNextSection, }: MainTestContainerProps) {
-    if (isGeneratingTest && mainSessionId) {
-        return (<TestGenerationStatus sessionId={mainSessionId} onComplete={onTestGenerationComplete} onError={onTestGenerationError}/>);
-    }
+export function MainTestContainer({ mainSessionId, currentSection, mainTestData, mainTestResults, isGeneratingTest, timeRemaining, testResultId, preliminaryTestResult, onSectionComplete, onTestGenerationComplete, onTestGenerationError, onSectionReady, onTestComplete, setMainTestData, proceedToNextSection, }: MainTestContainerProps) {
+    const sectionDataKeys: Record<string, string> = { reading: 'questions', listening: 'scenarios', writing: 'prompts', speaking: 'questions' };
+    const currentSectionReady = currentSection === 'completed' || mainTestData?.[currentSection]?.[sectionDataKeys[currentSection]]?.length > 0;
     const renderProgressBar = () => {
         if (currentSection === 'completed')
             return null;
@@ -163,6 +163,17 @@ export function MainTestContainer({ mainSessionId, currentSection, mainTestData,
                 return <div className="text-red-500">{t('unknownSectionError')}</div>;
         }
     };
+    if (isGeneratingTest && mainSessionId) {
+        return (<div className="w-full">
+                <div className={currentSectionReady ? 'hidden' : ''}>
+                    <TestGenerationStatus sessionId={mainSessionId} onComplete={onTestGenerationComplete} onError={onTestGenerationError} onSectionReady={onSectionReady}/>
+                </div>
+                {currentSectionReady && (<>
+                        {renderProgressBar()}
+                        {renderCurrentSection()}
+                    </>)}
+            </div>);
+    }
     return (<div className="w-full">
             {renderProgressBar()}
             {renderCurrentSection()}
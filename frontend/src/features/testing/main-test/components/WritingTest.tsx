@@ -28,14 +28,14 @@ function WritingTest({ sessionId, level, prompts, onComplete }: WritingTestProps
     const saveTimeoutRef = useRef<NodeJS.Timeout | null>(null);
     useEffect(() => {
     }, []);
-    const saveDraft = useCallback(async (value: string) => {
+    const saveDraft = useCallback(async (value: string, version: number) => {
         if (!prompts || prompts.length === 0 || value === lastSavedAnswer) {
             return;
         }
         setIsSaving(true);
         try {
             const promptId = prompts[0].id;
-            await withErrorHandling(() => testApi.saveWritingDraft(sessionId, promptId, value), 'save writing draft');
+            await withErrorHandling(() => testApi.saveWritingDraft(sessionId, promptId, value, version), 'save writing draft');
             setLastSavedAnswer(value);
         }
         catch (error) {
@@ -46,11 +46,12 @@ function WritingTest({ sessionId, level, prompts, onComplete }: WritingTestProps
         }
     }, [sessionId, prompts, lastSavedAnswer]);
     const debouncedSave = useCallback((value: string) => {
+        const version = Date.now();
         if (saveTimeoutRef.current) {
             clearTimeout(saveTimeoutRef.current);
         }
         saveTimeoutRef.current = setTimeout(() => {
-            saveDraft(value);
+            saveDraft(value, version);
         }, 2000);
     }, [saveDraft]);
     function handleAnswerChange(value: string) {
@@ -4,6 +4,7 @@ interface TestGenerationStatusProps {
     sessionId: string;
     onComplete: () => void;
     onError: (error: string) => void;
+    onSectionReady?: (section: string) => void;
 }
 interface GenerationStatus {
     status: 'not_started' | 'generating' | 'completed' | 'error';
@@ -12,16 +13,71 @@ interface GenerationStatus {
     estimated_time?: string;
     estimated_remaining?: string;
     ready?: boolean;
+    sections?: Record<string, string>;
 }
-const TestGenerationStatus: React.FC<TestGenerationStatusProps> = ({ sessionId, onComplete, onError }) => {
+const TestGenerationStatus: React.FC<TestGenerationStatusProps> = ({ sessionId, onComplete, onError, onSectionReady }) => {
     const [status, setStatus] = useState<GenerationStatus | null>(null);
     const [progress, setProgress] = useState(0);
     const [isPolling, setIsPolling] = useState(false);
     useEffect(() => {
         if (sessionId && !isPolling) {
-            startPolling();
+            const controller = new AbortController();
+            startStreaming(controller.signal);
+            return () => controller.abort();
         }
     }, [sessionId]);
+    const applySections = (sections: Record<string, string>) => {
+        const states = Object.values(sections);
+        if (states.length > 0) {
+            const done = states.filter(state => state !== 'pending').length;
+            setProgress(Math.round((done / states.length) * 100));
+        }
+        setStatus(prev => ({
+            ...(prev || { status: 'generating', message: 'Test generation in progress' }),
+            sections: { ...(prev?.sections || {}), ...sections }
+        }));
+    };
+    const startStreaming = async (signal: AbortSignal) => {
+        setIsPolling(true);
+        let finished = false;
+        try {
+            await testApi.streamGenerationEvents(sessionId, (event) => {
+                if (event.event === 'snapshot') {
+                    applySections(event.sections || {});
+                    if (onSectionReady) {
+                        Object.entries(event.sections || {}).filter(([, state]) => state === 'ready').forEach(([section]) => onSectionReady(section));
+                    }
+                }
+                else if (event.event === 'section') {
+                    applySections({ [event.section]: event.status });
+                    if (event.status === 'ready' && onSectionReady) {
+                        onSectionReady(event.section);
+                    }
+                }
+                else if (event.event === 'completed') {
+                    finished = true;
+                    setStatus(prev => ({ ...(prev || {}), status: 'completed', message: 'Test generation completed', ready: true }));
+                    setProgress(100);
+                    setIsPolling(false);
+                    onComplete();
+                }
+                else if (event.event === 'error') {
+                    finished = true;
+                    setIsPolling(false);
+                    onError(event.message || 'Test generation failed');
+                }
+            }, signal);
+        }
+        catch (error) {
+            if (signal.aborted) {
+                return;
+            }
+            console.error('Generation events stream failed, falling back to polling:', error);
+        }
+        if (!finished && !signal.aborted) {
+            startPolling();
+        }
+    };
     const startPolling = async () => {
         setIsPolling(true);
         console.log('Starting polling for session:', sessionId);
@@ -1,3 +1,4 @@
+import { putScreenChunk } from '../utils/proctoring/chunk-upload';
 const getApiBaseUrl = () => {
     return '/api/v1';
 };
@@ -325,6 +326,12 @@ const preliminaryTestApi = {
             }),
         });
     },
+    async submitAnswersBatch(sessionId: number, answers: { question_id: number; answer: string }[]) {
+        return await apiRequest(`/preliminary-tests/${sessionId}/submit/batch`, {
+            method: 'POST',
+            body: JSON.stringify({ answers }),
+        });
+    },
     async completeTest(sessionId: number) {
         return await apiRequest(`/preliminary-tests/${sessionId}/complete`, {
             method: 'POST',
@@ -368,9 +375,43 @@ const testApi = {
     async getGenerationStatus(sessionId: string) {
         return await apiRequest(`/main-tests/${sessionId}/generation-status`);
     },
+    async streamGenerationEvents(sessionId: string, onEvent: (event: any) => void, signal?: AbortSignal) {
+        const headers: HeadersInit = { 'Accept': 'text/event-stream' };
+        const authHeader = auth.getAuthHeader();
+        if (authHeader) {
+            headers['Authorization'] = authHeader;
+        }
+        const response = await fetch(`${getApiBaseUrl()}/main-tests/${sessionId}/generation-events`, { headers, signal });
+        if (!response.ok || !response.body) {
+            throw new Error(`Generation events unavailable: ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                const chunk = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const data = chunk.split('\n').filter(line => line.startsWith('data:')).map(line => line.slice(5).trim()).join('\n');
+                if (data) {
+                    onEvent(JSON.parse(data));
+                }
+                boundary = buffer.indexOf('\n\n');
+            }
+        }
+    },
     async getQuestionsByType(sessionId: string, questionType: string) {
         return await apiRequest(`/main-tests/${sessionId}/questions/${questionType}`);
     },
+    async getExamBundle(sessionId: string) {
+        return await apiRequest(`/main-tests/${sessionId}/bundle`);
+    },
     async submitReadingAnswer(sessionId: string, questionId: number, answer: string) {
         return await apiRequest(`/main-tests/${sessionId}/submit/reading`, {
             method: 'POST',
@@ -389,12 +430,19 @@ const testApi = {
             }),
         });
     },
-    async saveWritingDraft(sessionId: string, questionId: number, answer: string) {
+    async submitAnswersBatch(sessionId: string, questionType: 'reading' | 'listening', answers: { question_id: number; answer: string }[]) {
+        return await apiRequest(`/main-tests/${sessionId}/submit/${questionType}/batch`, {
+            method: 'POST',
+            body: JSON.stringify({ answers }),
+        });
+    },
+    async saveWritingDraft(sessionId: string, questionId: number, answer: string, version?: number) {
         return await apiRequest(`/main-tests/${sessionId}/save/writing`, {
             method: 'POST',
             body: JSON.stringify({
                 question_id: questionId,
-                answer: answer
+                answer: answer,
+                version: version
             }),
         });
     },
@@ -414,18 +462,14 @@ const testApi = {
             body: formData,
         });
     },
+    async getSpeakingJob(sessionId: string, jobId: string) {
+        return await apiRequest(`/main-tests/${sessionId}/speaking-jobs/${jobId}`);
+    },
     async getAudioFile(sessionId: string, filename: string): Promise<Blob> {
         return await getFile(`/main-tests/${sessionId}/audio/${filename}`);
     },
     async uploadScreenChunk(sessionId: string, chunk: Blob, chunkIndex: number, isFinal: boolean) {
-        const formData = new FormData();
-        formData.append('chunk', chunk, `chunk_${chunkIndex}.webm`);
-        formData.append('chunk_index', chunkIndex.toString());
-        formData.append('is_final', isFinal.toString());
-        return await apiRequest(`/upload/screen-chunk/${sessionId}`, {
-            method: 'POST',
-            body: formData,
-        });
+        return await putScreenChunk(sessionId, chunk, chunkIndex, isFinal);
     },
     async getUploadStatus(sessionId: string) {
         return await apiRequest(`/upload/status/${sessionId}`);
@@ -566,14 +610,7 @@ const monitoringApi = {
 };
 const uploadApi = {
     async uploadScreenChunk(sessionId: string, chunk: Blob, chunkIndex: number, isFinal: boolean) {
-        const formData = new FormData();
-        formData.append('chunk', chunk, `chunk_${chunkIndex}.webm`);
-        formData.append('chunk_index', chunkIndex.toString());
-        formData.append('is_final', isFinal.toString());
-        return await apiRequest(`/upload/screen-chunk/${sessionId}`, {
-            method: 'POST',
-            body: formData,
-        });
+        return await putScreenChunk(sessionId, chunk, chunkIndex, isFinal);
     },
     async getUploadStatus(sessionId: string) {
         return await apiRequest(`/upload/status/${sessionId}`);
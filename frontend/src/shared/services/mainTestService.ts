@@ -132,4 +132,22 @@ export class MainTestService {
             throw err;
         }
     }
+    async fetchReadySections(mainSessionId: string) {
+        const bundle = await testApi.getExamBundle(mainSessionId);
+        const sections = bundle?.sections || {};
+        const testData: Record<string, any> = {};
+        if (sections.reading?.questions?.length > 0) {
+            testData.reading = { questions: sections.reading.questions, passage: sections.reading.passage || '' };
+        }
+        if (sections.listening?.length > 0) {
+            testData.listening = { scenarios: sections.listening };
+        }
+        if (sections.writing?.length > 0) {
+            testData.writing = { prompts: sections.writing };
+        }
+        if (sections.speaking?.length > 0) {
+            testData.speaking = { questions: sections.speaking };
+        }
+        return testData;
+    }
 }
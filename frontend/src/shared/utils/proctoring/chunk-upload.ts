@@ -0,0 +1,132 @@
+import { RECORDER_CONFIG } from './config';
+interface UploadGrant {
+    token: string;
+    uploadId: string;
+    expiresAt: number;
+}
+const grants = new Map<string, UploadGrant>();
+const authHeaders = (): Record<string, string> => {
+    const accessToken = localStorage.getItem('access_token');
+    return accessToken ? { 'Authorization': `Bearer ${accessToken}` } : {};
+};
+const ensureOk = async (response: Response): Promise<any> => {
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+};
+export const getUploadToken = async (sessionId: string, forceRefresh: boolean = false, newUpload: boolean = false): Promise<string> => {
+    const cached = newUpload ? undefined : grants.get(sessionId);
+    if (cached && !forceRefresh && cached.expiresAt - 60000 > Date.now()) {
+        return cached.token;
+    }
+    const query = cached ? `?upload_id=${cached.uploadId}` : '';
+    const response = await fetch(`/api/v1/upload/screen-recording/${sessionId}/token${query}`, {
+        method: 'POST',
+        headers: authHeaders()
+    });
+    const data = await ensureOk(response);
+    grants.set(sessionId, { token: data.upload_token, uploadId: data.upload_id, expiresAt: Date.now() + data.expires_in * 1000 });
+    return data.upload_token;
+};
+export interface UploadOffset {
+    upload_id: string;
+    next_index: number;
+    bytes: number;
+    final_index: number | null;
+    complete: boolean;
+    buffered: number[];
+    missing: number[];
+}
+const chunkChecksum = async (chunk: Blob): Promise<string | null> => {
+    if (!globalThis.crypto?.subtle) {
+        return null;
+    }
+    const digest = await crypto.subtle.digest('SHA-256', await chunk.arrayBuffer());
+    const hex = Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    return `sha256 ${hex}`;
+};
+export const getUploadOffset = async (sessionId: string): Promise<UploadOffset> => {
+    const send = async (token: string) => fetch(`/api/v1/upload/screen-chunk/${sessionId}`, {
+        headers: { 'X-Upload-Token': token }
+    });
+    let response = await send(await getUploadToken(sessionId));
+    if (response.status === 401) {
+        response = await send(await getUploadToken(sessionId, true));
+    }
+    return await ensureOk(response);
+};
+export const isChunkReceived = (offset: UploadOffset, chunkIndex: number): boolean => {
+    return offset.complete || chunkIndex < offset.next_index || offset.buffered.includes(chunkIndex);
+};
+export const putScreenChunk = async (sessionId: string, chunk: Blob, chunkIndex: number, isFinal: boolean, signal?: AbortSignal): Promise<any> => {
+    const checksum = await chunkChecksum(chunk);
+    const send = async (token: string) => fetch(`/api/v1/upload/screen-chunk/${sessionId}/${chunkIndex}?is_final=${isFinal}`, {
+        method: 'PUT',
+        body: chunk,
+        signal,
+        headers: {
+            'Content-Type': 'application/octet-stream',
+            'X-Upload-Token': token,
+            ...(checksum ? { 'X-Chunk-Checksum': checksum } : {})
+        }
+    });
+    let response = await send(await getUploadToken(sessionId, false, chunkIndex === 0));
+    if (response.status === 401) {
+        response = await send(await getUploadToken(sessionId, true));
+    }
+    return await ensureOk(response);
+};
+export interface RecordingUploadOptions {
+    chunkSize?: number;
+    maxRetries?: number;
+    signal?: AbortSignal;
+    onProgress?: (progress: number) => void;
+    onChunkUploaded?: (chunkIndex: number, totalChunks: number) => void;
+}
+const recordingUploads = new Map<string, { sentChunks: number }>();
+export const uploadRecording = async (sessionId: string, blob: Blob, isFinal: boolean, options: RecordingUploadOptions = {}): Promise<any> => {
+    const { chunkSize = RECORDER_CONFIG.UPLOAD_CHUNK_SIZE_BYTES, maxRetries = RECORDER_CONFIG.UPLOAD_MAX_RETRIES, signal, onProgress, onChunkUploaded } = options;
+    let upload = recordingUploads.get(sessionId);
+    if (!upload || blob.size < upload.sentChunks * chunkSize) {
+        upload = { sentChunks: 0 };
+        recordingUploads.set(sessionId, upload);
+    }
+    const totalChunks = isFinal ? Math.max(1, Math.ceil(blob.size / chunkSize)) : Math.floor(blob.size / chunkSize);
+    const firstChunk = isFinal ? Math.min(upload.sentChunks, totalChunks - 1) : upload.sentChunks;
+    let result: any = null;
+    for (let i = firstChunk; i < totalChunks; i++) {
+        const chunk = blob.slice(i * chunkSize, Math.min((i + 1) * chunkSize, blob.size));
+        const isLastChunk = isFinal && i === totalChunks - 1;
+        let attempt = 0;
+        while (true) {
+            try {
+                result = await putScreenChunk(sessionId, chunk, i, isLastChunk, signal);
+                break;
+            }
+            catch (error: any) {
+                attempt++;
+                if (error.name === 'AbortError' || attempt >= maxRetries) {
+                    throw error;
+                }
+                console.error(`Upload attempt ${attempt} of chunk ${i} failed:`, error);
+                await new Promise(res => setTimeout(res, 2000 * attempt));
+                if (i > 0) {
+                    const offset = await getUploadOffset(sessionId).catch(() => null);
+                    if (offset && isChunkReceived(offset, i) && !isLastChunk) {
+                        console.log(`Recording chunk ${i + 1}/${totalChunks} already on server, resuming from next chunk`);
+                        break;
+                    }
+                }
+            }
+        }
+        upload.sentChunks = Math.max(upload.sentChunks, i + 1);
+        onChunkUploaded?.(i, totalChunks);
+        onProgress?.(((i + 1) / totalChunks) * 100);
+    }
+    if (isFinal) {
+        recordingUploads.delete(sessionId);
+    }
+    return result;
+};
@@ -29,6 +29,7 @@ export const RECORDER_CONFIG = {
     TIMESLICE_MS: 120000,
     AUTO_SAVE_MIN_BLOB_SIZE_BYTES: 500 * 1024,
     UPLOAD_MAX_RETRIES: 3,
+    UPLOAD_CHUNK_SIZE_BYTES: 5 * 1024 * 1024,
 };
 export const VIOLATION_TYPES = {
     DEVTOOLS_DEBUGGER: 'devtools_debugger_detected',
@@ -1,5 +1,6 @@
 import { RECORDER_CONFIG } from './config';
 import { sessionManager } from './session-manager';
+import { uploadRecording } from './chunk-upload';
 import { addToast } from '../toast';
 import type { UploadState } from '../../hooks/useFileUpload';
 interface UploadHook {
@@ -102,6 +103,7 @@ export class ScreenRecorderV2 {
             if (this.uploadHook) {
                 await this.uploadHook.uploadScreenRecording(blob, {
                     sessionId: this.sessionId,
+                    isFinal: false,
                     onProgress: (progress: number) => {
                         console.log(`Upload progress: ${progress}%`);
                     }
@@ -110,7 +112,7 @@ export class ScreenRecorderV2 {
             else {
                 await this.uploadWithFetch(blob, false);
             }
-            console.log('Intermediate recording saved, keeping chunks for final upload');
+            console.log('Intermediate recording saved, the final upload continues from the chunks sent so far');
         }
         catch (error) {
             console.error('Failed to save intermediate recording:', error);
@@ -129,6 +131,7 @@ export class ScreenRecorderV2 {
             if (this.uploadHook) {
                 await this.uploadHook.uploadScreenRecording(blob, {
                     sessionId: this.sessionId,
+                    isFinal: true,
                     onProgress: (progress: number) => {
                         console.log(`Final upload progress: ${progress}%`);
                     }
@@ -159,39 +162,9 @@ export class ScreenRecorderV2 {
             console.error('Recording session ID is empty - cannot upload. Current sessionId:', this.sessionId);
             throw new Error('Recording session ID is empty - cannot upload');
         }
-        const formData = new FormData();
-        formData.append('chunk', blob, 'screen_recording.webm');
-        formData.append('chunk_index', '0');
-        formData.append('is_final', isFinal.toString());
-        let attempt = 0;
-        while (attempt < RECORDER_CONFIG.UPLOAD_MAX_RETRIES) {
-            try {
-                const url = `/api/v1/upload/screen-chunk/${recordingSessionId}`;
-                console.log('Uploading to URL:', url);
-                const response = await fetch(url, {
-                    method: 'POST',
-                    body: formData,
-                    headers: {
-                        'Authorization': localStorage.getItem('access_token') ?
-                            `Bearer ${localStorage.getItem('access_token')}` : ''
-                    }
-                });
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
-                const result = await response.json();
-                console.log('Recording uploaded successfully:', result);
-                return;
-            }
-            catch (error: any) {
-                attempt++;
-                console.error(`Upload attempt ${attempt} failed:`, error);
-                if (attempt >= RECORDER_CONFIG.UPLOAD_MAX_RETRIES) {
-                    throw error;
-                }
-                await new Promise(res => setTimeout(res, 2000 * attempt));
-            }
-        }
+        await uploadRecording(recordingSessionId, blob, isFinal, {
+            onProgress: (progress: number) => console.log(`Recording upload progress: ${progress.toFixed(0)}%`)
+        });
     }
     public getUploadState(): UploadState | null {
         return this.uploadHook?.uploadState || null;
@@ -47,6 +47,7 @@ function UnifiedTestInterface(props: UnifiedTestInterfaceProps) {
     const [testMode, setTestMode] = useState<TestMode>(initialSessionId ? 'main' : 'preliminary');
     const proctoringCleanupRef = useRef<(() => void) | null>(null);
     const mainTestService = useRef(new MainTestService()).current;
+    const mainTestStartedRef = useRef(false);
     const cleanupProctoring = useCallback(() => {
         if (proctoringCleanupRef.current) {
             console.log('UnifiedTestInterface: Cleaning up proctoring detectors.');
@@ -319,6 +320,33 @@ function UnifiedTestInterface(props: UnifiedTestInterfaceProps) {
             }
         }
     };
+    const startMainTest = useCallback(() => {
+        if (mainTestStartedRef.current)
+            return;
+        mainTestStartedRef.current = true;
+        mainTest.setMainTestStatus('in_progress');
+        sectionTimer.reset(TIME_LIMITS.SECTIONS.reading);
+        sectionTimer.start();
+        setTimeout(() => {
+            setTransitionState(false);
+            console.log('Transition state cleared, main test started');
+            resumeProctoringMonitoring();
+        }, 1000);
+    }, [sectionTimer, resumeProctoringMonitoring, setTransitionState]);
+    const handleSectionReady = useCallback(async (section: string) => {
+        if (!mainTest.mainSessionId)
+            return;
+        try {
+            const readySections = await mainTestService.fetchReadySections(mainTest.mainSessionId);
+            mainTest.setMainTestData((prev: any) => ({ ...(prev || {}), ...readySections }));
+            if (readySections.reading) {
+                startMainTest();
+            }
+        }
+        catch (err: any) {
+            console.error(`Failed to load ready section ${section}:`, err);
+        }
+    }, [mainTest.mainSessionId, startMainTest]);
     const handleTestGenerationComplete = useCallback(async () => {
         if (!mainTest.mainSessionId)
             return;
@@ -326,21 +354,14 @@ function UnifiedTestInterface(props: UnifiedTestInterfaceProps) {
             const testData = await mainTestService.fetchTestGeneration(mainTest.mainSessionId);
             if (testData) {
                 mainTest.setMainTestData(testData);
-                mainTest.setMainTestStatus('in_progress');
                 mainTest.setIsGeneratingTest(false);
-                sectionTimer.reset(TIME_LIMITS.SECTIONS.reading);
-                sectionTimer.start();
-                setTimeout(() => {
-                    setTransitionState(false);
-                    console.log('Transition state cleared after successful test generation');
-                    resumeProctoringMonitoring();
-                }, 1000);
+                startMainTest();
             }
         }
         catch (err: any) {
             handleTestGenerationError(err.message || 'Failed to fetch generated test');
         }
-    }, [mainTest.mainSessionId, sectionTimer, resumeProctoringMonitoring, setTransitionState]);
+    }, [mainTest.mainSessionId, startMainTest]);
     const handleTestGenerationError = useCallback((error: string) => {
         mainTest.setIsGeneratingTest(false);
         mainTest.setMainTestStatus('error');
@@ -412,7 +433,7 @@ function UnifiedTestInterface(props: UnifiedTestInterfaceProps) {
 
                     <div className="flex flex-1 overflow-hidden">
                         <div className={`${testMode === 'preliminary' ? 'flex-1 p-4 overflow-y-auto flex flex-col items-center justify-start space-y-4 h-full min-h-0 max-w-4xl mx-auto' : 'w-3/4 p-4 overflow-y-auto flex flex-col items-center justify-start space-y-4 h-full min-h-0'}`}>
-                            {testMode === 'preliminary' ? (<PreliminaryTestContainer preliminaryTestStatus={preliminaryTest.preliminaryTestStatus} preliminaryTestData={preliminaryTest.preliminaryTestData} allQuestions={preliminaryTest.allQuestions} currentQuestionIndex={preliminaryTest.currentQuestionIndex} answers={preliminaryTest.answers} timeRemaining={preliminaryTestTimer.time} preliminaryTestResult={preliminaryTest.preliminaryTestResult} onAnswerSubmit={preliminaryTest.handleAnswerSubmit} onPrevious={handlePreviousQuestion} onNext={handleNextQuestion} onContinue={() => { }} onFinish={createMainTest} onLogout={onLogout}/>) : (<MainTestContainer mainSessionId={mainTest.mainSessionId} currentSection={mainTest.currentSection} mainTestData={mainTest.mainTestData} mainTestResults={mainTest.mainTestResults} isGeneratingTest={mainTest.isGeneratingTest} timeRemaining={sectionTimer.time} testResultId={testResultId} preliminaryTestResult={preliminaryTest.preliminaryTestResult} onSectionComplete={handleSectionComplete} onTestGenerationComplete={handleTestGenerationComplete} onTestGenerationError={handleTestGenerationError} onTestComplete={onTestComplete} setMainTestData={mainTest.setMainTestData} proceedToNextSection={proceedToNextSection}/>)}
+                            {testMode === 'preliminary' ? (<PreliminaryTestContainer preliminaryTestStatus={preliminaryTest.preliminaryTestStatus} preliminaryTestData={preliminaryTest.preliminaryTestData} allQuestions={preliminaryTest.allQuestions} currentQuestionIndex={preliminaryTest.currentQuestionIndex} answers={preliminaryTest.answers} timeRemaining={preliminaryTestTimer.time} preliminaryTestResult={preliminaryTest.preliminaryTestResult} onAnswerSubmit={preliminaryTest.handleAnswerSubmit} onPrevious={handlePreviousQuestion} onNext={handleNextQuestion} onContinue={() => { }} onFinish={createMainTest} onLogout={onLogout}/>) : (<MainTestContainer mainSessionId={mainTest.mainSessionId} currentSection={mainTest.currentSection} mainTestData={mainTest.mainTestData} mainTestResults={mainTest.mainTestResults} isGeneratingTest={mainTest.isGeneratingTest} timeRemaining={sectionTimer.time} testResultId={testResultId} preliminaryTestResult={preliminaryTest.preliminaryTestResult} onSectionComplete={handleSectionComplete} onTestGenerationComplete={handleTestGenerationComplete} onTestGenerationError={handleTestGenerationError} onSectionReady={handleSectionReady} onTestComplete={onTestComplete} setMainTestData={mainTest.setMainTestData} proceedToNextSection={proceedToNextSection}/>)}
                         </div>
                         
                         <ProctoringSidebar violationCount={proctoringState.violationCount} isTestTerminated={proctoringState.isTestTerminated} sessionId={testMode === 'preliminary' ?